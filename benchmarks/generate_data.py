@@ -0,0 +1,170 @@
+"""Synthetic observation data at production-like scale.
+
+Writes CSVs in the `data/flora_data.csv` layout and fills SQLite/Postgres
+databases through the models, so the data layer can be benchmarked at
+10k, 100k and 1M rows. Output is deterministic for a given seed.
+
+    python -m benchmarks.generate_data --rows 10000 100000 --sqlite
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, insert
+
+from database.db_init import _insert_observations
+from database.spatial import geohash_encode
+from models.models import Base, Flora, User
+
+DATA_DIR = Path(__file__).parent / 'data'
+SAMPLE_CSV = Path(__file__).parent.parent / 'data' / 'flora_data.csv'
+CSV_COLUMNS = ['datetime', 'address', 'lat', 'lon', 'description', 'id', 'flora_name', 'username']
+
+# Observations cluster around a few cities, weighted by share of the data
+CITIES = [
+    ('CDMX', 19.40, -99.15, 0.15, 0.55),
+    ('Guadalajara', 20.67, -103.35, 0.10, 0.15),
+    ('Oaxaca', 17.06, -96.72, 0.08, 0.10),
+    ('Mérida', 20.97, -89.62, 0.08, 0.08),
+    ('Madrid', 40.42, -3.70, 0.10, 0.07),
+    ('Bogotá', 4.71, -74.07, 0.10, 0.05),
+]
+
+
+def _flora_vocabulary(n_flora):
+    base = sorted(pd.read_csv(SAMPLE_CSV, usecols=['flora_name'])['flora_name'].dropna().str.strip().unique())
+    names = list(base)
+    i = 0
+    while len(names) < n_flora:
+        names.append(f"{base[i % len(base)]} {i // len(base) + 2}")
+        i += 1
+    return names[:n_flora]
+
+
+def _zipf_choice(rng, n_values, size, a=1.2):
+    """Indices in [0, n_values) with a Zipf-like (long-tailed) popularity."""
+    weights = 1.0 / np.arange(1, n_values + 1) ** a
+    return rng.choice(n_values, size=size, p=weights / weights.sum())
+
+
+def generate_observations(n_rows, seed=0):
+    """Return a DataFrame of `n_rows` synthetic observations in the fallback CSV layout."""
+    rng = np.random.default_rng(seed)
+    flora = _flora_vocabulary(max(36, min(2000, n_rows // 200)))
+    users = [f"Usuario {i}" for i in range(max(20, n_rows // 50))]
+
+    shares = np.array([c[4] for c in CITIES])
+    city = rng.choice(len(CITIES), size=n_rows, p=shares / shares.sum())
+    centers = np.array([(c[1], c[2], c[3]) for c in CITIES])[city]
+    lat = np.round(centers[:, 0] + rng.normal(0, 1, n_rows) * centers[:, 2], 6)
+    lon = np.round(centers[:, 1] + rng.normal(0, 1, n_rows) * centers[:, 2], 6)
+
+    start = np.datetime64('2021-11-01T00:00:00')
+    seconds = np.sort(rng.integers(0, 3 * 365 * 24 * 3600, n_rows))
+    when = pd.to_datetime(start + seconds.astype('timedelta64[s]'))
+
+    flora_names = np.asarray(flora, dtype=object)[_zipf_choice(rng, len(flora), n_rows)]
+    usernames = np.asarray(users, dtype=object)[_zipf_choice(rng, len(users), n_rows, a=1.05)]
+    coords = pd.Series(lat).astype(str) + ',' + pd.Series(lon).astype(str)
+    images = pd.Series(when.strftime('IMG-%Y%m%d-WA')) + pd.Series(rng.integers(0, 9999, n_rows)).astype(str).str.zfill(4)
+    description = (' ' + images + '.jpg (file attached)  location: https://maps.google.com/?q=' + coords
+                   + '  ' + pd.Series(flora_names))
+    # About a third of the messages carry no photo text at all
+    description = description.where(rng.random(n_rows) > 0.3, '')
+
+    return pd.DataFrame({
+        'datetime': when.strftime('%Y-%m-%d %H:%M:%S.%f'),
+        'address': coords,
+        'lat': lat,
+        'lon': lon,
+        'description': description,
+        'id': np.arange(1, n_rows + 1),
+        'flora_name': flora_names,
+        'username': usernames,
+    }, columns=CSV_COLUMNS)
+
+
+def write_csv(path, n_rows, seed=0):
+    """Write `n_rows` synthetic observations to `path` in the fallback CSV layout."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    generate_observations(n_rows, seed).to_csv(path, index=False)
+    return path
+
+
+def write_database(database_url, n_rows, seed=0, chunksize=50000):
+    """Create the schema at `database_url` and load `n_rows` synthetic observations."""
+    engine = create_engine(database_url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    df = generate_observations(n_rows, seed)
+    with engine.begin() as conn:
+        flora_names = sorted(df['flora_name'].unique())
+        conn.execute(insert(Flora.__table__), [{'name': n} for n in flora_names])
+        usernames = sorted(df['username'].unique())
+        conn.execute(insert(User.__table__), [{'username': n} for n in usernames])
+    flora_ids = {n: i for i, n in enumerate(flora_names, start=1)}
+    user_ids = {n: i for i, n in enumerate(usernames, start=1)}
+    for start in range(0, n_rows, chunksize):
+        chunk = df.iloc[start:start + chunksize]
+        records = [{
+            'flora_id': flora_ids[f],
+            'user_id': user_ids[u],
+            'datetime': pd.Timestamp(d).to_pydatetime(),
+            'lat': float(a),
+            'lon': float(b),
+            'address': addr,
+            'description': desc or None,
+            'geohash': geohash_encode(a, b),
+        } for d, addr, a, b, desc, f, u in zip(
+            chunk['datetime'], chunk['address'], chunk['lat'], chunk['lon'],
+            chunk['description'], chunk['flora_name'], chunk['username']
+        )]
+        with engine.begin() as conn:
+            _insert_observations(conn, records)
+    engine.dispose()
+    return engine.url
+
+
+def dataset_paths(n_rows, data_dir=DATA_DIR):
+    """Return (csv path, sqlite url) of the generated dataset with `n_rows` rows."""
+    data_dir = Path(data_dir)
+    return data_dir / f'observations_{n_rows}.csv', f"sqlite:///{(data_dir / f'observations_{n_rows}.db').resolve()}"
+
+
+def ensure_dataset(n_rows, sqlite=True, data_dir=DATA_DIR, seed=0):
+    """Generate the CSV (and SQLite database) for `n_rows` unless they already exist."""
+    csv_path, sqlite_url = dataset_paths(n_rows, data_dir)
+    if not csv_path.exists():
+        started = time.perf_counter()
+        write_csv(csv_path, n_rows, seed)
+        print(f"Wrote {csv_path} in {time.perf_counter() - started:.1f}s")
+    db_path = Path(sqlite_url[len('sqlite:///'):])
+    if sqlite and not db_path.exists():
+        started = time.perf_counter()
+        write_database(sqlite_url, n_rows, seed)
+        print(f"Wrote {db_path} in {time.perf_counter() - started:.1f}s")
+    return csv_path, sqlite_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic frutapublica observations")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--out', type=Path, default=DATA_DIR, help="output directory for CSV/SQLite files")
+    parser.add_argument('--sqlite', action='store_true', help="also build a SQLite database per size")
+    parser.add_argument('--database-url', help="load the largest size into this database (e.g. Postgres)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        ensure_dataset(n_rows, sqlite=args.sqlite, data_dir=args.out, seed=args.seed)
+    if args.database_url:
+        started = time.perf_counter()
+        write_database(args.database_url, max(args.rows), args.seed)
+        print(f"Loaded {max(args.rows)} rows into {args.database_url} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
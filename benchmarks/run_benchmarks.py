@@ -0,0 +1,207 @@
+"""Repeatable benchmarks for the data layer.
+
+For each dataset size (generated on first use by `benchmarks.generate_data`)
+this times FallbackStore loading and lookups, `get_observations_df()` on
+the CSV fallback and on SQLite (cold and cached), `add_observation`
+throughput, and the map/analytics preparation the pages do. Results are
+written to `benchmarks/results/<timestamp>.json` together with the
+library versions and git commit, so runs can be compared over time.
+
+    python -m benchmarks.run_benchmarks --rows 10000 100000
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import sqlalchemy
+
+import database.database_utils as du
+from benchmarks.generate_data import ensure_dataset
+from database.fallback_store import FallbackStore
+
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+
+def measure(fn, repeat=5, number=1, setup=None):
+    """Time `fn` `repeat` times (each running it `number` times) and summarize per call."""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - started) / number)
+    return {
+        'min_s': min(timings),
+        'median_s': statistics.median(timings),
+        'mean_s': statistics.fmean(timings),
+        'ops_per_s': 1.0 / min(timings) if min(timings) else None,
+        'repeat': repeat,
+        'number': number,
+    }
+
+
+def _use_backend(csv_path=None, database_url=None):
+    """Point database_utils at `csv_path` / `database_url` and drop its caches."""
+    if database_url:
+        os.environ['DATABASE_URL'] = database_url
+    else:
+        os.environ.pop('DATABASE_URL', None)
+    if csv_path is not None:
+        du._FALLBACK_CSV = Path(csv_path)
+    _drop_caches()
+
+
+def _drop_caches():
+    du._fallback_store = None
+    du._fallback_store_key = None
+    du._observation_cache.invalidate()
+    du._data_generation.bump()
+
+
+def bench_fallback_store(csv_path, repeat):
+    results = {'load': measure(lambda: FallbackStore(csv_path), repeat=repeat)}
+    store = FallbackStore(csv_path)
+    rng = np.random.default_rng(0)
+    ids = rng.integers(1, store.max_id() + 1, 1000).tolist()
+    results['get_x1000'] = measure(lambda: [store.get(i) for i in ids], repeat=repeat)
+    results['filter_by_flora_substring'] = measure(lambda: store.filter_by_flora('man'), repeat=repeat)
+    results['filter_by_flora_exact'] = measure(lambda: store.filter_by_flora('Higo', 'exact'), repeat=repeat)
+    results['to_dataframe'] = measure(store.to_dataframe, repeat=repeat)
+    return results
+
+
+def bench_observations_df(repeat):
+    return {
+        'cold': measure(du.get_observations_df, repeat=repeat, setup=_drop_caches),
+        'cached': measure(du.get_observations_df, repeat=repeat, number=20),
+    }
+
+
+def bench_add_observation(n_writes):
+    started = time.perf_counter()
+    for i in range(n_writes):
+        du.add_observation('Higo', f'Bench {i % 10}', 19.4 + i * 1e-5, -99.15, '', 'benchmark')
+    elapsed = time.perf_counter() - started
+    return {'writes': n_writes, 'seconds': elapsed, 'writes_per_s': n_writes / elapsed}
+
+
+def bench_page_prep(repeat):
+    results = {
+        'map_cells_zoom4': measure(lambda: du.get_map_cells(4), repeat=repeat),
+        'analytics': measure(du.get_analytics, repeat=repeat),
+    }
+    try:
+        from views.map import MAP_POINT_LIMIT, _points_figure
+    except ImportError as exc:
+        results['points_figure'] = {'skipped': str(exc)}
+    else:
+        df = du.get_observations_df().head(MAP_POINT_LIMIT)
+        results['points_figure'] = measure(lambda: _points_figure(df.copy()), repeat=repeat)
+    return results
+
+
+def run(sizes, repeat=5, n_writes=200, sqlite=True):
+    results = {}
+    for n_rows in sizes:
+        print(f"== {n_rows} rows")
+        csv_path, sqlite_url = ensure_dataset(n_rows, sqlite=sqlite)
+        size = {}
+        size['fallback_store'] = bench_fallback_store(csv_path, repeat)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            # Writes go to a copy so the generated dataset stays reusable
+            work_csv = Path(tmp) / csv_path.name
+            shutil.copy(csv_path, work_csv)
+            _use_backend(csv_path=work_csv)
+            size['csv'] = {
+                'get_observations_df': bench_observations_df(repeat),
+                'page_prep': bench_page_prep(repeat),
+                'add_observation': bench_add_observation(n_writes),
+            }
+
+            if sqlite:
+                work_db = Path(tmp) / 'bench.db'
+                shutil.copy(sqlite_url[len('sqlite:///'):], work_db)
+                _use_backend(database_url=f'sqlite:///{work_db}')
+                size['sqlite'] = {
+                    'get_observations_df': bench_observations_df(repeat),
+                    'page_prep': bench_page_prep(repeat),
+                    'add_observation': bench_add_observation(n_writes),
+                }
+                # The cached frame after a write is refreshed with only the new rows
+                size['sqlite']['get_observations_df_after_write'] = measure(
+                    du.get_observations_df, repeat=repeat,
+                    setup=lambda: du.add_observation('Higo', 'Bench', 19.4, -99.15, '', 'benchmark')
+                )
+                du.dispose_engine()
+            _use_backend()
+        results[str(n_rows)] = size
+        _print_summary(size)
+    return results
+
+
+def _print_summary(results, prefix=''):
+    for name, value in results.items():
+        label = f'{prefix}{name}'
+        if 'median_s' in value:
+            print(f"  {label:<55} {value['median_s'] * 1000:10.3f} ms")
+        elif 'writes_per_s' in value:
+            print(f"  {label:<55} {value['writes_per_s']:10.1f} writes/s")
+        elif 'skipped' in value:
+            print(f"  {label:<55} skipped ({value['skipped']})")
+        else:
+            _print_summary(value, f'{label}.')
+
+
+def _round(value):
+    return round(value, 6) if isinstance(value, float) else str(value)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the frutapublica data layer")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--writes', type=int, default=200, help="add_observation calls per backend")
+    parser.add_argument('--no-sqlite', action='store_true', help="only benchmark the CSV fallback")
+    parser.add_argument('--out', type=Path, help="result file (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    results = run(args.rows, repeat=args.repeat, n_writes=args.writes, sqlite=not args.no_sqlite)
+    out = args.out or RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'sqlalchemy': sqlalchemy.__version__,
+        'results': results,
+    }
+    with open(out, 'w', encoding='utf-8') as fh:
+        json.dump(report, fh, indent=2, default=_round)
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
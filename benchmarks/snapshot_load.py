@@ -0,0 +1,87 @@
+"""Compare FallbackStore load time and memory: CSV parse vs. memory-mapped snapshot.
+
+Each sample loads the store in a fresh interpreter and reports the wall
+time and how much the process RSS grew, split into anonymous memory
+(private to the process) and file-backed pages (the mapped snapshot,
+shared by every worker that maps it). RSS figures come from
+/proc/self/status, so they are Linux only; elsewhere only times are shown.
+
+    python -m benchmarks.snapshot_load --rows 100000 1000000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.generate_data import ensure_dataset
+from database.snapshot import snapshot_enabled, snapshot_path
+
+ROOT = Path(__file__).parent.parent
+
+_LOAD_SNIPPET = """
+import json, time
+from database.fallback_store import FallbackStore
+
+def rss():
+    try:
+        with open('/proc/self/status') as fh:
+            fields = dict(line.split(':', 1) for line in fh)
+    except OSError:
+        return {}
+    return {k: int(fields[k].split()[0]) for k in ('VmRSS', 'RssAnon', 'RssFile') if k in fields}
+
+before = rss()
+started = time.perf_counter()
+store = FallbackStore(%r, cache=%r)
+seconds = time.perf_counter() - started
+after = rss()
+print(json.dumps({'seconds': seconds, 'rows': len(store),
+                  'rss_kb': {k: after[k] - before[k] for k in after}}))
+"""
+
+
+def _load(csv_path, cache):
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    out = subprocess.run([sys.executable, '-c', _LOAD_SNIPPET % (str(csv_path), cache)],
+                         capture_output=True, text=True, cwd=ROOT, env=env, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(csv_path, repeat=3):
+    """Return {'csv': ..., 'snapshot': ...} medians for loading `csv_path`."""
+    results = {}
+    for label, cache in (('csv', False), ('snapshot', True)):
+        if cache:
+            _load(csv_path, True)  # make sure the snapshot exists and is current
+        samples = [_load(csv_path, cache) for _ in range(repeat)]
+        results[label] = {
+            'seconds': statistics.median(s['seconds'] for s in samples),
+            'rows': samples[0]['rows'],
+            'rss_kb': {k: statistics.median(s['rss_kb'][k] for s in samples) for k in samples[0]['rss_kb']},
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FallbackStore load time/RSS: CSV vs. binary snapshot")
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    if not snapshot_enabled():
+        sys.exit("Snapshots are disabled (pyarrow missing or FALLBACK_SNAPSHOT=0)")
+
+    for n_rows in args.rows:
+        csv_path, _ = ensure_dataset(n_rows, sqlite=False)
+        results = measure(csv_path, args.repeat)
+        size_mb = snapshot_path(csv_path).stat().st_size / 1e6
+        print(f"== {n_rows} rows (CSV {csv_path.stat().st_size / 1e6:.1f} MB, snapshot {size_mb:.1f} MB)")
+        for label, r in results.items():
+            rss = ', '.join(f"{k} +{v / 1024:.1f} MB" for k, v in r['rss_kb'].items())
+            print(f"  {label:<9} {r['seconds'] * 1000:9.1f} ms   {rss}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Cold-start benchmark for the Streamlit app.
+
+Each sample runs in a fresh interpreter, so nothing is already imported:
+
+- import: time to `import Home`, plus which heavy optional libraries that
+  import pulled in (none of them should be needed before a page renders);
+- first render: time for Streamlit's AppTest to run Home.py once, which
+  draws the default "Mapa" page.
+
+Medians are compared against an optional budget so a regression fails
+loudly (exit status 1):
+
+    python -m benchmarks.startup --budget-import 1.0 --budget-render 3.0
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Modules only some pages (or a photo upload) need. Streamlit itself already
+# imports plotly's graph objects, Pillow and protobuf, so those are not listed.
+LAZY_MODULES = [
+    'plotly.express', 'streamlit_geolocation', 'requests', 'googleapiclient', 'google.oauth2',
+    'media.images', 'media.upload_queue', 'views.map', 'views.share',
+]
+
+_IMPORT_SNIPPET = """
+import json, sys, time
+started = time.perf_counter()
+import Home
+seconds = time.perf_counter() - started
+loaded = [m for m in %r if m in sys.modules]
+print(json.dumps({'seconds': seconds, 'loaded': loaded}))
+"""
+
+_RENDER_SNIPPET = """
+import json, time
+from streamlit.testing.v1 import AppTest
+started = time.perf_counter()
+at = AppTest.from_file(%r, default_timeout=120)
+at.run()
+seconds = time.perf_counter() - started
+print(json.dumps({'seconds': seconds, 'exceptions': [str(e.value) for e in at.exception]}))
+"""
+
+
+def _run(snippet):
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    out = subprocess.run([sys.executable, '-c', snippet], capture_output=True, text=True, cwd=ROOT, env=env, check=True)
+    # The result is the last line; Streamlit may log warnings before it
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure_import(repeat=5):
+    samples = [_run(_IMPORT_SNIPPET % LAZY_MODULES) for _ in range(repeat)]
+    return {
+        'median_s': statistics.median(s['seconds'] for s in samples),
+        'min_s': min(s['seconds'] for s in samples),
+        'loaded_lazy_modules': samples[-1]['loaded'],
+    }
+
+
+def measure_first_render(repeat=3):
+    samples = [_run(_RENDER_SNIPPET % str(ROOT / 'Home.py')) for _ in range(repeat)]
+    return {
+        'median_s': statistics.median(s['seconds'] for s in samples),
+        'min_s': min(s['seconds'] for s in samples),
+        'exceptions': samples[-1]['exceptions'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Home.py import time and time to first render")
+    parser.add_argument('--repeat', type=int, default=5, help="import samples (render uses half as many)")
+    parser.add_argument('--budget-import', type=float, help="fail if the median import time exceeds this (s)")
+    parser.add_argument('--budget-render', type=float, help="fail if the median first render exceeds this (s)")
+    parser.add_argument('--out', type=Path, help="also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'import': measure_import(args.repeat),
+        'first_render': measure_first_render(max(1, args.repeat // 2)),
+    }
+    print(f"import Home:        {results['import']['median_s']:.3f} s (min {results['import']['min_s']:.3f} s)")
+    print(f"  lazy modules loaded at import: {', '.join(results['import']['loaded_lazy_modules']) or 'none'}")
+    print(f"first render Mapa:  {results['first_render']['median_s']:.3f} s "
+          f"(min {results['first_render']['min_s']:.3f} s)")
+    if results['first_render']['exceptions']:
+        print(f"  exceptions: {results['first_render']['exceptions']}")
+
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.out, 'w', encoding='utf-8') as fh:
+            json.dump(results, fh, indent=2)
+
+    over = []
+    if args.budget_import is not None and results['import']['median_s'] > args.budget_import:
+        over.append(f"import {results['import']['median_s']:.3f} s > {args.budget_import} s")
+    if args.budget_render is not None and results['first_render']['median_s'] > args.budget_render:
+        over.append(f"first render {results['first_render']['median_s']:.3f} s > {args.budget_render} s")
+    if over:
+        print("Over startup budget: " + "; ".join(over))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
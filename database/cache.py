@@ -0,0 +1,172 @@
+"""Process-wide caches shared by every Streamlit session.
+
+Cached values are keyed on a data generation: a counter that writers bump
+after changing observations or recipes, combined by the callers with
+anything else that can change the data from outside the process (e.g. the
+fallback CSV's mtime). Readers never rebuild unless the key changed.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+
+class DataGeneration:
+    """Monotonic counter bumped by every write to the data layer."""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        return self._value
+
+    def bump(self):
+        with self._lock:
+            self._value += 1
+            return self._value
+
+
+def file_signature(path):
+    """Return (mtime_ns, size) for `path`, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _copy_on_write_enabled():
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    try:
+        return bool(pd.get_option('mode.copy_on_write'))
+    except Exception:
+        return False
+
+
+class SnapshotCache:
+    """Holds a single DataFrame built for a given key.
+
+    `get(key, builder)` returns a snapshot of the cached frame when the key
+    matches, otherwise rebuilds it once (concurrent readers wait for the
+    same rebuild). With copy-on-write pandas the snapshot is a shallow copy;
+    otherwise it is a deep copy so callers can never mutate the shared frame.
+
+    With an `updater`, a stale frame is first offered to
+    `updater(old_key, old_frame)`, which may return the frame brought up to
+    date (e.g. with only the new rows appended) or None to force a full
+    rebuild.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._key = None
+        self._frame = None
+        self._shallow = _copy_on_write_enabled()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'delta_refreshes': 0,
+            'last_rebuild_seconds': 0.0,
+            'total_rebuild_seconds': 0.0,
+            'last_hit_seconds': 0.0,
+        }
+
+    def _snapshot(self, started):
+        frame = self._frame.copy(deep=not self._shallow)
+        self._stats['last_hit_seconds'] = time.perf_counter() - started
+        return frame
+
+    def get(self, key, builder, updater=None):
+        started = time.perf_counter()
+        if self._frame is not None and self._key == key:
+            self._stats['hits'] += 1
+            return self._snapshot(started)
+        with self._lock:
+            if self._frame is not None and self._key == key:
+                self._stats['hits'] += 1
+                return self._snapshot(started)
+            self._stats['misses'] += 1
+            frame = None
+            if updater is not None and self._frame is not None:
+                frame = updater(self._key, self._frame)
+                if frame is not None:
+                    self._stats['delta_refreshes'] += 1
+            if frame is None:
+                frame = builder()
+            elapsed = time.perf_counter() - started
+            self._stats['last_rebuild_seconds'] = elapsed
+            self._stats['total_rebuild_seconds'] += elapsed
+            self._frame = frame
+            self._key = key
+            return self._snapshot(started)
+
+    def invalidate(self):
+        with self._lock:
+            self._frame = None
+            self._key = None
+
+    def stats(self):
+        """Return hit/miss/delta counters and rebuild timings."""
+        stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['rows'] = 0 if self._frame is None else len(self._frame)
+        stats['key'] = self._key
+        return stats
+
+
+class KeyedCache:
+    """Bounded LRU of values built per key (e.g. data key plus view parameters).
+
+    Unlike `SnapshotCache` the cached values are returned as they are, not
+    copied, so callers must treat them as read-only. Builds run outside the
+    lock, so a slow build for one key never blocks lookups of another.
+    """
+
+    def __init__(self, name, maxsize=32):
+        self.name = name
+        self.maxsize = max(1, int(maxsize))
+        self._lock = threading.Lock()
+        self._values = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key, builder):
+        with self._lock:
+            if key in self._values:
+                self._values.move_to_end(key)
+                self._stats['hits'] += 1
+                return self._values[key]
+            self._stats['misses'] += 1
+        value = builder()
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+                self._stats['evictions'] += 1
+        return value
+
+    def discard_where(self, predicate):
+        """Drop every entry whose key matches `predicate` (e.g. keys of an older data generation)."""
+        with self._lock:
+            for key in [k for k in self._values if predicate(k)]:
+                del self._values[key]
+
+    def invalidate(self):
+        with self._lock:
+            self._values.clear()
+
+    def stats(self):
+        """Return hit/miss/eviction counters and the number of cached entries."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._values)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,227 @@
+"""Append-only, lock-safe writer for the fallback CSV.
+
+Each write appends complete lines to the end of the file with a single
+`write()` and an fsync, so it costs O(1) no matter how large the file is.
+Next to the CSV live two small sidecar files:
+
+- `<csv>.lock` — advisory lock (fcntl.flock) serializing writers across
+  processes; readers take it shared while tailing new rows.
+- `<csv>.seq` — JSON with the last assigned id, the committed file size,
+  the file's inode and a hash of the last block before that size, so new
+  ids never require scanning the CSV. When the file is still the one the
+  sidecar describes, the size also lets the next writer cut off a torn
+  line left by a crash mid-append; a replaced or edited file is rescanned
+  instead and never truncated.
+
+Concurrent submissions in one process are group-committed: the first
+caller becomes the leader, waits `commit_delay` seconds for others to
+queue up, and writes the whole batch under one lock and one fsync.
+"""
+import contextlib
+import csv
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock; fall back to the in-process lock
+    fcntl = None
+
+# Bytes hashed by `tail_digest`: enough to tell a rewritten file from the one we committed
+TAIL_BLOCK = 4096
+
+_process_locks = {}
+_process_locks_guard = threading.Lock()
+
+
+def lock_path_for(csv_path) -> Path:
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + '.lock')
+
+
+def seq_path_for(csv_path) -> Path:
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + '.seq')
+
+
+def tail_digest(fh, size: int) -> str:
+    """SHA-256 of the `TAIL_BLOCK` bytes of `fh` before offset `size`."""
+    start = max(0, size - TAIL_BLOCK)
+    fh.seek(start)
+    return hashlib.sha256(fh.read(size - start)).hexdigest()
+
+
+@contextlib.contextmanager
+def file_lock(csv_path, shared=False):
+    """Hold the advisory lock for `csv_path` (exclusive unless `shared`)."""
+    path = lock_path_for(csv_path)
+    with _process_locks_guard:
+        thread_lock = _process_locks.setdefault(str(path), threading.Lock())
+    # flock is per open file description, so also serialize writers within the process
+    with contextlib.ExitStack() as stack:
+        if not shared:
+            stack.enter_context(thread_lock)
+        if fcntl is not None:
+            fh = stack.enter_context(open(path, 'a+b'))
+            fcntl.flock(fh.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            stack.callback(fcntl.flock, fh.fileno(), fcntl.LOCK_UN)
+        yield
+
+
+def _format_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+    if isinstance(value, float) and value != value:
+        return ''
+    return value
+
+
+class _Ticket:
+    __slots__ = ('row', 'id', 'error', 'done')
+
+    def __init__(self, row):
+        self.row = row
+        self.id = None
+        self.error = None
+        self.done = False
+
+
+class CsvAppender:
+    def __init__(self, csv_path, commit_delay: float = 0.005):
+        self.csv_path = Path(csv_path)
+        self.seq_path = seq_path_for(self.csv_path)
+        self.commit_delay = commit_delay
+        self._header = None
+        self._cond = threading.Condition()
+        self._pending: List[_Ticket] = []
+        self._leader_active = False
+
+    def header(self) -> List[str]:
+        """Column names from the CSV's first line."""
+        if self._header is None:
+            with open(self.csv_path, 'r', encoding='utf-8', newline='') as fh:
+                self._header = [c.strip() for c in next(csv.reader(fh))]
+        return self._header
+
+    def append(self, row: Dict) -> int:
+        """Append one row (its `id` is assigned here) and return the new id.
+
+        Blocks until the row is durably written. Rows submitted concurrently
+        from other threads are written in the same batch.
+        """
+        ticket = _Ticket(row)
+        with self._cond:
+            self._pending.append(ticket)
+            if self._leader_active:
+                while not ticket.done:
+                    self._cond.wait()
+                return self._result(ticket)
+            self._leader_active = True
+
+        if self.commit_delay:
+            time.sleep(self.commit_delay)
+        while True:
+            with self._cond:
+                batch, self._pending = self._pending, []
+                if not batch:
+                    self._leader_active = False
+                    break
+            try:
+                ids = self._write_batch([t.row for t in batch])
+                for t, new_id in zip(batch, ids):
+                    t.id = new_id
+            except Exception as exc:
+                for t in batch:
+                    t.error = exc
+            with self._cond:
+                for t in batch:
+                    t.done = True
+                self._cond.notify_all()
+        return self._result(ticket)
+
+    def append_many(self, rows: List[Dict]) -> List[int]:
+        """Append `rows` with one write and one fsync and return their new ids, in order."""
+        rows = list(rows)
+        return self._write_batch(rows) if rows else []
+
+    @staticmethod
+    def _result(ticket):
+        if ticket.error is not None:
+            raise ticket.error
+        return ticket.id
+
+    def _read_state(self):
+        try:
+            with open(self.seq_path, 'r', encoding='utf-8') as fh:
+                state = json.load(fh)
+            return int(state['last_id']), int(state['size']), int(state['inode']), str(state['tail'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_state(self, last_id, size, inode, tail):
+        tmp = self.seq_path.with_name(self.seq_path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump({'last_id': last_id, 'size': size, 'inode': inode, 'tail': tail}, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.seq_path)
+
+    def _scan_max_id(self) -> int:
+        ids = pd.read_csv(self.csv_path, usecols=['id'], dtype=str, keep_default_na=False)['id']
+        ids = pd.to_numeric(ids, errors='coerce')
+        return int(ids.max()) if ids.notna().any() else 0
+
+    def _write_batch(self, rows: List[Dict]) -> List[int]:
+        header = self.header()
+        with file_lock(self.csv_path):
+            state = self._read_state()
+            with open(self.csv_path, 'r+b') as fh:
+                inode = os.fstat(fh.fileno()).st_ino
+                size = fh.seek(0, os.SEEK_END)
+                # The sidecar only describes this file if its inode and the
+                # block before the committed size are unchanged
+                ours = (state is not None and state[2] == inode and state[1] <= size
+                        and tail_digest(fh, state[1]) == state[3])
+                if ours and state[1] < size:
+                    fh.seek(size - 1)
+                    if fh.read(1) != b'\n':
+                        # A writer died mid-append: drop the torn tail
+                        fh.truncate(state[1])
+                        size = state[1]
+                if not ours or state[1] != size:
+                    # No sequence yet, or the file was replaced or changed by something else
+                    last_id = self._scan_max_id()
+                else:
+                    last_id = state[0]
+                if size:
+                    fh.seek(size - 1)
+                    prefix = b'' if fh.read(1) == b'\n' else b'\n'
+                else:
+                    prefix = b''
+
+                ids = list(range(last_id + 1, last_id + 1 + len(rows)))
+                buf = io.StringIO()
+                writer = csv.writer(buf, lineterminator='\n')
+                for row, new_id in zip(rows, ids):
+                    values = dict(row, id=new_id)
+                    writer.writerow([_format_value(values.get(col)) for col in header])
+                data = prefix + buf.getvalue().encode('utf-8')
+                fh.seek(size)
+                fh.write(data)
+                fh.flush()
+                os.fsync(fh.fileno())
+                size += len(data)
+                tail = tail_digest(fh, size)
+            self._write_state(ids[-1], size, inode, tail)
+        return ids
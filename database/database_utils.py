@@ -1,18 +1,31 @@
-
-from sqlalchemy import create_engine, func
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import and_, bindparam, create_engine, func, insert, or_, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.orm import joinedload, sessionmaker
 from sqlalchemy.exc import OperationalError, SQLAlchemyError
 from models.models import Flora, Observation, User, Recipe, RecipeIngredient
 import pandas as pd
 from datetime import datetime
 import os
-from dotenv import load_dotenv
 from pathlib import Path
-import json
-
-load_dotenv()
+import io
+import logging
+import threading
+import time
+from typing import NamedTuple, Optional
 
 from database.fallback_store import FallbackStore
+from database.health import CircuitBreaker, CLOSED, OPEN
+from database.csv_appender import CsvAppender, file_lock
+from database.cache import DataGeneration, SnapshotCache, file_signature
+from database.map_aggregates import MapAggregates
+from database.dimensions import Dimension
+from database.recipe_store import IngredientIndex, RecipeStore
+from database.export import EXPORT_FORMATS, write_export
+from database.spatial import bbox_around, geohash_encode, geohash_prefixes_for_bbox, haversine_m
+from database.metrics import instrument_engine, metrics, timed, timer
+from database.dedup import DEFAULT_DISTANCE_M, LinkStore, neighbour_bboxes, params_signature, plan_links
+from database.migrations import data_versions, dedup_checkpoints, pending_migrations
 
 
 class _FallbackQuery:
@@ -41,11 +54,9 @@ class _FallbackSession:
 
     def query(self, model):
         if model is Flora:
-            flora_names = sorted({r.get('flora_name') for r in self._store.all() if r.get('flora_name')})
-            return _FallbackQuery(flora_names, 'name')
+            return _FallbackQuery(self._store.flora_names(), 'name')
         if model is User:
-            users = sorted({r.get('username') for r in self._store.all() if r.get('username')})
-            return _FallbackQuery(users, 'username')
+            return _FallbackQuery(self._store.usernames(), 'username')
         # Fallback: empty
         return _FallbackQuery([], 'name')
 
@@ -53,47 +64,714 @@ class _FallbackSession:
         return None
 
 
+# Process-wide engine and sessionmaker, created lazily on first use and shared
+# by every Streamlit session/thread in this process.
+_engine = None
+_engine_url = None
+_session_factory = None
+_engine_lock = threading.Lock()
+# Database URL whose missing migrations were already reported
+_schema_reported = None
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _pool_options(database_url):
+    """QueuePool settings, configurable through DB_POOL_* environment variables."""
+    options = {
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+    }
+    backend = make_url(database_url).get_backend_name()
+    # SQLite uses its own pool classes; sizing only applies to server databases
+    if backend != 'sqlite':
+        options.update(
+            poolclass=QueuePool,
+            pool_size=_env_int('DB_POOL_SIZE', 5),
+            max_overflow=_env_int('DB_MAX_OVERFLOW', 10),
+            pool_timeout=_env_int('DB_POOL_TIMEOUT', 30),
+        )
+    # Fail fast on unreachable hosts instead of the driver's default timeout
+    if backend in ('postgresql', 'mysql'):
+        options['connect_args'] = {'connect_timeout': _env_int('DB_CONNECT_TIMEOUT', 3)}
+    return options
+
+
+# Remembers that the DB is down so requests go straight to the CSV fallback.
+# Re-probing backs off exponentially between DB_RETRY_BASE_DELAY and DB_RETRY_MAX_DELAY
+# (read together with .env in `_load_env`).
+_db_health = CircuitBreaker('database')
+_env_loaded = False
+# The database's DataMarker is re-read at most every DATA_VERSION_TTL seconds, or after a local write
+_marker_ttl = 2.0
+_marker_state = (0.0, None, None)  # (checked at, data generation, marker)
+
+
+def _load_env():
+    """Read .env on first use instead of at import time, then apply the settings that depend on it."""
+    global _env_loaded, _marker_ttl
+    if _env_loaded:
+        return
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    _db_health.base_delay = _env_float('DB_RETRY_BASE_DELAY', 1.0)
+    _db_health.max_delay = _env_float('DB_RETRY_MAX_DELAY', 60.0)
+    _marker_ttl = _env_float('DATA_VERSION_TTL', 2.0)
+    _env_loaded = True
+
+
 def _get_engine():
-    """Create an engine and verify connectivity. Return engine or None on failure."""
+    """Return the shared engine, or None when no DB is configured, reachable or migrated.
+
+    The engine (and its connection pool) is created once per process. While
+    the circuit breaker is open this returns None immediately; when it goes
+    half-open a single caller re-probes the connection.
+    """
+    global _engine, _engine_url, _session_factory
+    _load_env()
     database_url = os.getenv('DATABASE_URL')
     if not database_url:
         return None
-    try:
-        engine = create_engine(database_url)
-        # Try a short-lived connection to confirm DB is reachable
-        conn = engine.connect()
-        conn.close()
-        return engine
-    except Exception:
+    if not _db_health.allow_request():
         return None
+    if _db_health.state == CLOSED and _engine is not None and _engine_url == database_url:
+        return _engine
+    with _engine_lock:
+        if _db_health.state == OPEN:
+            return None
+        if _db_health.state == CLOSED and _engine is not None and _engine_url == database_url:
+            return _engine
+        engine = None
+        try:
+            if _engine is not None and _engine_url == database_url:
+                engine = _engine
+            else:
+                with timer('engine.create'):
+                    engine = create_engine(database_url, **_pool_options(database_url))
+                instrument_engine(engine)
+            # Try a short-lived connection to confirm DB is reachable
+            with timer('engine.connect'):
+                conn = engine.connect()
+                conn.close()
+            if engine is not _engine:
+                _check_schema(engine, database_url)
+        except Exception as exc:
+            if engine is not None and engine is not _engine:
+                engine.dispose()
+            _db_health.record_failure(exc)
+            return None
+        if engine is not _engine:
+            if _engine is not None:
+                _engine.dispose()
+            _engine = engine
+            _engine_url = database_url
+            _session_factory = sessionmaker(bind=engine)
+        _db_health.record_success()
+        return _engine
+
+
+def _check_schema(engine, database_url):
+    """Refuse a database that lacks migrations, saying once how to fix it.
+
+    Its queries would fail on the missing columns and tables one by one;
+    this way the app serves the CSV with a single clear error until the
+    database is migrated, and the breaker's next probe picks it up.
+    """
+    global _schema_reported
+    pending = pending_migrations(engine)
+    if not pending:
+        _schema_reported = None
+        return
+    message = (f"Database schema lacks migrations {', '.join(str(v) for v, _ in pending)}; "
+               f"run `python -m database.migrations` to apply them")
+    if _schema_reported != database_url:
+        _schema_reported = database_url
+        logger.error("%s. Serving the CSV fallback until then.", message)
+    raise OperationalError(None, None, RuntimeError(message))
+
+
+def get_backend_health():
+    """Return the database circuit breaker state as a dict."""
+    return _db_health.snapshot()
+
+
+def dispose_engine():
+    """Close all pooled connections and drop the shared engine."""
+    global _engine, _engine_url, _session_factory
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine = None
+        _engine_url = None
+        _session_factory = None
+
+
+def get_pool_stats():
+    """Return connection pool statistics for the shared engine, or None without a DB."""
+    engine = _get_engine()
+    if engine is None:
+        return None
+    pool = engine.pool
+    stats = {'pool_class': type(pool).__name__, 'status': pool.status()}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        attr = getattr(pool, name, None)
+        if callable(attr):
+            stats[name] = attr()
+    return stats
+
+
+_FALLBACK_CSV = Path(__file__).parent.parent / 'data' / 'flora_data.csv'
+_OBSERVATION_COLUMNS = ['id', 'datetime', 'flora_name', 'username', 'lat', 'lon', 'address', 'description']
+
+# Shared by all sessions: bumped by every write so cached reads know when to rebuild
+_data_generation = DataGeneration()
+_observation_cache = SnapshotCache('observations')
+_fallback_store = None
+_fallback_store_key = None
+_fallback_lock = threading.Lock()
+
+
+def _get_fallback_store():
+    """Return the shared FallbackStore, catching up with the CSV only when it changed on disk.
+
+    Appended rows are tailed into the existing store. The file is re-read
+    from scratch when it shrank or was replaced, when it changed without
+    growing, or when `FallbackStore.refresh` finds the bytes it already read
+    were rewritten (an in-place save that also made the file larger).
+    """
+    global _fallback_store, _fallback_store_key
+    key = file_signature(_FALLBACK_CSV)
+    if _fallback_store is not None and _fallback_store_key == key and _fallback_store.csv_path == _FALLBACK_CSV:
+        return _fallback_store
+    with _fallback_lock:
+        if _fallback_store is not None and _fallback_store.csv_path != _FALLBACK_CSV:
+            _fallback_store = None
+        if _fallback_store is not None and _fallback_store_key != key:
+            grew = key is not None and _fallback_store_key is not None and key[1] > _fallback_store_key[1]
+            if grew and _fallback_store.refresh() is not None:
+                _fallback_store_key = key
+        if _fallback_store is None or _fallback_store_key != key:
+            _fallback_store = FallbackStore(_FALLBACK_CSV)
+            _fallback_store_key = key
+        return _fallback_store
+
+
+_csv_appender = None
+
+
+def _get_csv_appender():
+    global _csv_appender
+    if _csv_appender is None or _csv_appender.csv_path != _FALLBACK_CSV:
+        _csv_appender = CsvAppender(_FALLBACK_CSV)
+    return _csv_appender
+
+
+def _db_marker(engine):
+    """Return the database's DataMarker, re-reading it at most every DATA_VERSION_TTL seconds.
+
+    A local write re-reads it right away. Rows written by other processes
+    (imports, other app workers) show up within the TTL. None when the
+    marker cannot be read.
+    """
+    global _marker_state
+    generation = _data_generation.value
+    checked_at, seen_generation, marker = _marker_state
+    now = time.monotonic()
+    if seen_generation == generation and now - checked_at < _marker_ttl:
+        return marker
+    try:
+        with engine.connect() as conn:
+            marker = DataMarker(*conn.execute(_marker_query()).one())
+    except SQLAlchemyError as exc:
+        if isinstance(exc, OperationalError):
+            _db_health.record_failure(exc)
+        marker = None
+    _marker_state = (now, generation, marker)
+    return marker
+
+
+def _data_key():
+    """Identify the current state of the observation data.
+
+    The local write generation plus the CSV signature, or plus the
+    database's change marker (see `_db_marker`).
+    """
+    generation = _data_generation.value
+    engine = _get_engine()
+    if engine is None:
+        return ('csv', generation, file_signature(_FALLBACK_CSV))
+    return ('db', generation, _db_marker(engine))
+
+
+def get_data_generation():
+    """Return the current data generation counter."""
+    return _data_generation.value
+
+
+def get_data_key():
+    """Return a hashable key that changes whenever the observation data may have changed.
+
+    Use it to key caches of anything derived from observations (e.g. figures).
+    """
+    return _data_key()
+
+
+def get_observation_cache_stats():
+    """Return hit/miss counts and rebuild timings of the shared observations cache."""
+    return _observation_cache.stats()
 
 
 def get_db_session():
     """Create and return a database session or a fallback session when DB is not configured/unreachable."""
     engine = _get_engine()
     if engine is None:
-        store = FallbackStore()
-        return _FallbackSession(store)
-    Session = sessionmaker(bind=engine)
-    return Session()
+        return _FallbackSession(_get_fallback_store())
+    return _session_factory()
 
 
-def get_observations_df():
-    """Get observations as a pandas DataFrame. Uses DB if reachable, otherwise CSV fallback."""
+def _fallback_observations_df():
+    # Columnar view over the store's arrays; already has every front-end column
+    return _get_fallback_store().to_dataframe()
+
+
+class DataMarker(NamedTuple):
+    """Where the database's data stands; every field is a single indexed lookup."""
+    change_seq: Optional[int]
+    deletes: Optional[int]
+    writes: Optional[int]
+    observation_id: Optional[int]
+    recipe_id: Optional[int]
+    flora_id: Optional[int]
+    user_id: Optional[int]
+
+
+def _marker_query():
+    return select(
+        select(func.max(Observation.change_seq)).scalar_subquery(),
+        select(data_versions.c.deletes).where(data_versions.c.name == 'observations').scalar_subquery(),
+        select(data_versions.c.writes).where(data_versions.c.name == 'observations').scalar_subquery(),
+        select(func.max(Observation.id)).scalar_subquery(),
+        select(func.max(Recipe.id)).scalar_subquery(),
+        select(func.max(Flora.id)).scalar_subquery(),
+        select(func.max(User.id)).scalar_subquery(),
+    )
+
+
+# Marker the cached DB frame was loaded at, so a refresh only fetches rows changed since
+_observation_watermark = None
+
+
+def _unavailable():
+    return OperationalError(None, None, ConnectionError("database became unavailable"))
+
+
+def _snapshot_session():
+    """A session whose reads share one snapshot, so a marker matches the rows read with it."""
     engine = _get_engine()
     if engine is None:
-        store = FallbackStore()
-        df = pd.DataFrame(store.all())
-        # Ensure columns used by the front-end exist
-        for c in ['id', 'datetime', 'flora_name', 'username', 'lat', 'lon', 'address', 'description']:
-            if c not in df.columns:
-                df[c] = None
-        return df
+        raise _unavailable()
+    session = _session_factory()
+    if engine.dialect.name == 'postgresql':
+        session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+    return session
+
+
+def _observation_rows(session):
+    return session.query(
+        Observation.id,
+        Observation.datetime,
+        Flora.name.label('flora_name'),
+        User.username,
+        Observation.lat,
+        Observation.lon,
+        Observation.address,
+        Observation.description
+    ).join(Flora).join(User)
+
+
+def _db_observations_df():
+    global _observation_watermark
+    session = _snapshot_session()
+    try:
+        watermark = DataMarker(*session.execute(_marker_query()).one())
+        df = pd.DataFrame(_observation_rows(session).all(), columns=_OBSERVATION_COLUMNS)
+    finally:
+        try:
+            session.close()
+        except Exception:
+            pass
+    _observation_watermark = watermark
+    return df
+
+
+def _append_rows(frame, delta):
+    """Concatenate `delta` onto `frame`, keeping the cached frame's dtypes."""
+    combined = pd.concat([frame, delta], ignore_index=True)
+    for col in frame.columns:
+        if combined[col].dtype != frame[col].dtype:
+            try:
+                combined[col] = combined[col].astype(frame[col].dtype)
+            except (TypeError, ValueError):
+                pass
+    return combined
+
+
+def _db_observations_delta(old_key, old_frame):
+    """Bring a cached DB frame up to date by fetching only rows changed since its watermark.
+
+    Inserted and edited rows are found through the indexed
+    `observations.change_seq` and replace their cached versions. Returns
+    None (full rebuild) when the cached frame did not come from the
+    database, rows were deleted since, or the `writes` counter moved by
+    more than the rows found: a transaction committed rows numbered below
+    the watermark (or a row was edited twice).
+    """
+    global _observation_watermark
+    watermark = _observation_watermark
+    if old_key is None or old_key[0] != 'db' or watermark is None or not len(old_frame):
+        return None
+    session = _snapshot_session()
+    try:
+        marker = DataMarker(*session.execute(_marker_query()).one())
+        if marker.deletes != watermark.deletes:
+            return None
+        if marker == watermark:
+            return old_frame
+        tracked = watermark.change_seq is not None and marker.change_seq is not None
+        if tracked:
+            changed = Observation.change_seq > watermark.change_seq
+        else:
+            # No change tracking on this database: only new rows can be seen
+            changed = Observation.id > (watermark.observation_id or 0)
+        changed_ids = [row_id for (row_id,) in session.query(Observation.id).filter(changed)]
+        if tracked and None not in (marker.writes, watermark.writes) \
+                and marker.writes - watermark.writes != len(changed_ids):
+            return None
+        delta = pd.DataFrame(
+            _observation_rows(session).filter(changed).order_by(Observation.id).all(), columns=_OBSERVATION_COLUMNS
+        )
+    finally:
+        session.close()
+    _observation_watermark = marker
+    # Edited rows (and ones that lost their flora/user) replace their cached version
+    stale = old_frame['id'].isin(changed_ids)
+    if not stale.any():
+        return _append_rows(old_frame, delta) if len(delta) else old_frame
+    return _append_rows(old_frame[~stale], delta).sort_values('id', kind='stable', ignore_index=True)
+
+
+@timed('get_observations_df')
+def get_observations_df():
+    """Get observations as a pandas DataFrame. Uses DB if reachable, otherwise CSV fallback.
+
+    Results come from a cache shared by all sessions and are only refreshed
+    after a write (or, for the CSV fallback, when the file changes on disk).
+    A refresh is incremental: on the database only rows inserted or edited
+    since the cached watermark are fetched, and the CSV store tails the
+    file. Only a delete on the database triggers a full reload.
+    """
+    key = _data_key()
+    if key[0] == 'csv':
+        return _observation_cache.get(key, _fallback_observations_df)
 
     # If engine exists, attempt DB query but fall back on any SQL errors
+    try:
+        return _observation_cache.get(key, _db_observations_df, _db_observations_delta)
+    except (OperationalError, SQLAlchemyError) as exc:
+        # Fall back to CSV if the DB operation fails at runtime
+        if isinstance(exc, OperationalError):
+            _db_health.record_failure(exc)
+        key = ('csv', _data_generation.value, file_signature(_FALLBACK_CSV))
+        return _observation_cache.get(key, _fallback_observations_df)
+
+
+# Grid aggregates for the map, built from the cached observations and then
+# kept current by add_observation without a rebuild
+_map_aggregates = None
+_map_aggregates_key = None
+_map_lock = threading.Lock()
+
+
+@timed('get_map_cells')
+def get_map_cells(zoom, bbox=None):
+    """Return aggregated map cells (lat, lon, count, top_flora, breakdown) for `zoom`.
+
+    `bbox` is an optional (min_lat, min_lon, max_lat, max_lon) viewport.
+    """
+    global _map_aggregates, _map_aggregates_key
+    key = _data_key()
+    with _map_lock:
+        hit = _map_aggregates is not None and _map_aggregates_key == key
+        metrics.cache_lookup('map_cells', hit)
+        if not hit:
+            _map_aggregates = MapAggregates.from_frame(get_observations_df())
+            _map_aggregates_key = key
+        return _map_aggregates.cells(zoom, bbox)
+
+
+def _only_one_insert(previous_key, key):
+    """True when `key` differs from `previous_key` by exactly one inserted observation."""
+    if key[0] != 'db':
+        return True
+    before, after = previous_key[2], key[2]
+    if before is None or after is None:
+        return False
+    if (before.deletes, before.recipe_id) != (after.deletes, after.recipe_id):
+        return False
+    if after.change_seq is not None:
+        return after.change_seq == (before.change_seq or 0) + 1
+    return after.observation_id == (before.observation_id or 0) + 1
+
+
+def _update_map_aggregates(previous_key, lat, lon, flora_name):
+    """Fold a new observation into the map aggregates if they were current before the write.
+
+    On the database they are rebuilt instead when other writes landed meanwhile.
+    """
+    global _map_aggregates_key
+    with _map_lock:
+        if _map_aggregates is not None and _map_aggregates_key == previous_key:
+            key = _data_key()
+            if _only_one_insert(previous_key, key):
+                _map_aggregates.add(lat, lon, flora_name)
+                _map_aggregates_key = key
+
+
+def _rollups_to_analytics(pairs, per_flora=None, per_user=None, observations=None):
+    """Shape (flora, user) -> count rollups into the frames the Analytics page draws."""
+    per_flora_user = pd.DataFrame(
+        [(f, u, c) for (f, u), c in pairs.items()], columns=['flora_name', 'username', 'count']
+    ).sort_values(['flora_name', 'username'], ignore_index=True)
+    if per_flora is None:
+        per_flora = per_flora_user.groupby('flora_name')['count'].sum().to_dict()
+    if per_user is None:
+        per_user = per_flora_user.groupby('username')['count'].sum().to_dict()
+    per_flora = pd.Series(per_flora, dtype='int64').rename_axis('flora_name').rename('count')
+    per_user = pd.Series(per_user, dtype='int64').rename_axis('username').rename('count')
+    return {
+        'observations': int(per_flora_user['count'].sum()) if observations is None else observations,
+        'flora_count': len(per_flora),
+        'user_count': len(per_user),
+        'per_flora': per_flora.sort_values(ascending=False, kind='stable').reset_index(),
+        'per_user': per_user.sort_values(ascending=False, kind='stable').reset_index(),
+        'per_flora_user': per_flora_user,
+    }
+
+
+def _db_analytics():
+    # One GROUP BY over the joined rows; every other rollup is derived from it
+    session = get_db_session()
+    try:
+        rows = session.query(
+            Flora.name, User.username, func.count(Observation.id)
+        ).select_from(Observation).join(Flora).join(User).group_by(Flora.name, User.username).all()
+    finally:
+        session.close()
+    return _rollups_to_analytics({(f, u): c for f, u, c in rows})
+
+
+def _store_analytics(store):
+    rollups = store.rollups()
+    return _rollups_to_analytics(
+        rollups['per_flora_user'], rollups['per_flora'], rollups['per_user'], rollups['observations']
+    )
+
+
+_analytics_cache = (None, None)
+
+
+@timed('get_analytics')
+def get_analytics():
+    """Return observation rollups for the Analytics page without loading raw rows.
+
+    Keys: `observations`, `flora_count`, `user_count` and the DataFrames
+    `per_flora` (flora_name, count), `per_user` (username, count) and
+    `per_flora_user` (flora_name, username, count). On the database this is
+    a single GROUP BY; on the CSV fallback it reads counters the store keeps
+    up to date on every append. Cached per data generation.
+    """
+    global _analytics_cache
+    key = _data_key()
+    cached_key, cached = _analytics_cache
+    metrics.cache_lookup('analytics', cached_key == key)
+    if cached_key != key:
+        cached = _db_or_fallback(_db_analytics, _store_analytics)
+        _analytics_cache = (key, cached)
+    return {k: v.copy() if isinstance(v, pd.DataFrame) else v for k, v in cached.items()}
+
+
+_EXPORT_CHUNKSIZE = 50000
+
+
+def _db_observation_chunks(chunksize):
+    # Keyset pages rather than one long-lived cursor
+    after_id = None
+    while True:
+        df, after_id = _db_query_observations(after_id=after_id, limit=chunksize)
+        if len(df):
+            yield df
+        if after_id is None:
+            return
+
+
+def _store_observation_chunks(chunksize):
+    df = _get_fallback_store().to_dataframe()
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+def iter_observation_chunks(chunksize=_EXPORT_CHUNKSIZE):
+    """Yield all observations as DataFrames of at most `chunksize` rows."""
+    if _get_engine() is None:
+        return _store_observation_chunks(chunksize)
+    return _db_observation_chunks(chunksize)
+
+
+_export_cache = {}
+_export_lock = threading.Lock()
+
+
+def _build_export(fmt, chunks):
+    buf = io.BytesIO()
+    write_export(fmt, chunks, buf)
+    return buf.getvalue()
+
+
+@timed('export_observations')
+def export_observations(fmt='csv'):
+    """Return all observations encoded as `fmt` (see `database.export.EXPORT_FORMATS`).
+
+    Rows are streamed chunk by chunk into the encoder, and the result is
+    cached per data generation so repeated downloads reuse the same bytes.
+    """
+    global _export_cache
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    with _export_lock:
+        key = _data_key()
+        cached = _export_cache.get((key, fmt))
+        metrics.cache_lookup('export', cached is not None)
+        if cached is not None:
+            return cached
+        if key[0] == 'csv':
+            data = _build_export(fmt, _store_observation_chunks(_EXPORT_CHUNKSIZE))
+        else:
+            try:
+                data = _build_export(fmt, _db_observation_chunks(_EXPORT_CHUNKSIZE))
+            except (OperationalError, SQLAlchemyError) as exc:
+                if isinstance(exc, OperationalError):
+                    _db_health.record_failure(exc)
+                data = _build_export(fmt, _store_observation_chunks(_EXPORT_CHUNKSIZE))
+        # Keep only exports of the current data
+        _export_cache = {k: v for k, v in _export_cache.items() if k[0] == key}
+        _export_cache[(key, fmt)] = data
+        return data
+
+
+# Flora/user name pickers: rebuilt only when a write creates a new name. On the
+# CSV store the vocabulary size is the key, since names are only ever added.
+_dimension_generation = DataGeneration()
+_dimensions = {}
+_dimensions_lock = threading.Lock()
+
+
+def _db_dimension_names(column):
+    session = get_db_session()
+    try:
+        return [name for (name,) in session.query(column).distinct()]
+    finally:
+        session.close()
+
+
+def _dimension(kind):
+    column = Flora.name if kind == 'flora' else User.username
+
+    def from_store(store):
+        names = store.flora_names() if kind == 'flora' else store.usernames()
+        return ('csv', id(store), len(names)), names
+
+    with _dimensions_lock:
+        cached_key, cached = _dimensions.get(kind, (None, None))
+        engine = _get_engine()
+        marker = _db_marker(engine) if engine is not None else None
+        # Names added by other processes show up as a new max flora/user id
+        newest = None if marker is None else (marker.flora_id if kind == 'flora' else marker.user_id)
+        db_key = ('db', _dimension_generation.value, newest)
+        if cached_key == db_key and engine is not None:
+            metrics.cache_lookup(f'{kind}_names', True)
+            return cached
+        key, names = _db_or_fallback(lambda: (db_key, _db_dimension_names(column)), from_store)
+        metrics.cache_lookup(f'{kind}_names', key == cached_key)
+        if key != cached_key:
+            cached = Dimension(names)
+            _dimensions[kind] = (key, cached)
+        return cached
+
+
+@timed('get_flora_names')
+def get_flora_names(prefix='', limit=None):
+    """Return distinct flora names starting with `prefix` (accent/case-insensitive), sorted.
+
+    Served from a process-wide cache that is only rebuilt when a new flora
+    appears.
+    """
+    return _dimension('flora').search(prefix, limit)
+
+
+@timed('get_usernames')
+def get_usernames(prefix='', limit=None):
+    """Return distinct usernames starting with `prefix`, sorted; cached like `get_flora_names`."""
+    return _dimension('user').search(prefix, limit)
+
+
+def _db_or_fallback(db_query, fallback_query):
+    """Run `db_query()` when the DB is up, else `fallback_query(store)` on the CSV store."""
+    if _get_engine() is None:
+        return fallback_query(_get_fallback_store())
+    try:
+        return db_query()
+    except (OperationalError, SQLAlchemyError) as exc:
+        if isinstance(exc, OperationalError):
+            _db_health.record_failure(exc)
+        return fallback_query(_get_fallback_store())
+
+
+def _bbox_conditions(min_lat, min_lon, max_lat, max_lon):
+    """SQL conditions for a bounding box; the geohash prefixes let the index narrow the scan."""
+    conditions = [Observation.lat.between(min_lat, max_lat), Observation.lon.between(min_lon, max_lon)]
+    prefixes = geohash_prefixes_for_bbox(min_lat, min_lon, max_lat, max_lon)
+    if prefixes != ['']:
+        conditions.append(or_(*[Observation.geohash.like(p + '%') for p in prefixes]))
+    return conditions
+
+
+def _db_bbox_df(min_lat, min_lon, max_lat, max_lon, flora_name=None):
+    """Query observations in a bounding box, using the geohash index to narrow the scan."""
     session = get_db_session()
     try:
-        observations = session.query(
+        query = session.query(
             Observation.id,
             Observation.datetime,
             Flora.name.label('flora_name'),
@@ -102,53 +780,216 @@ def get_observations_df():
             Observation.lon,
             Observation.address,
             Observation.description
-        ).join(Flora).join(User).all()
+        ).join(Flora).join(User).filter(*_bbox_conditions(min_lat, min_lon, max_lat, max_lon))
+        if flora_name:
+            query = query.filter(Flora.name.in_(_exact_names('flora', flora_name)))
+        return pd.DataFrame(query.all(), columns=_OBSERVATION_COLUMNS)
+    finally:
+        session.close()
+
+
+def _with_distance(df, lat, lon):
+    df = df.copy()
+    df['distance_m'] = haversine_m(lat, lon, df['lat'].astype(float), df['lon'].astype(float))
+    return df.sort_values('distance_m', kind='stable').reset_index(drop=True)
+
+
+@timed('get_observations_in_bbox')
+def get_observations_in_bbox(min_lat, min_lon, max_lat, max_lon, flora_name=None):
+    """Return observations inside a lat/lon bounding box, optionally for one flora.
+
+    `flora_name` is matched ignoring accents and case, on the database as on the CSV store.
+    """
+    def from_store(store):
+        return store.to_dataframe(store.positions_in_bbox(min_lat, min_lon, max_lat, max_lon, flora_name))
+
+    return _db_or_fallback(
+        lambda: _db_bbox_df(min_lat, min_lon, max_lat, max_lon, flora_name),
+        from_store,
+    )
+
+
+@timed('get_observations_near')
+def get_observations_near(lat, lon, radius_m=1000, flora_name=None):
+    """Return observations within `radius_m` meters of (lat, lon), nearest first.
 
-        df = pd.DataFrame(observations)
+    The result has an extra `distance_m` column. `flora_name` matches as in
+    `get_observations_in_bbox`.
+    """
+    def from_store(store):
+        positions, distances = store.positions_within(lat, lon, radius_m, flora_name)
+        df = store.to_dataframe(positions)
+        df['distance_m'] = distances
         return df
-    except (OperationalError, SQLAlchemyError):
-        # Fall back to CSV if the DB operation fails at runtime
-        store = FallbackStore()
-        df = pd.DataFrame(store.all())
-        for c in ['id', 'datetime', 'flora_name', 'username', 'lat', 'lon', 'address', 'description']:
-            if c not in df.columns:
-                df[c] = None
+
+    def from_db():
+        df = _with_distance(_db_bbox_df(*bbox_around(lat, lon, radius_m), flora_name), lat, lon)
+        return df[df['distance_m'] <= radius_m].reset_index(drop=True)
+
+    return _db_or_fallback(from_db, from_store)
+
+
+@timed('get_nearest_observations')
+def get_nearest_observations(lat, lon, k=10, flora_name=None, max_radius_m=20_000_000):
+    """Return the `k` observations closest to (lat, lon), with a `distance_m` column."""
+    def from_store(store):
+        positions, distances = store.nearest_positions(lat, lon, k, flora_name)
+        df = store.to_dataframe(positions)
+        df['distance_m'] = distances
         return df
-    finally:
-        try:
-            session.close()
-        except Exception:
-            pass
 
+    def from_db():
+        # Grow the search radius until it holds k rows; anything outside is farther away
+        radius = 500.0
+        while True:
+            df = _with_distance(_db_bbox_df(*bbox_around(lat, lon, radius), flora_name), lat, lon)
+            df = df[df['distance_m'] <= radius]
+            if len(df) >= k or radius >= max_radius_m:
+                return df.head(k).reset_index(drop=True)
+            radius *= 4
+
+    return _db_or_fallback(from_db, from_store)
+
+
+_OBSERVATION_EXPRESSIONS = {
+    'id': Observation.id,
+    'datetime': Observation.datetime,
+    'flora_name': Flora.name.label('flora_name'),
+    'username': User.username,
+    'lat': Observation.lat,
+    'lon': Observation.lon,
+    'address': Observation.address,
+    'description': Observation.description,
+}
+
+
+def _names(value):
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _exact_names(kind, value):
+    """Stored flora/user names matching `value` ignoring accents and case, as the CSV store matches."""
+    dimension = _dimension(kind)
+    return sorted({match for name in _names(value) for match in dimension.matching(name)})
+
+
+def _query_columns(columns):
+    if columns is None:
+        return list(_OBSERVATION_COLUMNS)
+    unknown = set(columns) - set(_OBSERVATION_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown observation columns: {sorted(unknown)}")
+    # The id is always returned: it is the paging cursor
+    return ['id'] + [c for c in columns if c != 'id']
+
+
+def _db_query_observations(flora=None, user=None, start=None, end=None, bbox=None, columns=None,
+                           after_id=None, limit=1000):
+    columns = _query_columns(columns)
+    stmt = select(*[_OBSERVATION_EXPRESSIONS[c] for c in columns]).select_from(Observation).join(Flora).join(User)
+    if flora is not None:
+        stmt = stmt.where(Flora.name.in_(_exact_names('flora', flora)))
+    if user is not None:
+        stmt = stmt.where(User.username.in_(_exact_names('user', user)))
+    if start is not None:
+        stmt = stmt.where(Observation.datetime >= start)
+    if end is not None:
+        stmt = stmt.where(Observation.datetime < end)
+    if bbox is not None:
+        stmt = stmt.where(*_bbox_conditions(*bbox))
+    if after_id is not None:
+        stmt = stmt.where(Observation.id > after_id)
+    stmt = stmt.order_by(Observation.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    engine = _get_engine()
+    if engine is None:
+        # The breaker opened after the caller chose the database (or between
+        # export pages): fail like a lost connection so the caller falls back
+        raise _unavailable()
+    with engine.connect() as conn:
+        df = pd.DataFrame(conn.execute(stmt).all(), columns=columns)
+    return df, _next_cursor(df, limit)
+
+
+def _store_query_observations(store, flora=None, user=None, start=None, end=None, bbox=None, columns=None,
+                              after_id=None, limit=1000):
+    columns = _query_columns(columns)
+    positions = store.select_positions(flora, user, start, end, bbox, after_id, limit)
+    df = store.to_dataframe(positions)[columns]
+    return df, _next_cursor(df, limit)
+
+
+def _next_cursor(df, limit):
+    if limit is None or limit <= 0 or df.empty or len(df) < limit:
+        return None
+    return int(df['id'].iloc[-1])
+
+
+@timed('query_observations')
+def query_observations(flora=None, user=None, start=None, end=None, bbox=None, columns=None,
+                       after_id=None, limit=1000):
+    """Return one page of observations matching the filters, in id order.
+
+    - `flora` / `user`: a name or a list of names, matched ignoring accents
+      and case on both backends (`'nispero'` finds `'Níspero'`).
+    - `start` / `end`: datetime range, start inclusive and end exclusive.
+    - `bbox`: (min_lat, min_lon, max_lat, max_lon).
+    - `columns`: the columns to return (`id` is always included).
+
+    Filters run in SQL on the database and as vectorized masks on the CSV
+    store. Paging is keyset based: pass the returned cursor as `after_id`
+    to get the next page. Returns `(df, next_after_id)`, where
+    `next_after_id` is None on the last page. `limit=None` returns every
+    match at once; a negative `limit` raises ValueError.
+    """
+    if limit is not None and limit < 0:
+        raise ValueError(f"limit must be None or >= 0, got {limit}")
+    filters = dict(flora=flora, user=user, start=start, end=end, bbox=bbox, columns=columns,
+                   after_id=after_id, limit=limit)
+    return _db_or_fallback(
+        lambda: _db_query_observations(**filters),
+        lambda store: _store_query_observations(store, **filters)
+    )
+
+
+def iter_observation_pages(page_size=1000, **filters):
+    """Yield every page of `query_observations(**filters)` as a DataFrame."""
+    if page_size is None or page_size < 1:
+        raise ValueError(f"page_size must be at least 1, got {page_size}")
+    after_id = None
+    while True:
+        df, after_id = query_observations(after_id=after_id, limit=page_size, **filters)
+        if len(df):
+            yield df
+        if after_id is None:
+            return
+
+
+@timed('add_observation')
 def add_observation(flora_name, username, lat, lon, address, description):
     """Add a new observation to the database or append to CSV when no DB is configured."""
-    if _get_engine() is None:
-        # Append to CSV
-        csv_path = Path(__file__).parent.parent / 'data' / 'flora_data.csv'
-        store = FallbackStore(csv_path)
-        rows = store.all()
-        max_id = max((r['id'] or 0) for r in rows) if rows else 0
-        new_id = max_id + 1
-        new_row = {
+    previous_key = _data_key()
+    if previous_key[0] == 'csv':
+        # Append one line to the CSV; the id comes from the appender's sequence file
+        new_id = _get_csv_appender().append({
             'datetime': datetime.now(),
             'address': address or '',
-            'lat': lat or '',
-            'lon': lon or '',
+            'lat': lat if lat is not None else '',
+            'lon': lon if lon is not None else '',
             'description': description or '',
-            'id': new_id,
             'flora_name': flora_name,
             'username': username,
-        }
-        # Append using pandas to preserve CSV structure
-        df_new = pd.DataFrame([new_row])
-        # Ensure we write without index and with same columns order as original file if possible
-        df_new.to_csv(csv_path, mode='a', header=False, index=False)
+        })
+        _data_generation.bump()
+        _update_map_aggregates(previous_key, lat, lon, flora_name)
         return new_id
 
     session = get_db_session()
 
     # Get or create flora
     flora = session.query(Flora).filter_by(name=flora_name).first()
+    new_name = flora is None
     if not flora:
         flora = Flora(name=flora_name)
         session.add(flora)
@@ -156,6 +997,7 @@ def add_observation(flora_name, username, lat, lon, address, description):
 
     # Get or create user
     user = session.query(User).filter_by(username=username).first()
+    new_name = new_name or user is None
     if not user:
         user = User(username=username)
         session.add(user)
@@ -169,73 +1011,379 @@ def add_observation(flora_name, username, lat, lon, address, description):
         lat=lat,
         lon=lon,
         address=address,
-        description=description
+        description=description,
+        geohash=geohash_encode(lat, lon) if lat is not None and lon is not None else None
     )
 
     session.add(observation)
     session.commit()
     observation_id = observation.id
     session.close()
+    _data_generation.bump()
+    if new_name:
+        _dimension_generation.bump()
+    _update_map_aggregates(previous_key, lat, lon, flora_name)
     return observation_id
 
 
-def get_recipes():
-    """Get all recipes with their ingredients. Uses DB or a JSON fallback file."""
+def _new_rows(rows, hashes, known):
+    """Drop rows whose hash is in `known` or repeats an earlier row's."""
+    seen = set(known)
+    kept_rows, kept_hashes = [], []
+    for row, message_hash in zip(rows, hashes):
+        if message_hash not in seen:
+            seen.add(message_hash)
+            kept_rows.append(row)
+            kept_hashes.append(message_hash)
+    return kept_rows, kept_hashes
+
+
+def _imported_hashes_path():
+    return _FALLBACK_CSV.with_name(_FALLBACK_CSV.name + '.imported')
+
+
+# Hashes logged next to the CSV, re-read only when the log changed on disk
+_imported_hashes = (None, set())
+
+
+def _csv_imported_hashes(path):
+    global _imported_hashes
+    key = (path, file_signature(path))
+    if _imported_hashes[0] != key:
+        known = set(path.read_text(encoding='utf-8').split()) if path.exists() else set()
+        _imported_hashes = (key, known)
+    return _imported_hashes[1]
+
+
+def _csv_add_observations(rows, hashes):
+    global _imported_hashes
+    path = _imported_hashes_path()
+    with file_lock(path):
+        if hashes is not None:
+            known = _csv_imported_hashes(path)
+            rows, hashes = _new_rows(rows, hashes, known)
+        if not rows:
+            return 0
+        _get_csv_appender().append_many([{
+            'datetime': row.get('datetime') or datetime.now(),
+            'address': row.get('address') or '',
+            'lat': row['lat'] if row.get('lat') is not None else '',
+            'lon': row['lon'] if row.get('lon') is not None else '',
+            'description': row.get('description') or '',
+            'flora_name': row['flora_name'],
+            'username': row['username'],
+        } for row in rows])
+        if hashes:
+            # Logged after the rows: a crash in between re-imports this batch rather than losing it
+            with open(path, 'a', encoding='utf-8') as fh:
+                fh.write(''.join(f'{h}\n' for h in hashes))
+                fh.flush()
+                os.fsync(fh.fileno())
+            known.update(hashes)
+            _imported_hashes = ((path, file_signature(path)), known)
+    return len(rows)
+
+
+def _db_add_observations(rows, hashes):
+    from database.db_init import _get_or_create_ids, _insert_observations, imported_messages
+
+    engine = _get_engine()
+    if hashes is not None:
+        imported_messages.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        if hashes is not None:
+            known = conn.execute(
+                select(imported_messages.c.hash).where(imported_messages.c.hash.in_(set(hashes)))
+            ).scalars().all()
+            rows, hashes = _new_rows(rows, hashes, known)
+        if not rows:
+            return 0
+        users = _get_or_create_ids(conn, User.__table__, 'username', [row['username'] for row in rows])
+        floras = _get_or_create_ids(conn, Flora.__table__, 'name', [row['flora_name'] for row in rows])
+        _insert_observations(conn, [{
+            'flora_id': floras[row['flora_name']],
+            'user_id': users[row['username']],
+            'datetime': row.get('datetime') or datetime.now(),
+            'lat': row.get('lat'),
+            'lon': row.get('lon'),
+            'address': row.get('address'),
+            'description': row.get('description'),
+            'geohash': geohash_encode(row['lat'], row['lon'])
+            if row.get('lat') is not None and row.get('lon') is not None else None,
+        } for row in rows])
+        if hashes:
+            now = datetime.now()
+            conn.execute(insert(imported_messages), [{'hash': h, 'imported_at': now} for h in hashes])
+    _dimension_generation.bump()
+    return len(rows)
+
+
+@timed('add_observations')
+def add_observations(rows, message_hashes=None):
+    """Write many observations at once and return how many were written.
+
+    `rows` are dicts with the `add_observation` fields (flora_name,
+    username, lat, lon, address, description) plus an optional `datetime`.
+    The database gets them in one transaction (COPY on PostgreSQL), the CSV
+    in one append. With `message_hashes` (one per row), rows whose hash was
+    imported before, or repeats one earlier in `rows`, are skipped, so
+    importing the same source twice is harmless.
+    """
+    rows = list(rows)
+    hashes = list(message_hashes) if message_hashes is not None else None
+    if hashes is not None and len(hashes) != len(rows):
+        raise ValueError("message_hashes must have one hash per row")
     if _get_engine() is None:
-        json_path = Path(__file__).parent.parent / 'data' / 'recipes_fallback.json'
-        if not json_path.exists():
-            return []
-        with open(json_path, 'r', encoding='utf-8') as fh:
-            return json.load(fh)
+        written = _csv_add_observations(rows, hashes)
+    else:
+        written = _db_add_observations(rows, hashes)
+    if written:
+        _data_generation.bump()
+    return written
+
+
+_DEDUP_COLUMNS = ['id', 'flora', 'lat', 'lon', 'datetime']
+
+
+# Bounding boxes / ids per statement when loading an incremental dedup run's neighbourhood
+_DEDUP_BOXES_PER_QUERY = 100
+_DEDUP_IDS_PER_QUERY = 500
+
+
+def _db_dedup_rows(conn, *conditions):
+    obs = Observation.__table__
+    return conn.execute(
+        select(obs.c.id, obs.c.flora_id, obs.c.lat, obs.c.lon, obs.c.datetime, obs.c.canonical_id).where(*conditions)
+    ).all()
+
+
+def _db_dedup_neighbourhood(conn, checked_through, distance_m):
+    """Rows above `checked_through`, older rows of their floras nearby, and the links of their groups.
+
+    The neighbourhood is fetched per occupied grid cell with lat/lon range
+    conditions (served by the lat/lon index), so an incremental run reads
+    only what the new rows can be compared with, not the whole table.
+    """
+    obs = Observation.__table__
+    rows = _db_dedup_rows(conn, obs.c.id > checked_through)
+    located = [r for r in rows if r.lat is not None and r.lon is not None and r.flora_id is not None]
+    boxes = neighbour_bboxes([r.lat for r in located], [r.lon for r in located], distance_m)
+    floras = sorted({r.flora_id for r in located})
+    for start in range(0, len(boxes), _DEDUP_BOXES_PER_QUERY):
+        area = or_(*[
+            and_(obs.c.lat.between(min_lat, max_lat), obs.c.lon.between(min_lon, max_lon))
+            for min_lat, min_lon, max_lat, max_lon in boxes[start:start + _DEDUP_BOXES_PER_QUERY]
+        ])
+        rows += _db_dedup_rows(conn, obs.c.id <= checked_through, obs.c.flora_id.in_(floras), area)
+    rows = list({r.id: r for r in rows}.values())
+    existing = {r.id: r.canonical_id for r in rows if r.canonical_id is not None}
+    # Other members of the groups these rows belong to, so merged groups are relinked as a whole
+    roots = sorted({r.canonical_id or r.id for r in rows})
+    for start in range(0, len(roots), _DEDUP_IDS_PER_QUERY):
+        existing.update(conn.execute(
+            select(obs.c.id, obs.c.canonical_id)
+            .where(obs.c.canonical_id.in_(roots[start:start + _DEDUP_IDS_PER_QUERY]))
+        ).all())
+    return rows, existing
+
+
+def _db_deduplicate(distance_m, window_days, incremental, apply):
+    engine = _get_engine()
+    obs = Observation.__table__
+    dedup_checkpoints.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        checkpoint = conn.execute(
+            select(dedup_checkpoints.c.params, dedup_checkpoints.c.checked_through_id)
+            .where(dedup_checkpoints.c.source == 'observations')
+        ).first()
+        stored_params, checked_through = checkpoint if checkpoint is not None else (None, 0)
+        if incremental and checked_through and stored_params == params_signature(distance_m, window_days):
+            rows, existing = _db_dedup_neighbourhood(conn, checked_through, distance_m)
+        else:
+            rows = _db_dedup_rows(conn)
+            existing = {r.id: r.canonical_id for r in rows if r.canonical_id is not None}
+    frame = pd.DataFrame([r[:5] for r in rows], columns=_DEDUP_COLUMNS)
+    result = plan_links(frame, existing, checked_through, stored_params, distance_m, window_days, incremental)
+    if apply:
+        changes = [{'dup_id': p.duplicate_id, 'canon_id': p.canonical_id} for p in result['proposals']]
+        changes += [{'dup_id': obs_id, 'canon_id': None} for obs_id in result['cleared']]
+        with engine.begin() as conn:
+            if changes:
+                conn.execute(
+                    update(obs).where(obs.c.id == bindparam('dup_id')).values(canonical_id=bindparam('canon_id')),
+                    changes,
+                )
+            values = {'params': result['params'], 'checked_through_id': result['checked_through_id'],
+                      'updated_at': datetime.now()}
+            stored = conn.execute(
+                update(dedup_checkpoints).where(dedup_checkpoints.c.source == 'observations').values(**values)
+            )
+            if stored.rowcount == 0:
+                conn.execute(insert(dedup_checkpoints).values(source='observations', **values))
+    return dict(result, backend='db')
+
+
+def _store_deduplicate(distance_m, window_days, incremental, apply):
+    df = _get_fallback_store().to_dataframe()
+    df = df[df['id'].notna()]
+    frame = pd.DataFrame({
+        'id': df['id'].to_numpy(dtype='int64'),
+        'flora': df['flora_name'].cat.codes.to_numpy(),
+        'lat': df['lat'].to_numpy(),
+        'lon': df['lon'].to_numpy(),
+        'datetime': df['datetime'].to_numpy(),
+    })
+    links = LinkStore(_FALLBACK_CSV)
+    state = links.load()
+    result = plan_links(frame, state['links'], state['checked_through_id'], state['params'],
+                        distance_m, window_days, incremental)
+    if apply:
+        links.save(result['links'], result['checked_through_id'], result['params'])
+    return dict(result, backend='csv')
+
+
+@timed('deduplicate_observations')
+def deduplicate_observations(distance_m=DEFAULT_DISTANCE_M, window_days=None, incremental=True, apply=False):
+    """Find near-duplicate observations and, with `apply`, store their canonical links.
 
+    Duplicates are observations of the same flora within `distance_m` meters
+    (and `window_days` days, if given) of each other; each group is linked to
+    its lowest id. Incremental runs only check observations added since the
+    last applied run. Links go to `observations.canonical_id` on the
+    database and to the `<csv>.dedup.json` sidecar on the CSV fallback;
+    reads are not changed by them. Returns the plan from
+    `database.dedup.plan_links` plus the `backend` it ran on; on the
+    database an incremental run's `links` only cover the groups the new
+    observations touch.
+    """
+    if _get_engine() is None:
+        return _store_deduplicate(distance_m, window_days, incremental, apply)
+    return _db_deduplicate(distance_m, window_days, incremental, apply)
+
+
+_RECIPES_JSONL = Path(__file__).parent.parent / 'data' / 'recipes.jsonl'
+_RECIPES_LEGACY_JSON = Path(__file__).parent.parent / 'data' / 'recipes_fallback.json'
+_recipe_store = None
+_recipe_store_key = None
+_recipes_cache = (None, None)
+_recipes_lock = threading.Lock()
+
+
+def _get_recipe_store():
+    """Return the shared JSONL recipe store, reading only lines appended since the last call."""
+    global _recipe_store, _recipe_store_key
+    with _recipes_lock:
+        if _recipe_store is None or _recipe_store.path != _RECIPES_JSONL:
+            _recipe_store = RecipeStore(_RECIPES_JSONL, _RECIPES_LEGACY_JSON)
+            _recipe_store_key = file_signature(_RECIPES_JSONL)
+        key = file_signature(_RECIPES_JSONL)
+        if key != _recipe_store_key:
+            _recipe_store.refresh()
+            _recipe_store_key = key
+        return _recipe_store
+
+
+def _db_recipes():
+    # One query: recipes joined to their ingredients and each ingredient's flora
     session = get_db_session()
-    recipes = session.query(Recipe).all()
-    result = []
-    for recipe in recipes:
-        ingredients = [ri.flora.name for ri in recipe.ingredients]
-        result.append({
+    try:
+        recipes = session.query(Recipe).options(
+            joinedload(Recipe.ingredients).joinedload(RecipeIngredient.flora)
+        ).order_by(Recipe.id).all()
+        result = [{
             'id': recipe.id,
             'name': recipe.name,
             'prep': recipe.prep,
-            'ingredients': ingredients
-        })
-    session.close()
-    return result
+            'ingredients': [ri.flora.name for ri in recipe.ingredients]
+        } for recipe in recipes]
+    finally:
+        session.close()
+    return result, IngredientIndex(result)
 
 
-def add_recipe(name, prep, flora_names):
-    """Add a new recipe with ingredients to DB or to a JSON fallback file."""
+def _cached_db_recipes():
+    global _recipes_cache
+    key = _data_key()
+    cached_key, cached = _recipes_cache
+    metrics.cache_lookup('recipes', cached_key == key)
+    if cached_key != key:
+        cached = _db_recipes()
+        _recipes_cache = (key, cached)
+    return cached
+
+
+def _copy_recipes(recipes):
+    return [dict(r, ingredients=list(r['ingredients'])) for r in recipes]
+
+
+def _recipes_db_or_fallback(db_query, fallback_query):
+    """Like `_db_or_fallback`, but the fallback gets the JSONL recipe store."""
     if _get_engine() is None:
-        json_path = Path(__file__).parent.parent / 'data' / 'recipes_fallback.json'
-        if json_path.exists():
-            with open(json_path, 'r', encoding='utf-8') as fh:
-                data = json.load(fh)
-        else:
-            data = []
-        new_id = max((r.get('id', 0) for r in data), default=0) + 1
-        entry = {'id': new_id, 'name': name, 'prep': prep, 'ingredients': flora_names}
-        data.append(entry)
-        with open(json_path, 'w', encoding='utf-8') as fh:
-            json.dump(data, fh, ensure_ascii=False, indent=2)
-        return new_id
+        return fallback_query(_get_recipe_store())
+    try:
+        return db_query()
+    except (OperationalError, SQLAlchemyError) as exc:
+        if isinstance(exc, OperationalError):
+            _db_health.record_failure(exc)
+        return fallback_query(_get_recipe_store())
 
-    session = get_db_session()
 
-    # Create recipe
-    recipe = Recipe(name=name, prep=prep)
-    session.add(recipe)
-    session.flush()  # To get the recipe ID
+@timed('get_recipes')
+def get_recipes():
+    """Get all recipes with their ingredients. Uses DB or a JSONL fallback file."""
+    return _recipes_db_or_fallback(lambda: _copy_recipes(_cached_db_recipes()[0]), RecipeStore.all)
 
-    # Add ingredients
-    for flora_name in flora_names:
-        flora = session.query(Flora).filter_by(name=flora_name).first()
-        if not flora:
-            flora = Flora(name=flora_name)
-            session.add(flora)
-            session.flush()
 
-        recipe_ingredient = RecipeIngredient(recipe_id=recipe.id, flora_id=flora.id)
-        session.add(recipe_ingredient)
+@timed('get_recipes_with')
+def get_recipes_with(ingredient, mode='exact'):
+    """Get recipes having an ingredient that matches `ingredient`.
 
-    session.commit()
-    session.close()
\ No newline at end of file
+    `mode` is exact, prefix or substring; matching ignores case and accents.
+    """
+    def from_db():
+        recipes, index = _cached_db_recipes()
+        by_id = {r['id']: r for r in recipes}
+        return _copy_recipes(by_id[i] for i in index.recipe_ids(ingredient, mode))
+
+    return _recipes_db_or_fallback(from_db, lambda store: store.with_ingredient(ingredient, mode))
+
+
+def _get_or_create_flora(session, names):
+    """Return ({name: Flora}, created) for `names`, creating the missing ones in one flush."""
+    found = {}
+    for flora in session.query(Flora).filter(Flora.name.in_(names)).order_by(Flora.id):
+        found.setdefault(flora.name, flora)
+    missing = [Flora(name=name) for name in names if name not in found]
+    if missing:
+        session.add_all(missing)
+        session.flush()
+        found.update((flora.name, flora) for flora in missing)
+    return found, bool(missing)
+
+
+@timed('add_recipe')
+def add_recipe(name, prep, flora_names):
+    """Add a new recipe with ingredients to DB or to a JSONL fallback file."""
+    flora_names = list(dict.fromkeys(flora_names))
+    if _get_engine() is None:
+        new_id = _get_recipe_store().append(name, prep, flora_names)
+        _data_generation.bump()
+        return new_id
+
+    session = get_db_session()
+    try:
+        recipe = Recipe(name=name, prep=prep)
+        session.add(recipe)
+        flora, created = _get_or_create_flora(session, flora_names)
+        session.flush()  # To get the recipe ID
+        session.add_all(
+            RecipeIngredient(recipe_id=recipe.id, flora_id=flora[flora_name].id) for flora_name in flora_names
+        )
+        session.commit()
+        new_id = recipe.id
+    finally:
+        session.close()
+    _data_generation.bump()
+    if created:
+        _dimension_generation.bump()
+    return new_id
@@ -1,6 +1,6 @@
 # frutapublica/database/db_init.py
 from models.models import Base, Flora, Observation, User
-from sqlalchemy import create_engine
+from sqlalchemy import Column, DateTime, Integer, String, Table, create_engine, insert, select, update
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy_utils import database_exists, create_database
 import pandas as pd
@@ -8,6 +8,11 @@ from datetime import datetime
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+import csv
+import io
+import time
+from database.spatial import geohash_encode
+from database import migrations
 
 # Load environment variables
 load_dotenv()
@@ -29,12 +34,43 @@ def init_database():
     # Create all tables
     Base.metadata.create_all(engine)
     print("Created all database tables successfully")
+    version = migrations.run_migrations(engine)
+    print(f"Database schema is at version {version}")
 
-def migrate_flora_data():
-    """Migrate existing flora.csv data to the new database"""
+def add_geohash_column(engine=None, batch_size=5000):
+    """Add and backfill `observations.geohash`; see `database.migrations.add_geohash_column`."""
+    migrations.add_geohash_column(engine or get_engine(), batch_size)
+
+# Progress of bulk imports, committed in the same transaction as each chunk so
+# a resumed import never loads a chunk twice
+import_checkpoints = Table(
+    'import_checkpoints', Base.metadata,
+    Column('source', String, primary_key=True),
+    Column('signature', String),
+    Column('rows_done', Integer, nullable=False, default=0),
+    Column('updated_at', DateTime),
+)
+
+# Hashes of chat messages already turned into observations, so re-importing
+# an export skips them (see database.whatsapp_import)
+imported_messages = Table(
+    'imported_messages', Base.metadata,
+    Column('hash', String(64), primary_key=True),
+    Column('imported_at', DateTime),
+)
+
+def migrate_flora_data(csv_path=None, bulk=True, chunksize=10000, resume=True):
+    """Migrate existing flora.csv data to the new database
+
+    With `bulk` (the default) the file is streamed in chunks of `chunksize`
+    rows; see `bulk_migrate_flora_data`. `bulk=False` keeps the original
+    row-by-row ORM import.
+    """
     # Get the path to the data file
     current_dir = Path(__file__).parent.parent  # Go up to frutapublica folder
-    csv_path = current_dir / 'data' / 'flora.csv'
+    csv_path = Path(csv_path) if csv_path else current_dir / 'data' / 'flora.csv'
+    if bulk:
+        return bulk_migrate_flora_data(csv_path, chunksize=chunksize, resume=resume)
     
     engine = get_engine()
     Session = sessionmaker(bind=engine)
@@ -95,6 +131,119 @@ def migrate_flora_data():
     finally:
         session.close()
 
+def _file_signature(path):
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+def _get_or_create_ids(conn, table, name_column, names):
+    """Return {name: id} for `names`, inserting the missing ones in one statement."""
+    names = [n for n in dict.fromkeys(names) if n is not None and n == n]
+    if not names:
+        return {}
+    column = table.c[name_column]
+    found = dict(conn.execute(select(column, table.c.id).where(column.in_(names))).all())
+    missing = [n for n in names if n not in found]
+    if missing:
+        conn.execute(insert(table), [{name_column: n} for n in missing])
+        found.update(conn.execute(select(column, table.c.id).where(column.in_(missing))).all())
+    return found
+
+_OBSERVATION_COPY_COLUMNS = ['flora_id', 'user_id', 'datetime', 'lat', 'lon', 'address', 'description', 'geohash']
+
+def _insert_observations(conn, records):
+    """Insert observation dicts with COPY on psycopg2, otherwise a Core executemany."""
+    if conn.dialect.name == 'postgresql' and conn.dialect.driver == 'psycopg2':
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator='\n')
+        # Missing values are written as \N, the NULL marker given to COPY below
+        for r in records:
+            writer.writerow(['\\N' if r[c] is None else r[c] for c in _OBSERVATION_COPY_COLUMNS])
+        buf.seek(0)
+        cursor = conn.connection.cursor()
+        cursor.copy_expert(
+            f"COPY observations ({', '.join(_OBSERVATION_COPY_COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT csv, NULL '\\N')", buf
+        )
+        cursor.close()
+    else:
+        conn.execute(insert(Observation.__table__), records)
+
+def _chunk_records(chunk, users, floras):
+    lat = pd.to_numeric(chunk['lat'], errors='coerce')
+    lon = pd.to_numeric(chunk['lon'], errors='coerce')
+    frame = pd.DataFrame({
+        'flora_id': chunk['flora inferida'].map(floras),
+        'user_id': chunk['usuario'].map(users),
+        'datetime': pd.to_datetime(chunk['datetime'], format='mixed'),
+        'lat': lat,
+        'lon': lon,
+        'address': chunk['dirección'],
+        'description': chunk['observaciones'],
+        'geohash': [geohash_encode(a, b) for a, b in zip(lat, lon)],
+    })
+    frame = frame.astype(object).where(frame.notna(), None)
+    frame['datetime'] = [d.to_pydatetime() if d is not None else None for d in frame['datetime']]
+    return frame.to_dict(orient='records')
+
+def bulk_migrate_flora_data(csv_path, chunksize=10000, resume=True, engine=None):
+    """Stream `csv_path` into the database in chunks.
+
+    Per chunk: users and flora are resolved with one set-based
+    get-or-create each, observations go in with COPY (psycopg2) or a Core
+    executemany, and the import checkpoint is advanced in the same
+    transaction. With `resume`, a rerun after a failure skips the rows
+    already committed for the same (unchanged) file. Returns the number of
+    rows imported by this run.
+    """
+    engine = engine or get_engine()
+    import_checkpoints.create(engine, checkfirst=True)
+    source = str(Path(csv_path).resolve())
+    signature = _file_signature(csv_path)
+
+    with engine.begin() as conn:
+        row = conn.execute(
+            select(import_checkpoints.c.signature, import_checkpoints.c.rows_done)
+            .where(import_checkpoints.c.source == source)
+        ).first()
+        if row is None:
+            conn.execute(insert(import_checkpoints).values(source=source, signature=signature, rows_done=0))
+            rows_done = 0
+        elif resume and row.signature == signature:
+            rows_done = row.rows_done
+        else:
+            conn.execute(
+                update(import_checkpoints).where(import_checkpoints.c.source == source)
+                .values(signature=signature, rows_done=0)
+            )
+            rows_done = 0
+    if rows_done:
+        print(f"Resuming import of {csv_path} after {rows_done} rows")
+
+    reader = pd.read_csv(csv_path, chunksize=chunksize, skiprows=range(1, rows_done + 1))
+    imported = 0
+    started = time.perf_counter()
+    for chunk in reader:
+        if chunk.empty:
+            continue
+        chunk_started = time.perf_counter()
+        with engine.begin() as conn:
+            users = _get_or_create_ids(conn, User.__table__, 'username', chunk['usuario'].tolist())
+            floras = _get_or_create_ids(conn, Flora.__table__, 'name', chunk['flora inferida'].tolist())
+            _insert_observations(conn, _chunk_records(chunk, users, floras))
+            rows_done += len(chunk)
+            conn.execute(
+                update(import_checkpoints).where(import_checkpoints.c.source == source)
+                .values(rows_done=rows_done, updated_at=datetime.now())
+            )
+        imported += len(chunk)
+        elapsed = time.perf_counter() - chunk_started
+        print(f"Imported {rows_done} rows ({len(chunk) / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    total = time.perf_counter() - started
+    print(f"Successfully migrated {imported} observations in {total:.2f}s "
+          f"({imported / max(total, 1e-9):,.0f} rows/s)")
+    return imported
+
 def main():
     print("Starting database initialization and data migration...")
     init_database()
@@ -0,0 +1,258 @@
+"""Near-duplicate observations: the same flora reported at (almost) the same spot.
+
+`find_duplicate_pairs` buckets observations into a lat/lon grid whose cells
+are at least `distance_m` wide, keyed by flora, so a point is only ever
+compared with points of the same flora in its own and the neighbouring
+cells: linear in the number of observations for realistic densities,
+instead of all pairs. Pairs closer than `distance_m` (and, optionally,
+reported within `window_days` of each other) are grouped with union-find by
+`canonical_links`; the canonical observation of a group is its lowest id,
+i.e. the first report.
+
+An incremental run only compares observations above the last checked id
+against their neighbour cells and extends the existing links; on the
+database it also only loads those rows, their neighbourhood
+(`neighbour_bboxes`) and the links of the groups they touch.
+
+Links live in `observations.canonical_id` on the database and in a
+`<csv>.dedup.json` sidecar next to the fallback CSV (`LinkStore`). Run
+`python -m database.dedup` to list merge proposals and `--apply` to store
+them.
+"""
+import argparse
+import json
+import math
+import os
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from database.csv_appender import file_lock
+from database.spatial import METERS_PER_DEGREE, haversine_m
+
+DEFAULT_DISTANCE_M = 15.0
+
+
+# Neighbour cell offsets: half the 3x3 block visits every pair of cells once
+_HALF_NEIGHBOURS = [(0, 0), (0, 1), (1, -1), (1, 0), (1, 1)]
+_ALL_NEIGHBOURS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+
+class MergeProposal(NamedTuple):
+    duplicate_id: int
+    canonical_id: int
+
+
+def params_signature(distance_m, window_days) -> str:
+    """Identifies the settings links were computed with; incremental runs need the same ones."""
+    return json.dumps({'distance_m': float(distance_m), 'window_days': window_days})
+
+
+def _cells(lat, lon, distance_m, max_abs_lat):
+    cell = distance_m / METERS_PER_DEGREE
+    # Longitude cells are sized for the highest latitude present, so they are
+    # at least `distance_m` wide everywhere
+    lon_cell = cell / math.cos(math.radians(min(max_abs_lat, 89.0)))
+    return np.floor(lat / cell).astype(np.int64), np.floor(lon / lon_cell).astype(np.int64)
+
+
+def neighbour_bboxes(lat, lon, distance_m: float = DEFAULT_DISTANCE_M):
+    """Return (min_lat, min_lon, max_lat, max_lon) boxes holding every point within `distance_m` of the given ones.
+
+    One box per occupied grid cell, covering that cell's points plus a
+    `distance_m` margin, so a database can fetch just the neighbourhood of
+    new observations through its lat/lon index.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if not len(lat):
+        return []
+    ix, iy = _cells(lat, lon, distance_m, float(np.abs(lat).max()))
+    cells = pd.DataFrame({'ix': ix, 'iy': iy, 'lat': lat, 'lon': lon}).groupby(['ix', 'iy'])
+    bounds = cells.agg(min_lat=('lat', 'min'), max_lat=('lat', 'max'), min_lon=('lon', 'min'), max_lon=('lon', 'max'))
+    lat_margin = distance_m / METERS_PER_DEGREE
+    # Degrees of longitude shrink towards the poles: size the margin for the cell's poleward edge
+    edge = np.minimum(np.maximum(bounds['min_lat'].abs(), bounds['max_lat'].abs()) + lat_margin, 89.0)
+    lon_margin = lat_margin / np.cos(np.radians(edge))
+    return list(zip(
+        (bounds['min_lat'] - lat_margin).tolist(), (bounds['min_lon'] - lon_margin).tolist(),
+        (bounds['max_lat'] + lat_margin).tolist(), (bounds['max_lon'] + lon_margin).tolist(),
+    ))
+
+
+def find_duplicate_pairs(frame: pd.DataFrame, distance_m: float = DEFAULT_DISTANCE_M,
+                         window_days: Optional[float] = None, new_after_id: Optional[int] = None) -> pd.DataFrame:
+    """Return same-flora pairs closer than `distance_m` as a frame (id_a < id_b, distance_m).
+
+    `frame` needs id, flora (any hashable key, e.g. a flora id or code;
+    missing as NaN or -1), lat, lon and datetime columns. With
+    `window_days`, pairs reported further apart in time (or without a date)
+    are not duplicates. With `new_after_id`, only pairs involving an
+    observation with a larger id are returned.
+    """
+    empty = pd.DataFrame({'id_a': pd.Series(dtype='int64'), 'id_b': pd.Series(dtype='int64'),
+                          'distance_m': pd.Series(dtype='float64')})
+    valid = frame['lat'].notna() & frame['lon'].notna() & frame['flora'].notna() & (frame['flora'] != -1)
+    points = frame.loc[valid, ['id', 'flora', 'lat', 'lon', 'datetime']].reset_index(drop=True)
+    if points.empty:
+        return empty
+    lat = points['lat'].to_numpy(dtype=np.float64)
+    lon = points['lon'].to_numpy(dtype=np.float64)
+    ix, iy = _cells(lat, lon, distance_m, float(np.abs(lat).max()))
+    points = points.assign(ix=ix, iy=iy)
+
+    if new_after_id is None:
+        left, offsets = points, _HALF_NEIGHBOURS
+    else:
+        left, offsets = points[points['id'] > new_after_id], _ALL_NEIGHBOURS
+    candidates = []
+    for dx, dy in offsets:
+        shifted = left.assign(ix=left['ix'] + dx, iy=left['iy'] + dy)
+        pairs = shifted.merge(points, on=['flora', 'ix', 'iy'], suffixes=('_a', '_b'))
+        if new_after_id is None and (dx, dy) == (0, 0):
+            pairs = pairs[pairs['id_a'] < pairs['id_b']]
+        else:
+            pairs = pairs[pairs['id_a'] != pairs['id_b']]
+        candidates.append(pairs)
+    pairs = pd.concat(candidates, ignore_index=True)
+    if pairs.empty:
+        return empty
+
+    distance = haversine_m(pairs['lat_a'], pairs['lon_a'], pairs['lat_b'], pairs['lon_b'])
+    keep = distance <= distance_m
+    if window_days is not None:
+        apart = (pd.to_datetime(pairs['datetime_a']) - pd.to_datetime(pairs['datetime_b'])).abs()
+        keep &= (apart <= pd.Timedelta(days=window_days)).to_numpy()
+    ids_a, ids_b = pairs['id_a'].to_numpy()[keep], pairs['id_b'].to_numpy()[keep]
+    result = pd.DataFrame({
+        'id_a': np.minimum(ids_a, ids_b).astype(np.int64),
+        'id_b': np.maximum(ids_a, ids_b).astype(np.int64),
+        'distance_m': distance[keep],
+    })
+    # New-vs-new pairs are found from both sides
+    return result.drop_duplicates(['id_a', 'id_b'], ignore_index=True)
+
+
+def canonical_links(pairs: pd.DataFrame, existing: Optional[Dict[int, int]] = None) -> Dict[int, int]:
+    """Group `pairs` (and `existing` links) with union-find; return {duplicate_id: canonical_id}.
+
+    The canonical observation of each group is its smallest id.
+    """
+    parent: Dict[int, int] = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(a, b):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+
+    for duplicate, canonical in (existing or {}).items():
+        union(duplicate, canonical)
+    for a, b in zip(pairs['id_a'].tolist(), pairs['id_b'].tolist()):
+        union(a, b)
+    return {x: find(x) for x in list(parent) if find(x) != x}
+
+
+def merge_proposals(links: Dict[int, int], existing: Dict[int, int]):
+    """Return (proposals, cleared): links that are new or changed, and old duplicates no longer linked."""
+    proposals = [MergeProposal(d, c) for d, c in sorted(links.items()) if existing.get(d) != c]
+    cleared = sorted(set(existing) - set(links))
+    return proposals, cleared
+
+
+def plan_links(frame: pd.DataFrame, existing: Dict[int, int], checked_through_id: int, stored_params,
+               distance_m: float = DEFAULT_DISTANCE_M, window_days: Optional[float] = None,
+               incremental: bool = True) -> Dict:
+    """Work out the links for `frame` given the links and watermark stored by the previous run.
+
+    An incremental run only checks observations above `checked_through_id`
+    and keeps the existing links; it turns into a full run when nothing was
+    checked yet or the settings changed. Returns a dict with the
+    `proposals` and `cleared` ids (see `merge_proposals`), all `links`, the
+    number of observations `checked`, the new `checked_through_id` and the
+    `params` signature to store with it.
+    """
+    params = params_signature(distance_m, window_days)
+    max_id = int(frame['id'].max()) if len(frame) else 0
+    if incremental and checked_through_id and stored_params == params:
+        new_after_id, base = checked_through_id, existing
+        checked = int((frame['id'] > checked_through_id).sum())
+    else:
+        new_after_id, base, checked = None, {}, len(frame)
+    pairs = find_duplicate_pairs(frame, distance_m, window_days, new_after_id)
+    links = canonical_links(pairs, base)
+    proposals, cleared = merge_proposals(links, existing)
+    return {
+        'proposals': proposals,
+        'cleared': cleared,
+        'links': links,
+        'checked': checked,
+        'checked_through_id': max(max_id, new_after_id or 0),
+        'params': params,
+    }
+
+
+class LinkStore:
+    """Canonical links for the fallback CSV, kept in `<csv>.dedup.json` beside it."""
+
+    def __init__(self, csv_path):
+        csv_path = Path(csv_path)
+        self.path = csv_path.with_name(csv_path.name + '.dedup.json')
+
+    def load(self) -> Dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as fh:
+                state = json.load(fh)
+        except (OSError, ValueError):
+            return {'checked_through_id': 0, 'params': None, 'links': {}}
+        state['links'] = {int(d): int(c) for d, c in state.get('links', {}).items()}
+        return state
+
+    def save(self, links: Dict[int, int], checked_through_id: int, params: str) -> None:
+        state = {
+            'checked_through_id': int(checked_through_id),
+            'params': params,
+            'links': {str(d): int(c) for d, c in sorted(links.items())},
+        }
+        with file_lock(self.path):
+            tmp = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp, 'w', encoding='utf-8') as fh:
+                json.dump(state, fh)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp, self.path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find (and optionally link) near-duplicate observations")
+    parser.add_argument('--distance', type=float, default=DEFAULT_DISTANCE_M, help="max distance in meters")
+    parser.add_argument('--window-days', type=float, help="max days between reports (default: no limit)")
+    parser.add_argument('--full', action='store_true', help="re-check everything instead of only new rows")
+    parser.add_argument('--apply', action='store_true', help="store the canonical links")
+    parser.add_argument('--show', type=int, default=20, help="number of proposals to print")
+    args = parser.parse_args()
+
+    from database.database_utils import deduplicate_observations
+
+    result = deduplicate_observations(
+        args.distance, args.window_days, incremental=not args.full, apply=args.apply
+    )
+    print(f"Backend: {result['backend']}; checked {result['checked']} observations "
+          f"(through id {result['checked_through_id']})")
+    print(f"{len(result['proposals'])} merge proposals, {len(result['cleared'])} links to clear")
+    for proposal in result['proposals'][:args.show]:
+        print(f"  {proposal.duplicate_id} -> {proposal.canonical_id}")
+    if result['proposals'] and not args.apply:
+        print("Run again with --apply to store these links")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Cached name dimensions (flora names, usernames) for pickers.
+
+A `Dimension` holds the distinct values of one name column, sorted and
+searchable by prefix (accent- and case-insensitive, via `NameIndex`), so
+the UI can offer a short list of matches instead of every name.
+"""
+from typing import Iterable, List, Optional
+
+from database.name_index import NameIndex
+
+
+class Dimension:
+    def __init__(self, names: Iterable[str] = ()):
+        self._index = NameIndex(n for n in names if n)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, name) -> bool:
+        return name in self._index
+
+    def add(self, name: str) -> None:
+        if name:
+            self._index.add(name)
+
+    def matching(self, name: str) -> List[str]:
+        """Return the names equal to `name` when accents and case are ignored."""
+        return [self._index.names[c] for c in self._index.exact(name)]
+
+    def search(self, prefix: str = "", limit: Optional[int] = None) -> List[str]:
+        """Return names starting with `prefix` in alphabetical order, at most `limit` of them."""
+        if not prefix.strip():
+            names = self._index.sorted_names()
+        else:
+            names = sorted(self._index.names[c] for c in self._index.prefix(prefix))
+        return list(names if limit is None else names[:limit])
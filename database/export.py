@@ -0,0 +1,150 @@
+"""Streaming export of observations in several file formats.
+
+Writers take an iterable of DataFrame chunks (as produced by
+`database_utils.iter_observation_chunks`) and a binary file object, so an
+export never needs the whole dataset as one frame or one string.
+
+Formats: `csv`, `csv.gz`, `parquet` (needs pyarrow), `geojson` (a
+FeatureCollection) and `ndjson` (one GeoJSON Feature per line).
+"""
+import gzip
+import io
+import json
+import math
+from typing import BinaryIO, Iterable
+
+import pandas as pd
+
+EXPORT_COLUMNS = ['datetime', 'address', 'lat', 'lon', 'description', 'id', 'flora_name', 'username']
+
+# format -> (file name, MIME type, label shown in the app)
+EXPORT_FORMATS = {
+    'csv': ('flora_data.csv', 'text/csv', 'CSV'),
+    'csv.gz': ('flora_data.csv.gz', 'application/gzip', 'CSV comprimido (.gz)'),
+    'parquet': ('flora_data.parquet', 'application/vnd.apache.parquet', 'Parquet'),
+    'geojson': ('flora_data.geojson', 'application/geo+json', 'GeoJSON'),
+    'ndjson': ('flora_data.ndjson', 'application/x-ndjson', 'GeoJSON por líneas (NDJSON)'),
+}
+
+
+def available_formats():
+    """Return the export formats usable in this environment."""
+    formats = list(EXPORT_FORMATS)
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        formats.remove('parquet')
+    return formats
+
+
+def _prepare(chunk: pd.DataFrame) -> pd.DataFrame:
+    chunk = chunk.reindex(columns=EXPORT_COLUMNS)
+    # Plain object/str columns export the same from both backends
+    for col in ('flora_name', 'username'):
+        if isinstance(chunk[col].dtype, pd.CategoricalDtype):
+            chunk[col] = chunk[col].astype(object)
+    return chunk
+
+
+def write_csv(chunks: Iterable[pd.DataFrame], fh: BinaryIO) -> None:
+    text = io.TextIOWrapper(fh, encoding='utf-8', newline='', write_through=True)
+    header = True
+    for chunk in chunks:
+        _prepare(chunk).to_csv(text, header=header, index=False)
+        header = False
+    if header:
+        text.write(','.join(EXPORT_COLUMNS) + '\n')
+    text.detach()
+
+
+def write_csv_gz(chunks: Iterable[pd.DataFrame], fh: BinaryIO) -> None:
+    with gzip.GzipFile(fileobj=fh, mode='wb', mtime=0) as gz:
+        write_csv(chunks, gz)
+
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    types = {
+        'datetime': pa.timestamp('us'),
+        'lat': pa.float64(),
+        'lon': pa.float64(),
+        'id': pa.int64(),
+    }
+    # Fixed up front: a chunk whose text column is all null must not make it a null column
+    return pa.schema([(col, types.get(col, pa.string())) for col in EXPORT_COLUMNS])
+
+
+def write_parquet(chunks: Iterable[pd.DataFrame], fh: BinaryIO) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema()
+    with pq.ParquetWriter(fh, schema, compression='zstd') as writer:
+        for chunk in chunks:
+            chunk = _prepare(chunk)
+            chunk['id'] = pd.to_numeric(chunk['id'], errors='coerce').astype('Int64')
+            chunk['lat'] = pd.to_numeric(chunk['lat'], errors='coerce')
+            chunk['lon'] = pd.to_numeric(chunk['lon'], errors='coerce')
+            chunk['datetime'] = pd.to_datetime(chunk['datetime'], errors='coerce').astype('datetime64[us]')
+            for col in ('address', 'description', 'flora_name', 'username'):
+                chunk[col] = chunk[col].astype(object).where(chunk[col].notna(), None)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def _json_value(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return None if pd.isna(value) else value.isoformat()
+    if value is pd.NA or value is pd.NaT:
+        return None
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+def _features(chunks: Iterable[pd.DataFrame]):
+    for chunk in chunks:
+        for record in _prepare(chunk).to_dict(orient='records'):
+            props = {k: _json_value(v) for k, v in record.items()}
+            lat, lon = props.pop('lat'), props.pop('lon')
+            geometry = None if lat is None or lon is None else {'type': 'Point', 'coordinates': [lon, lat]}
+            yield {'type': 'Feature', 'geometry': geometry, 'properties': props}
+
+
+def write_geojson(chunks: Iterable[pd.DataFrame], fh: BinaryIO) -> None:
+    fh.write(b'{"type": "FeatureCollection", "features": [\n')
+    first = True
+    for feature in _features(chunks):
+        if not first:
+            fh.write(b',\n')
+        fh.write(json.dumps(feature, ensure_ascii=False).encode('utf-8'))
+        first = False
+    fh.write(b'\n]}\n')
+
+
+def write_ndjson(chunks: Iterable[pd.DataFrame], fh: BinaryIO) -> None:
+    for feature in _features(chunks):
+        fh.write(json.dumps(feature, ensure_ascii=False).encode('utf-8'))
+        fh.write(b'\n')
+
+
+_WRITERS = {
+    'csv': write_csv,
+    'csv.gz': write_csv_gz,
+    'parquet': write_parquet,
+    'geojson': write_geojson,
+    'ndjson': write_ndjson,
+}
+
+
+def write_export(fmt: str, chunks: Iterable[pd.DataFrame], fh: BinaryIO) -> None:
+    """Stream `chunks` into `fh` in export format `fmt`."""
+    try:
+        writer = _WRITERS[fmt]
+    except KeyError:
+        raise ValueError(f"Unknown export format: {fmt}")
+    writer(chunks, fh)
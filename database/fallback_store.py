@@ -2,15 +2,111 @@
 
 This provides a minimal API similar to what code using the database might
 expect: listing observations, getting by id, and searching by flora name.
-It loads `data/flora_data.csv` by default and caches rows in memory.
+It loads `data/flora_data.csv` by default and keeps it in memory as columns:
+NumPy arrays for id/lat/lon/datetime, integer codes into interned name
+lists for flora_name/username, and object arrays for the free-text fields.
+Row dicts are only built when a caller asks for them. `refresh()` tails
+rows appended since the last read instead of re-reading the whole file.
+
+Lookups are indexed: an id -> row position map, and per flora name the
+row positions carrying it, reached through an accent- and case-insensitive
+`NameIndex`. Both are built at load time and kept current by `append()`. A lat/lon
+`GridIndex` for spatial queries is built on first use and then maintained
+the same way.
 """
+from array import array
+from collections import Counter
+import hashlib
+import io
+import os
 from pathlib import Path
 from typing import List, Dict, Optional
+import numpy as np
 import pandas as pd
 import json
 
+from database.csv_appender import TAIL_BLOCK, file_lock, tail_digest
+from database.metrics import timed
+from database.name_index import NameIndex
+from database.snapshot import hash_prefix, load_snapshot, write_snapshot
+from database.spatial import GridIndex, haversine_m
+
+# Column order returned by row views and `to_dataframe()`
+COLUMNS = ["id", "datetime", "flora_name", "username", "lat", "lon", "address", "description"]
+
+_MISSING_ID = -1
+_MISSING_CODE = -1
+# Flora with at most this many rows are searched directly instead of via the grid
+_SMALL_GROUP = 4096
+
+
+def _text_column(df: pd.DataFrame, *names: str) -> pd.Series:
+    """Return the first of `names` present in `df` as strings, with blanks as None.
+
+    Later names fill blanks left by earlier ones (e.g. `flora_name` falling
+    back to the Spanish `flora inferida` header of the raw export).
+    """
+    result = pd.Series([None] * len(df), index=df.index, dtype=object)
+    for name in names:
+        if name not in df.columns:
+            continue
+        values = df[name].astype(object)
+        values = values.where(values.notna() & (values.astype(str).str.strip() != ""), None)
+        result = result.where(result.notna(), values)
+    return result
+
+
+def _encode(values: pd.Series):
+    """Intern `values` into (codes, NameIndex); missing values get code -1."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    return codes.astype(np.int32), NameIndex(str(u) for u in uniques)
+
+
+def _positions_by_code(codes: np.ndarray, n_codes: int) -> List[array]:
+    """Group row positions by code: result[code] is an array of positions."""
+    order = np.argsort(codes, kind="stable")
+    counts = np.bincount(codes[codes >= 0], minlength=n_codes)
+    start = int((codes < 0).sum())
+    groups = []
+    for count in counts:
+        groups.append(array("q", order[start:start + count].astype(np.int64).tobytes()))
+        start += count
+    return groups
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value) if value not in (None, "") else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _normalize(df: pd.DataFrame) -> Dict:
+    """Convert a text-only CSV frame into the store's column types."""
+    def numeric(name):
+        if name not in df.columns:
+            return pd.Series(np.nan, index=df.index)
+        return pd.to_numeric(df[name], errors="coerce")
+
+    ids = numeric("id")
+    if "datetime" in df.columns:
+        dt = pd.to_datetime(df["datetime"].replace("", None), errors="coerce")
+    else:
+        dt = pd.Series(pd.NaT, index=df.index)
+    return {
+        "id": ids.where(ids.notna() & (ids % 1 == 0), _MISSING_ID).astype(np.int64).to_numpy(),
+        "lat": numeric("lat").astype(np.float64).to_numpy(),
+        "lon": numeric("lon").astype(np.float64).to_numpy(),
+        "datetime": dt.to_numpy(dtype="datetime64[ns]"),
+        "flora_name": _text_column(df, "flora_name", "flora inferida"),
+        "username": _text_column(df, "username", "usuario"),
+        "address": _text_column(df, "address"),
+        "description": _text_column(df, "description"),
+    }
+
 
 class FallbackStore:
+    @timed('fallback_store.load')
     def __init__(self, csv_path: Optional[Path] = None, cache: bool = True):
         if csv_path is None:
             csv_path = Path(__file__).parent.parent / "data" / "flora_data.csv"
@@ -19,84 +115,502 @@ class FallbackStore:
         if not self.csv_path.exists():
             raise FileNotFoundError(f"Fallback CSV not found: {self.csv_path}")
 
-        # Read CSV using pandas to get convenient parsing for datetime columns
-        # Keep default_na=False to avoid turning empty strings into NaN when possible
-        self.df = pd.read_csv(self.csv_path, parse_dates=["datetime"], keep_default_na=False)
+        self._cache_enabled = bool(cache)
+
+        # With `cache`, a still-valid binary snapshot (see database.snapshot) is
+        # memory-mapped instead of parsing the CSV. Both happen under the shared
+        # lock so a concurrent append is never half seen.
+        with file_lock(self.csv_path, shared=True):
+            st = os.stat(self.csv_path)
+            self._inode = st.st_ino
+            snapshot = load_snapshot(self.csv_path, st.st_size, st.st_mtime_ns) if self._cache_enabled else None
+            if snapshot is not None:
+                with open(self.csv_path, "rb") as fh:
+                    self._tail = tail_digest(fh, snapshot.csv_size)
+            data = None if snapshot is not None else self.csv_path.read_bytes()
+
+        if snapshot is not None:
+            self._header = snapshot.header
+            self._offset = snapshot.csv_size
+            self._load_encoded(snapshot.columns)
+            # Tail rows appended after the snapshot was written, then cover them too
+            added = self.refresh()
+            if added is not None:
+                if added:
+                    self.save_snapshot()
+                return
+            # Rewritten since the snapshot was checked: parse the CSV after all
+            with file_lock(self.csv_path, shared=True):
+                st = os.stat(self.csv_path)
+                self._inode = st.st_ino
+                data = self.csv_path.read_bytes()
+
+        # Read everything as text (keep_default_na=False keeps blanks as "") and
+        # convert each column once, vectorized, in `_normalize`.
+        df = pd.read_csv(io.BytesIO(data), keep_default_na=False, dtype=str)
 
         # Normalize column names to simple keys we expect in the codebase
         # The source CSV has: datetime,address,lat,lon,description,id,flora_name,username
-        # We'll ensure those keys exist (lower-cased) and produce a list of dicts
-        self.df.columns = [str(c).strip() for c in self.df.columns]
+        df.columns = [str(c).strip() for c in df.columns]
+        self._header = list(df.columns)
+        self._offset = len(data)
+        self._tail = hashlib.sha256(data[-TAIL_BLOCK:]).hexdigest()
+        self._load_columns(_normalize(df))
+        if self._cache_enabled:
+            self._write_snapshot(st.st_size, st.st_mtime_ns, hashlib.sha256(data).hexdigest())
+
+    def _load_columns(self, cols: Dict) -> None:
+        flora_codes, flora_index = _encode(cols["flora_name"])
+        user_codes, user_index = _encode(cols["username"])
+        self._load_encoded({
+            "id": cols["id"],
+            "lat": cols["lat"],
+            "lon": cols["lon"],
+            "datetime": cols["datetime"],
+            "flora_codes": flora_codes,
+            "flora_names": flora_index.names,
+            "user_codes": user_codes,
+            "user_names": user_index.names,
+            "address": cols["address"].to_numpy(dtype=object),
+            "description": cols["description"].to_numpy(dtype=object),
+        })
+
+    def _load_encoded(self, cols: Dict) -> None:
+        """Adopt already typed and interned columns (possibly read-only snapshot views)."""
+        self._ids = cols["id"]
+        self._lat = cols["lat"]
+        self._lon = cols["lon"]
+        self._datetime = cols["datetime"]
+        self._flora_codes = cols["flora_codes"]
+        self._flora_index = NameIndex(cols["flora_names"])
+        self._user_codes = cols["user_codes"]
+        self._user_index = NameIndex(cols["user_names"])
+        self._address = cols["address"]
+        self._description = cols["description"]
+        self._n = len(self._ids)
+        self._build_indexes()
+
+    def _write_snapshot(self, csv_size: int, csv_mtime_ns: int, csv_sha256: str) -> None:
+        n = self._n
+        write_snapshot(self.csv_path, {
+            "id": self._ids[:n],
+            "lat": self._lat[:n],
+            "lon": self._lon[:n],
+            "datetime": self._datetime[:n],
+            "flora_codes": self._flora_codes[:n],
+            "flora_names": self._flora_index.names,
+            "user_codes": self._user_codes[:n],
+            "user_names": self._user_index.names,
+            "address": self._address[:n],
+            "description": self._description[:n],
+        }, self._header, csv_size, csv_mtime_ns, csv_sha256)
+
+    def save_snapshot(self) -> None:
+        """Write the binary snapshot covering the CSV bytes read so far."""
+        with file_lock(self.csv_path, shared=True):
+            st = os.stat(self.csv_path)
+            if st.st_ino != self._inode or st.st_size < self._offset:
+                return
+            digest = hash_prefix(self.csv_path, self._offset)
+        # The mtime only identifies the file if nothing was appended after our offset
+        self._write_snapshot(self._offset, st.st_mtime_ns if st.st_size == self._offset else 0, digest)
+
+    def _build_indexes(self) -> None:
+        ids = self._ids[:self._n]
+        valid = np.flatnonzero(ids != _MISSING_ID)
+        # Reversed so the first row wins when an id is duplicated
+        self._id_positions = dict(zip(ids[valid][::-1].tolist(), valid[::-1].tolist()))
+        self._max_id = int(ids.max()) if self._n else 0
+        # Rows appended in id order allow keyset paging by binary search
+        self._ids_sorted = bool((ids != _MISSING_ID).all() and (np.diff(ids) > 0).all())
+        self._flora_rows = _positions_by_code(self._flora_codes[:self._n], len(self._flora_index))
+        self._grid = None
+        # Analytics rollups; per-flora counts are the lengths of `_flora_rows`
+        flora, users = self._flora_codes[:self._n], self._user_codes[:self._n]
+        self._user_counts = np.bincount(users[users >= 0], minlength=len(self._user_index)).tolist()
+        both = (flora >= 0) & (users >= 0)
+        pairs = pd.Series(1, index=pd.MultiIndex.from_arrays([flora[both], users[both]])).groupby(level=[0, 1]).size()
+        self._pair_counts = Counter({(int(f), int(u)): int(c) for (f, u), c in pairs.items()})
+
+    def _ensure_capacity(self, size: int) -> None:
+        capacity = len(self._ids)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 16)
+        for name in ("_ids", "_lat", "_lon", "_datetime", "_flora_codes", "_user_codes", "_address", "_description"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+        if self._grid is not None:
+            self._grid.attach(self._lat, self._lon)
+
+    def append(self, row: Dict) -> int:
+        """Append one observation (a dict keyed like the row views) and update the indexes.
+
+        Returns the new row position. Arrays grow geometrically, so appends
+        are amortized O(1).
+        """
+        pos = self._n
+        self._ensure_capacity(pos + 1)
+        obs_id = row.get("id")
+        obs_id = _MISSING_ID if obs_id in (None, "") else int(obs_id)
+        self._ids[pos] = obs_id
+        self._lat[pos] = _to_float(row.get("lat"))
+        self._lon[pos] = _to_float(row.get("lon"))
+        dt = pd.to_datetime(row.get("datetime") or None, errors="coerce")
+        self._datetime[pos] = np.datetime64("NaT") if pd.isna(dt) else dt.to_datetime64()
+        self._address[pos] = row.get("address") or None
+        self._description[pos] = row.get("description") or None
+
+        flora_name = row.get("flora_name") or None
+        if flora_name is None:
+            self._flora_codes[pos] = _MISSING_CODE
+        else:
+            code = self._flora_index.add(str(flora_name))
+            if code == len(self._flora_rows):
+                self._flora_rows.append(array("q"))
+            self._flora_rows[code].append(pos)
+            self._flora_codes[pos] = code
+        username = row.get("username") or None
+        if username is None:
+            self._user_codes[pos] = _MISSING_CODE
+        else:
+            user_code = self._user_index.add(str(username))
+            if user_code == len(self._user_counts):
+                self._user_counts.append(0)
+            self._user_counts[user_code] += 1
+            self._user_codes[pos] = user_code
+            if flora_name is not None:
+                self._pair_counts[(int(self._flora_codes[pos]), user_code)] += 1
+
+        if obs_id == _MISSING_ID or (pos and obs_id <= self._ids[pos - 1]):
+            self._ids_sorted = False
+        if obs_id != _MISSING_ID:
+            self._id_positions.setdefault(obs_id, pos)
+            self._max_id = max(self._max_id, obs_id)
+        if self._grid is not None:
+            self._grid.add(pos, self._lat[pos], self._lon[pos])
+        self._n = pos + 1
+        return pos
 
-        rows = []
-        for r in self.df.to_dict(orient="records"):
-            # Convert id to int when possible
+    def _intern(self, values: pd.Series, index: NameIndex) -> np.ndarray:
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        mapping = np.array([index.add(str(u)) for u in uniques] + [_MISSING_CODE], dtype=np.int32)
+        # The sentinel -1 picks the trailing _MISSING_CODE
+        return mapping[codes]
+
+    def _extend(self, cols: Dict) -> None:
+        """Append already normalized columns (see `_normalize`) and update the indexes in bulk.
+
+        Same result as calling `append()` per row, without the per-row cost,
+        so tailing a large batch of appended rows stays cheap.
+        """
+        start, count = self._n, len(cols["id"])
+        if not count:
+            return
+        end = start + count
+        self._ensure_capacity(end)
+        ids = cols["id"]
+        self._ids[start:end] = ids
+        self._lat[start:end] = cols["lat"]
+        self._lon[start:end] = cols["lon"]
+        self._datetime[start:end] = cols["datetime"]
+        self._address[start:end] = cols["address"].to_numpy(dtype=object)
+        self._description[start:end] = cols["description"].to_numpy(dtype=object)
+        flora = self._flora_codes[start:end] = self._intern(cols["flora_name"], self._flora_index)
+        users = self._user_codes[start:end] = self._intern(cols["username"], self._user_index)
+
+        positions = np.arange(start, end)
+        self._flora_rows.extend(array("q") for _ in range(len(self._flora_index) - len(self._flora_rows)))
+        has_flora = flora >= 0
+        for code, rows in pd.Series(positions[has_flora]).groupby(flora[has_flora]):
+            self._flora_rows[code].extend(rows.tolist())
+        self._user_counts.extend([0] * (len(self._user_index) - len(self._user_counts)))
+        for code, n in enumerate(np.bincount(users[users >= 0], minlength=len(self._user_index)).tolist()):
+            self._user_counts[code] += n
+        both = has_flora & (users >= 0)
+        self._pair_counts.update(zip(flora[both].tolist(), users[both].tolist()))
+
+        valid = ids != _MISSING_ID
+        if not valid.all() or (np.diff(ids) <= 0).any() or (start and ids[0] <= self._ids[start - 1]):
+            self._ids_sorted = False
+        for obs_id, pos in zip(ids[valid].tolist(), positions[valid].tolist()):
+            self._id_positions.setdefault(obs_id, pos)
+        if valid.any():
+            self._max_id = max(self._max_id, int(ids[valid].max()))
+        if self._grid is not None:
+            for pos in positions.tolist():
+                self._grid.add(pos, self._lat[pos], self._lon[pos])
+        self._n = end
+
+    @timed('fallback_store.refresh')
+    def refresh(self) -> Optional[int]:
+        """Load rows appended to the CSV since it was last read.
+
+        Only the new tail of the file is read and parsed. Returns the number
+        of rows added, or None when the store has to be rebuilt instead: the
+        file was replaced or truncated, or the block before the last read
+        offset changed because it was rewritten in place (an editor save,
+        `DataFrame.to_csv`), even if it grew.
+        """
+        with file_lock(self.csv_path, shared=True):
             try:
-                r_id = int(r.get("id") if r.get("id") != "" else None)
-            except Exception:
-                r_id = None
-            # Parse lat/lon to floats
-            def to_float(v):
-                try:
-                    if v == "":
-                        return None
-                    return float(v)
-                except Exception:
+                st = os.stat(self.csv_path)
+            except OSError:
+                return None
+            if st.st_ino != self._inode or st.st_size < self._offset:
+                return None
+            with open(self.csv_path, "rb") as fh:
+                if tail_digest(fh, self._offset) != self._tail:
                     return None
+                if st.st_size == self._offset:
+                    return 0
+                fh.seek(self._offset)
+                data = fh.read(st.st_size - self._offset)
+                tail = tail_digest(fh, st.st_size)
+        df = pd.read_csv(io.BytesIO(data), header=None, names=self._header,
+                         keep_default_na=False, dtype=str)
+        self._extend(_normalize(df))
+        self._offset += len(data)
+        self._tail = tail
+        return len(df)
 
-            row = {
-                "id": r_id,
-                "datetime": r.get("datetime"),
-                "address": r.get("address") or None,
-                "lat": to_float(r.get("lat")),
-                "lon": to_float(r.get("lon")),
-                "description": r.get("description") or None,
-                "flora_name": (r.get("flora_name") or r.get("flora inferida") or None),
-                "username": r.get("username") or r.get("usuario") or None,
-                # keep original raw row if callers want additional fields
-                "_raw": r,
-            }
-            rows.append(row)
-
-        self._rows: List[Dict] = rows
-        self._cache_enabled = bool(cache)
+    def __len__(self) -> int:
+        return self._n
+
+    def _row(self, i: int) -> Dict:
+        """Build the dict view of row position `i`."""
+        obs_id = int(self._ids[i])
+        lat = float(self._lat[i])
+        lon = float(self._lon[i])
+        dt = self._datetime[i]
+        flora_code = self._flora_codes[i]
+        user_code = self._user_codes[i]
+        return {
+            "id": None if obs_id == _MISSING_ID else obs_id,
+            "datetime": None if np.isnat(dt) else pd.Timestamp(dt),
+            "address": self._address[i],
+            "lat": None if np.isnan(lat) else lat,
+            "lon": None if np.isnan(lon) else lon,
+            "description": self._description[i],
+            "flora_name": None if flora_code == _MISSING_CODE else self._flora_index.names[flora_code],
+            "username": None if user_code == _MISSING_CODE else self._user_index.names[user_code],
+        }
+
+    def _rows(self, positions) -> List[Dict]:
+        return [self._row(i) for i in positions]
+
+    def iter_rows(self):
+        """Yield row dicts one at a time without materializing the full list."""
+        for i in range(len(self)):
+            yield self._row(i)
 
     def all(self) -> List[Dict]:
         """Return all observations as a list of dicts."""
-        return list(self._rows)
+        return self._rows(range(len(self)))
 
     def get(self, obs_id: int) -> Optional[Dict]:
         """Return a single observation by its numeric id, or None if not found."""
         if obs_id is None:
             return None
-        for r in self._rows:
-            if r.get("id") == obs_id:
-                return r
-        return None
+        pos = self._id_positions.get(obs_id)
+        return None if pos is None else self._row(pos)
+
+    def flora_positions(self, name: str, mode: str = "substring") -> np.ndarray:
+        """Return sorted row positions whose flora name matches `name`.
+
+        Matching ignores case and accents; `mode` is "exact", "prefix" or
+        "substring".
+        """
+        codes = self._flora_index.search(name, mode)
+        if not codes:
+            return np.empty(0, dtype=np.int64)
+        positions = np.concatenate([np.frombuffer(self._flora_rows[c], dtype=np.int64) for c in codes])
+        if len(codes) > 1:
+            positions.sort()
+        return positions
 
-    def filter_by_flora(self, name: str) -> List[Dict]:
-        """Case-insensitive substring match on `flora_name`."""
+    def filter_by_flora(self, name: str, mode: str = "substring") -> List[Dict]:
+        """Case- and accent-insensitive match on `flora_name` (substring by default)."""
         if not name:
             return []
-        needle = name.strip().lower()
-        return [r for r in self._rows if r.get("flora_name") and needle in r.get("flora_name").lower()]
+        return self._rows(self.flora_positions(name, mode))
+
+    def flora_names(self) -> List[str]:
+        """Return the distinct flora names, sorted."""
+        return self._flora_index.sorted_names()
+
+    def usernames(self) -> List[str]:
+        """Return the distinct usernames, sorted."""
+        return self._user_index.sorted_names()
+
+    def _spatial(self) -> GridIndex:
+        if self._grid is None:
+            grid = GridIndex()
+            grid.build(self._lat[:self._n], self._lon[:self._n])
+            grid.attach(self._lat, self._lon)
+            self._grid = grid
+        return self._grid
+
+    def _flora_mask(self, flora_name: Optional[str]):
+        if not flora_name:
+            return None
+        codes = np.asarray(self._flora_index.exact(flora_name), dtype=np.int32)
+        return lambda positions: np.isin(self._flora_codes[positions], codes)
+
+    def _filter_flora(self, positions: np.ndarray, flora_name: Optional[str]) -> np.ndarray:
+        accept = self._flora_mask(flora_name)
+        return positions if accept is None else positions[accept(positions)]
+
+    def positions_in_bbox(self, min_lat, min_lon, max_lat, max_lon, flora_name: Optional[str] = None) -> np.ndarray:
+        """Return sorted row positions inside the bounding box, optionally for one flora."""
+        positions = self._spatial().bbox(min_lat, min_lon, max_lat, max_lon)
+        return self._filter_flora(positions, flora_name)
+
+    def positions_within(self, lat, lon, radius_m, flora_name: Optional[str] = None):
+        """Return (positions, distances in meters) within `radius_m`, nearest first."""
+        positions, distances = self._spatial().radius(lat, lon, radius_m)
+        accept = self._flora_mask(flora_name)
+        if accept is None:
+            return positions, distances
+        keep = accept(positions)
+        return positions[keep], distances[keep]
+
+    def nearest_positions(self, lat, lon, k: int = 10, flora_name: Optional[str] = None):
+        """Return (positions, distances in meters) of the `k` nearest rows."""
+        if flora_name:
+            positions = self.flora_positions(flora_name, "exact")
+            if len(positions) <= _SMALL_GROUP:
+                # Rare flora: measuring every one of its rows beats walking the grid
+                positions = positions[~(np.isnan(self._lat[positions]) | np.isnan(self._lon[positions]))]
+                distances = haversine_m(lat, lon, self._lat[positions], self._lon[positions])
+                order = np.argsort(distances, kind="stable")[:k]
+                return positions[order], distances[order]
+        return self._spatial().nearest(lat, lon, k, self._flora_mask(flora_name))
+
+    def _name_codes(self, index: NameIndex, names) -> np.ndarray:
+        if isinstance(names, str):
+            names = [names]
+        return np.asarray(sorted({c for name in names for c in index.exact(name)}), dtype=np.int32)
+
+    def _match(self, positions: np.ndarray, flora_codes, user_codes, start, end, after_id) -> np.ndarray:
+        """Boolean mask over `positions` for the non-spatial filters of `select_positions`."""
+        ids = self._ids[positions]
+        mask = ids != _MISSING_ID
+        if after_id is not None:
+            mask &= ids > after_id
+        if flora_codes is not None:
+            mask &= np.isin(self._flora_codes[positions], flora_codes)
+        if user_codes is not None:
+            mask &= np.isin(self._user_codes[positions], user_codes)
+        if start is not None:
+            mask &= self._datetime[positions] >= start
+        if end is not None:
+            mask &= self._datetime[positions] < end
+        return mask
+
+    def select_positions(self, flora=None, user=None, start=None, end=None, bbox=None,
+                         after_id: Optional[int] = None, limit: Optional[int] = None) -> np.ndarray:
+        """Return positions of rows matching every filter, in id order.
+
+        `flora`/`user` are a name or a list of names (exact, ignoring case
+        and accents), `start`/`end` a half-open datetime range, `bbox` a
+        (min_lat, min_lon, max_lat, max_lon) box. Only rows with an id
+        greater than `after_id` are returned, at most `limit` of them, so
+        callers can page with the last id of the previous page. Rows
+        without an id are never returned.
+        """
+        n = self._n
+        flora_codes = None if flora is None else self._name_codes(self._flora_index, flora)
+        user_codes = None if user is None else self._name_codes(self._user_index, user)
+        start = None if start is None else pd.Timestamp(start).to_datetime64()
+        end = None if end is None else pd.Timestamp(end).to_datetime64()
+        if bbox is not None:
+            candidates = self._spatial().bbox(*bbox)
+        elif flora_codes is not None:
+            groups = [np.frombuffer(self._flora_rows[c], dtype=np.int64) for c in flora_codes]
+            candidates = np.sort(np.concatenate(groups)) if groups else np.empty(0, dtype=np.int64)
+        elif self._ids_sorted:
+            # Scan forward from the cursor in growing blocks until the page is full
+            first = int(np.searchsorted(self._ids[:n], after_id, side="right")) if after_id is not None else 0
+            block = max(2 * limit, 1024) if limit else n
+            found, count = [], 0
+            while first < n and (limit is None or count < limit):
+                positions = np.arange(first, min(first + block, n), dtype=np.int64)
+                positions = positions[self._match(positions, flora_codes, user_codes, start, end, after_id)]
+                found.append(positions)
+                count += len(positions)
+                first += block
+                block *= 2
+            positions = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+            return positions[:limit]
+        else:
+            candidates = np.arange(n, dtype=np.int64)
+        positions = candidates[self._match(candidates, flora_codes, user_codes, start, end, after_id)]
+        ids = self._ids[positions]
+        if limit is not None and len(positions) > limit:
+            keep = np.argpartition(ids, limit - 1)[:limit]
+            positions, ids = positions[keep], ids[keep]
+        return positions[np.argsort(ids, kind="stable")]
+
+    def rollups(self) -> Dict:
+        """Return observation counts per flora, per user and per (flora, user) pair.
+
+        The counters are maintained by `append()`, so this never scans rows.
+        """
+        flora_names = self._flora_index.names
+        usernames = self._user_index.names
+        return {
+            "observations": self._n,
+            "per_flora": {flora_names[c]: len(rows) for c, rows in enumerate(self._flora_rows) if len(rows)},
+            "per_user": {usernames[c]: count for c, count in enumerate(self._user_counts) if count},
+            "per_flora_user": {(flora_names[f], usernames[u]): count for (f, u), count in self._pair_counts.items()},
+        }
+
+    def max_id(self) -> int:
+        """Return the largest observation id, or 0 for an empty store."""
+        return max(self._max_id, 0)
 
     def sample(self, n: int = 5) -> List[Dict]:
         """Return `n` sample rows (first n)."""
-        return self._rows[:n]
+        return self._rows(range(min(n, len(self))))
+
+    def to_dataframe(self, positions=None) -> pd.DataFrame:
+        """Return the observations as a DataFrame backed by the store's arrays.
+
+        Numeric and text columns wrap the store's arrays without copying and
+        the name columns are categoricals over the interned codes. Treat the
+        result as read-only. With `positions`, only those rows are taken
+        (which does copy them).
+        """
+        select = slice(0, self._n) if positions is None else np.asarray(positions, dtype=np.int64)
+        ids = self._ids[select]
+        columns = {
+            "id": pd.arrays.IntegerArray(ids, ids == _MISSING_ID),
+            "datetime": self._datetime[select],
+            "flora_name": pd.Categorical.from_codes(self._flora_codes[select], categories=self._flora_index.names),
+            "username": pd.Categorical.from_codes(self._user_codes[select], categories=self._user_index.names),
+            "lat": self._lat[select],
+            "lon": self._lon[select],
+            # Explicit object Series so pandas does not convert (copy) the text columns
+            "address": pd.Series(self._address[select], dtype=object, copy=False),
+            "description": pd.Series(self._description[select], dtype=object, copy=False),
+        }
+        return pd.DataFrame(columns, columns=COLUMNS, copy=False)
 
     def to_json(self, out_path: Optional[Path] = None) -> Path:
         """Dump all observations to a JSON file. Returns path to written file."""
         if out_path is None:
             out_path = Path.cwd() / "flora_fallback.json"
         with open(out_path, "w", encoding="utf-8") as fh:
-            json.dump(self._rows, fh, default=str, ensure_ascii=False, indent=2)
+            json.dump(self.all(), fh, default=str, ensure_ascii=False, indent=2)
         return out_path
 
 
 def _quick_demo():
     store = FallbackStore()
-    print(f"Loaded {len(store.all())} observations from {store.csv_path}")
+    print(f"Loaded {len(store)} observations from {store.csv_path}")
     print("Example sample:")
     for r in store.sample(3):
         print(r.get("id"), r.get("flora_name"), r.get("username"))
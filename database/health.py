@@ -0,0 +1,87 @@
+"""Backend health tracking for the database connection.
+
+A small circuit breaker remembers that the database is down so callers can
+go straight to the CSV fallback instead of waiting on a connect timeout for
+every query. After a failure the breaker stays open for an exponentially
+growing delay, then lets a single trial request through (half-open) to
+decide whether to close again.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    def __init__(self, name='database', base_delay=1.0, max_delay=60.0, clock=time.monotonic):
+        self.name = name
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._retry_at = 0.0
+        self._last_error = None
+
+    @property
+    def state(self):
+        return self._state
+
+    def _set_state(self, state):
+        if state != self._state:
+            logger.info("%s circuit breaker: %s -> %s", self.name, self._state, state)
+            self._state = state
+
+    def allow_request(self):
+        """Return True if a request may try the backend right now.
+
+        While open, only the first caller after the back-off delay gets
+        through; it becomes the half-open trial and everyone else keeps
+        using the fallback until that trial reports back.
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and self._clock() >= self._retry_at:
+                self._set_state(HALF_OPEN)
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._last_error = None
+            self._set_state(CLOSED)
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self._failures += 1
+            self._last_error = repr(error) if error is not None else None
+            delay = min(self.base_delay * 2 ** (self._failures - 1), self.max_delay)
+            self._retry_at = self._clock() + delay
+            logger.warning("%s unavailable, retrying in %.1fs: %s", self.name, delay, self._last_error)
+            self._set_state(OPEN)
+
+    def reset(self):
+        with self._lock:
+            self._failures = 0
+            self._retry_at = 0.0
+            self._last_error = None
+            self._set_state(CLOSED)
+
+    def snapshot(self):
+        """Return the current state as a plain dict (for display/logging)."""
+        with self._lock:
+            return {
+                'name': self.name,
+                'state': self._state,
+                'failures': self._failures,
+                'retry_in': max(0.0, self._retry_at - self._clock()) if self._state == OPEN else 0.0,
+                'last_error': self._last_error,
+            }
@@ -0,0 +1,129 @@
+"""Zoom-aware grid aggregation of observations for the map.
+
+For each precomputed zoom level the world is cut into square lat/lon cells
+about a quarter of a map tile wide. Every cell keeps a count, the sum of
+coordinates (for a centroid marker) and a per-flora breakdown, so the map
+can draw one marker per cell instead of one per observation. New
+observations are folded in with `add()` in O(number of zoom levels).
+"""
+import math
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+ZOOM_LEVELS = (2, 4, 6, 8, 10, 12)
+# Cells per map tile edge; 4 cells of a 256px tile is roughly a 64px marker spacing
+CELLS_PER_TILE = 4
+TILE_PX = 256
+
+
+def cell_size_deg(zoom: int) -> float:
+    return 360.0 / (2 ** zoom) / CELLS_PER_TILE
+
+
+def viewport_bbox(lat: float, lon: float, zoom: float, width_px: int = 1000, height_px: int = 600):
+    """Approximate (min_lat, min_lon, max_lat, max_lon) shown by a map of the given size."""
+    deg_per_px = 360.0 / (TILE_PX * 2 ** zoom)
+    half_lon = width_px / 2 * deg_per_px
+    half_lat = height_px / 2 * deg_per_px * math.cos(math.radians(min(abs(lat), 85.0)))
+    return (max(lat - half_lat, -90.0), max(lon - half_lon, -180.0), min(lat + half_lat, 90.0), min(lon + half_lon, 180.0))
+
+
+class _Cell:
+    __slots__ = ("count", "lat_sum", "lon_sum", "flora")
+
+    def __init__(self):
+        self.count = 0
+        self.lat_sum = 0.0
+        self.lon_sum = 0.0
+        self.flora = Counter()
+
+
+class MapAggregates:
+    def __init__(self, zoom_levels: Iterable[int] = ZOOM_LEVELS):
+        self.zoom_levels = tuple(sorted(zoom_levels))
+        self._levels: Dict[int, Dict[Tuple[int, int], _Cell]] = {z: {} for z in self.zoom_levels}
+        self.total = 0
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, zoom_levels: Iterable[int] = ZOOM_LEVELS) -> "MapAggregates":
+        """Build all levels from a frame with lat, lon and flora_name columns."""
+        agg = cls(zoom_levels)
+        lat = pd.to_numeric(df["lat"], errors="coerce").to_numpy(dtype=float)
+        lon = pd.to_numeric(df["lon"], errors="coerce").to_numpy(dtype=float)
+        valid = ~(np.isnan(lat) | np.isnan(lon))
+        frame = pd.DataFrame({
+            "lat": lat[valid],
+            "lon": lon[valid],
+            "flora_name": df["flora_name"].astype(object).to_numpy()[valid],
+        })
+        agg.total = len(frame)
+        for zoom in agg.zoom_levels:
+            size = cell_size_deg(zoom)
+            frame["ix"] = np.floor(frame["lat"] / size).astype(np.int64)
+            frame["iy"] = np.floor(frame["lon"] / size).astype(np.int64)
+            cells = agg._levels[zoom]
+            sums = frame.groupby(["ix", "iy"], sort=False).agg(count=("lat", "size"), lat_sum=("lat", "sum"), lon_sum=("lon", "sum"))
+            for key, count, lat_sum, lon_sum in zip(
+                sums.index, sums["count"].to_numpy(), sums["lat_sum"].to_numpy(), sums["lon_sum"].to_numpy()
+            ):
+                cell = cells[key] = _Cell()
+                cell.count = int(count)
+                cell.lat_sum = float(lat_sum)
+                cell.lon_sum = float(lon_sum)
+            flora_counts = frame.groupby(["ix", "iy", "flora_name"], sort=False, dropna=True).size()
+            for (ix, iy, flora), count in zip(flora_counts.index, flora_counts.to_numpy()):
+                cells[(ix, iy)].flora[flora] = int(count)
+        return agg
+
+    def add(self, lat, lon, flora_name: Optional[str]) -> None:
+        """Fold one new observation into every level."""
+        # Missing names arrive as NaN from string columns; from_frame leaves them out of the breakdown
+        if pd.isna(flora_name):
+            flora_name = None
+        try:
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            return
+        if math.isnan(lat) or math.isnan(lon):
+            return
+        self.total += 1
+        for zoom in self.zoom_levels:
+            size = cell_size_deg(zoom)
+            key = (math.floor(lat / size), math.floor(lon / size))
+            cell = self._levels[zoom].get(key)
+            if cell is None:
+                cell = self._levels[zoom][key] = _Cell()
+            cell.count += 1
+            cell.lat_sum += lat
+            cell.lon_sum += lon
+            if flora_name:
+                cell.flora[flora_name] += 1
+
+    def level_for(self, zoom: float) -> int:
+        """Return the finest precomputed level not finer than `zoom`."""
+        candidates = [z for z in self.zoom_levels if z <= zoom]
+        return candidates[-1] if candidates else self.zoom_levels[0]
+
+    def cells(self, zoom: float, bbox=None, top_n: int = 3) -> pd.DataFrame:
+        """Return one row per non-empty cell at `zoom` (optionally inside `bbox`).
+
+        Columns: lat/lon (cell centroid), count, top_flora and a short
+        `breakdown` text with the `top_n` most common flora.
+        """
+        level = self.level_for(zoom)
+        rows = []
+        for cell in self._levels[level].values():
+            lat = cell.lat_sum / cell.count
+            lon = cell.lon_sum / cell.count
+            if bbox is not None and not (bbox[0] <= lat <= bbox[2] and bbox[1] <= lon <= bbox[3]):
+                continue
+            common = cell.flora.most_common(top_n)
+            breakdown = ", ".join(f"{name} ({count})" for name, count in common)
+            others = cell.count - sum(count for _, count in common)
+            if others > 0:
+                breakdown += f", otras ({others})"
+            rows.append((lat, lon, cell.count, common[0][0] if common else None, breakdown))
+        return pd.DataFrame(rows, columns=["lat", "lon", "count", "top_flora", "breakdown"])
@@ -0,0 +1,184 @@
+"""Lightweight timing instrumentation for the app's hot paths.
+
+`timer(name)` (a context manager) and `timed(name)` (a decorator) record
+how long a block took into a bounded in-memory ring buffer, so memory use
+stays flat however long the process runs. SQL statements are timed through
+SQLAlchemy engine events (`instrument_engine`), and `rerun(page)` groups
+everything one Streamlit rerun does, so the Rendimiento page can show
+latency percentiles, queries per rerun and cache hit rates.
+
+Nothing is written to disk. METRICS_BUFFER_SIZE sets how many samples are
+kept (default 5000; one tenth of that many reruns).
+"""
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import event
+
+SQL_QUERY = 'sql.query'
+
+
+class Metrics:
+    def __init__(self, maxlen: int = 5000):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=maxlen)  # (name, seconds, finished_at)
+        self._reruns = deque(maxlen=max(1, maxlen // 10))
+        self._cache: Dict[str, List[int]] = {}  # name -> [hits, misses]
+        self._local = threading.local()
+        self._last_profile: Optional[str] = None
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.append((name, seconds, time.time()))
+
+    def record_query(self, seconds: float) -> None:
+        """Record one SQL statement, counting it against the current rerun if any."""
+        self.record(SQL_QUERY, seconds)
+        current = getattr(self._local, 'rerun', None)
+        if current is not None:
+            current['queries'] += 1
+            current['query_seconds'] += seconds
+
+    def cache_lookup(self, name: str, hit: bool) -> None:
+        with self._lock:
+            counts = self._cache.setdefault(name, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    @contextmanager
+    def timer(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def timed(self, name: Optional[str] = None):
+        """Decorator recording each call of the function under `name` (default: its qualified name)."""
+        def decorator(fn):
+            label = name or fn.__qualname__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(label):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def rerun(self, page: str):
+        """Time one page render and count the SQL statements it runs (per thread)."""
+        current = {'page': page, 'queries': 0, 'query_seconds': 0.0, 'started_at': time.time()}
+        previous = getattr(self._local, 'rerun', None)
+        self._local.rerun = current
+        started = time.perf_counter()
+        try:
+            yield current
+        finally:
+            current['seconds'] = time.perf_counter() - started
+            self._local.rerun = previous
+            self.record(f'page.{page}', current['seconds'])
+            with self._lock:
+                self._reruns.append(current)
+
+    @contextmanager
+    def profile(self, enabled: bool = True, limit: int = 40):
+        """Run the block under cProfile and keep the top `limit` functions by cumulative time."""
+        profiler = None
+        if enabled:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is already active in this interpreter
+                profiler = None
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+                self._last_profile = out.getvalue()
+
+    def last_profile(self) -> Optional[str]:
+        return self._last_profile
+
+    def summary(self) -> List[Dict]:
+        """Per name: count, p50/p95/max and total milliseconds, slowest total first."""
+        with self._lock:
+            samples = list(self._samples)
+        by_name: Dict[str, List[float]] = {}
+        for name, seconds, _ in samples:
+            by_name.setdefault(name, []).append(seconds)
+        rows = []
+        for name, values in by_name.items():
+            ms = np.asarray(values) * 1000
+            p50, p95 = np.percentile(ms, [50, 95])
+            rows.append({
+                'name': name,
+                'count': len(ms),
+                'p50_ms': float(p50),
+                'p95_ms': float(p95),
+                'max_ms': float(ms.max()),
+                'total_ms': float(ms.sum()),
+            })
+        return sorted(rows, key=lambda r: r['total_ms'], reverse=True)
+
+    def reruns(self) -> List[Dict]:
+        with self._lock:
+            return [dict(r) for r in self._reruns]
+
+    def cache_stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            counts = {name: tuple(c) for name, c in self._cache.items()}
+        return {
+            name: {'hits': hits, 'misses': misses, 'hit_rate': hits / (hits + misses) if hits + misses else 0.0}
+            for name, (hits, misses) in counts.items()
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._reruns.clear()
+            self._cache.clear()
+            self._last_profile = None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if started:
+        metrics.record_query(time.perf_counter() - started.pop())
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; still count it
+    started = context.connection.info.get('query_started') if context.connection is not None else None
+    if started:
+        metrics.record_query(time.perf_counter() - started.pop())
+
+
+def instrument_engine(engine) -> None:
+    """Time every SQL statement `engine` runs (idempotent)."""
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(engine, 'handle_error', _handle_error)
+
+
+# Process-wide instance shared by every session
+metrics = Metrics(int(os.getenv('METRICS_BUFFER_SIZE', 5000)))
+timer = metrics.timer
+timed = metrics.timed
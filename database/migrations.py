@@ -0,0 +1,382 @@
+"""Versioned schema migrations for databases created by older versions of the app.
+
+`Base.metadata.create_all` only creates missing tables; it never changes
+existing ones. Each step below brings an existing database up to the
+current models and is recorded in the `schema_version` table, so
+`run_migrations` only runs the steps a database has not seen yet. Every
+step also checks what already exists, so running it on a freshly created
+schema is harmless.
+
+`check_indexes` compares the indexes declared in the models with the ones
+the database actually has.
+
+Usage: `python -m database.migrations` to migrate, `--check` to only
+report missing indexes.
+"""
+import argparse
+import os
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import (
+    Column, DateTime, Integer, String, Table, bindparam, create_engine, delete, func, inspect, select, text, update
+)
+
+from models.models import Base, Flora, Observation, RecipeIngredient
+from database.spatial import geohash_encode
+
+schema_version = Table(
+    'schema_version', Base.metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String),
+    Column('applied_at', DateTime),
+)
+
+# Watermark of the last applied near-duplicate run (see database.dedup):
+# observations up to `checked_through_id` were compared with `params`
+dedup_checkpoints = Table(
+    'dedup_checkpoints', Base.metadata,
+    Column('source', String, primary_key=True),
+    Column('params', String),
+    Column('checked_through_id', Integer, nullable=False, default=0),
+    Column('updated_at', DateTime),
+)
+
+# Counters maintained by triggers for changes `observations.change_seq` cannot
+# show: a deleted row leaves no row behind to carry a new sequence number
+data_versions = Table(
+    'data_versions', Base.metadata,
+    Column('name', String, primary_key=True),
+    Column('deletes', Integer, nullable=False, default=0),
+    # Inserted plus edited rows; moves only when the writing transaction commits
+    Column('writes', Integer, nullable=False, default=0, server_default='0'),
+)
+
+# Columns whose edits readers of observations care about; see add_change_tracking
+_TRACKED_COLUMNS = 'datetime, flora_id, user_id, lat, lon, address, description'
+
+_SQLITE_CHANGE_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS observations_change_seq_insert AFTER INSERT ON observations
+    WHEN NEW.change_seq IS NULL BEGIN
+        UPDATE observations SET change_seq = (SELECT coalesce(max(change_seq), 0) + 1 FROM observations)
+        WHERE id = NEW.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS observations_change_seq_update AFTER UPDATE OF {_TRACKED_COLUMNS} ON observations
+    WHEN NEW.change_seq IS OLD.change_seq BEGIN
+        UPDATE observations SET change_seq = (SELECT coalesce(max(change_seq), 0) + 1 FROM observations)
+        WHERE id = NEW.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS observations_deletes AFTER DELETE ON observations BEGIN
+        UPDATE data_versions SET deletes = deletes + 1 WHERE name = 'observations';
+    END""",
+]
+
+_POSTGRESQL_CHANGE_TRIGGERS = [
+    "CREATE SEQUENCE IF NOT EXISTS observation_change_seq",
+    "SELECT setval('observation_change_seq', greatest((SELECT max(change_seq) FROM observations), 1))",
+    "ALTER TABLE observations ALTER COLUMN change_seq SET DEFAULT nextval('observation_change_seq')",
+    """CREATE OR REPLACE FUNCTION observations_touch() RETURNS trigger AS $$
+    BEGIN
+        NEW.change_seq := nextval('observation_change_seq');
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql""",
+    "DROP TRIGGER IF EXISTS observations_change_seq_update ON observations",
+    f"""CREATE TRIGGER observations_change_seq_update BEFORE UPDATE OF {_TRACKED_COLUMNS} ON observations
+    FOR EACH ROW EXECUTE PROCEDURE observations_touch()""",
+    """CREATE OR REPLACE FUNCTION observations_count_deletes() RETURNS trigger AS $$
+    BEGIN
+        UPDATE data_versions SET deletes = deletes + 1 WHERE name = 'observations';
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    "DROP TRIGGER IF EXISTS observations_deletes ON observations",
+    """CREATE TRIGGER observations_deletes AFTER DELETE ON observations
+    FOR EACH STATEMENT EXECUTE PROCEDURE observations_count_deletes()""",
+]
+
+
+def add_geohash_column(engine, batch_size=5000):
+    """Add and backfill `observations.geohash` on databases created before it existed.
+
+    Safe to run repeatedly: the column and index are only created when
+    missing and only rows with a NULL geohash are backfilled.
+    """
+    inspector = inspect(engine)
+    columns = {c['name'] for c in inspector.get_columns('observations')}
+    indexes = {i['name'] for i in inspector.get_indexes('observations')}
+    with engine.begin() as conn:
+        if 'geohash' not in columns:
+            conn.execute(text("ALTER TABLE observations ADD COLUMN geohash VARCHAR(12)"))
+            print("Added observations.geohash column")
+        if 'ix_observations_geohash' not in indexes:
+            for index in Observation.__table__.indexes:
+                if index.name == 'ix_observations_geohash':
+                    index.create(conn)
+            print("Created ix_observations_geohash index")
+
+    table = Observation.__table__
+    filled = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.lat, table.c.lon)
+                .where(table.c.geohash.is_(None), table.c.lat.is_not(None), table.c.lon.is_not(None))
+                .limit(batch_size)
+            ).all()
+            params = [{'obs_id': r.id, 'gh': geohash_encode(r.lat, r.lon)} for r in rows]
+            params = [p for p in params if p['gh'] is not None]
+            if not params:
+                break
+            conn.execute(
+                update(table).where(table.c.id == bindparam('obs_id')).values(geohash=bindparam('gh')),
+                params,
+            )
+            filled += len(params)
+    if filled:
+        print(f"Backfilled geohash for {filled} observations")
+
+
+def add_canonical_id_column(engine):
+    """Add `observations.canonical_id` (near-duplicate links) and its index when missing."""
+    inspector = inspect(engine)
+    columns = {c['name'] for c in inspector.get_columns('observations')}
+    with engine.begin() as conn:
+        if 'canonical_id' not in columns:
+            conn.execute(text("ALTER TABLE observations ADD COLUMN canonical_id INTEGER REFERENCES observations(id)"))
+            print("Added observations.canonical_id column")
+    create_missing_indexes(engine, tables={'observations'})
+    dedup_checkpoints.create(engine, checkfirst=True)
+
+
+_SQLITE_WRITE_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS observations_count_inserts AFTER INSERT ON observations BEGIN
+        UPDATE data_versions SET writes = writes + 1 WHERE name = 'observations';
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS observations_count_updates AFTER UPDATE OF {_TRACKED_COLUMNS} ON observations
+    BEGIN
+        UPDATE data_versions SET writes = writes + 1 WHERE name = 'observations';
+    END""",
+]
+
+# Statement-level, so a 10k-row COPY updates the counter row once
+_POSTGRESQL_WRITE_TRIGGERS = [
+    """CREATE OR REPLACE FUNCTION observations_count_inserts() RETURNS trigger AS $$
+    BEGIN
+        UPDATE data_versions SET writes = writes + (SELECT count(*) FROM new_rows) WHERE name = 'observations';
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    "DROP TRIGGER IF EXISTS observations_count_inserts ON observations",
+    """CREATE TRIGGER observations_count_inserts AFTER INSERT ON observations
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE PROCEDURE observations_count_inserts()""",
+    # Transition tables do not allow a column list: count the rows whose change_seq was renumbered
+    """CREATE OR REPLACE FUNCTION observations_count_updates() RETURNS trigger AS $$
+    BEGIN
+        UPDATE data_versions SET writes = writes + (
+            SELECT count(*) FROM new_rows JOIN old_rows USING (id)
+            WHERE new_rows.change_seq IS DISTINCT FROM old_rows.change_seq
+        ) WHERE name = 'observations';
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    "DROP TRIGGER IF EXISTS observations_count_updates ON observations",
+    """CREATE TRIGGER observations_count_updates AFTER UPDATE ON observations
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE observations_count_updates()""",
+]
+
+
+def add_write_counter(engine):
+    """Add `data_versions.writes`, a count of inserted and edited observations kept by triggers.
+
+    `change_seq` values are handed out when a row is written but only
+    become visible when its transaction commits, so on PostgreSQL a long
+    transaction can commit rows numbered below what a reader has already
+    seen. The counter is updated inside the writing transaction, so a
+    reader that sees it move by more than the rows it finds above its
+    watermark knows rows landed below it.
+    """
+    data_versions.create(engine, checkfirst=True)
+    columns = {c['name'] for c in inspect(engine).get_columns('data_versions')}
+    with engine.begin() as conn:
+        if 'writes' not in columns:
+            conn.execute(text("ALTER TABLE data_versions ADD COLUMN writes INTEGER NOT NULL DEFAULT 0"))
+            print("Added data_versions.writes column")
+        statements = {
+            'sqlite': _SQLITE_WRITE_TRIGGERS,
+            'postgresql': _POSTGRESQL_WRITE_TRIGGERS,
+        }.get(engine.dialect.name, [])
+        for statement in statements:
+            conn.exec_driver_sql(statement)
+
+
+def add_change_tracking(engine):
+    """Add `observations.change_seq` and the `data_versions` table, kept current by triggers.
+
+    Every insert, and every edit of a column in `_TRACKED_COLUMNS`, gives
+    the row a new, higher `change_seq`; every delete bumps
+    `data_versions.deletes`. Both are indexed lookups, so a reader can tell
+    whether anything changed, and fetch just the changed rows, without
+    scanning the table. Triggers are installed on SQLite and PostgreSQL
+    only; elsewhere readers only notice new rows.
+    """
+    inspector = inspect(engine)
+    columns = {c['name'] for c in inspector.get_columns('observations')}
+    with engine.begin() as conn:
+        if 'change_seq' not in columns:
+            conn.execute(text("ALTER TABLE observations ADD COLUMN change_seq INTEGER"))
+            print("Added observations.change_seq column")
+    create_missing_indexes(engine, tables={'observations'})
+    data_versions.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        if conn.execute(select(data_versions.c.name).where(data_versions.c.name == 'observations')).first() is None:
+            conn.execute(data_versions.insert().values(name='observations', deletes=0))
+        statements = {
+            'sqlite': _SQLITE_CHANGE_TRIGGERS,
+            'postgresql': _POSTGRESQL_CHANGE_TRIGGERS,
+        }.get(engine.dialect.name)
+        if statements is None:
+            # change_seq stays NULL, which tells readers to fall back to new ids
+            print(f"No change-tracking triggers for {engine.dialect.name}; edits will only show after a restart")
+            return
+        # Existing rows count as changed in id order
+        conn.execute(update(Observation.__table__).where(Observation.__table__.c.change_seq.is_(None))
+                     .values(change_seq=Observation.__table__.c.id))
+        for statement in statements:
+            conn.exec_driver_sql(statement)
+
+
+def check_indexes(engine):
+    """Return [(table, index name, columns)] for model indexes missing from the database."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {i['name'] for i in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name not in existing:
+                missing.append((table.name, index.name, [c.name for c in index.columns]))
+    return missing
+
+
+def create_missing_indexes(engine, tables=None):
+    """Create the model indexes the database lacks (optionally only for `tables`).
+
+    Indexes on columns a later migration adds are left for that migration.
+    """
+    missing = check_indexes(engine)
+    by_name = {(t.name, i.name): i for t in Base.metadata.sorted_tables for i in t.indexes}
+    inspector = inspect(engine)
+    for table_name, index_name, columns in missing:
+        if tables is not None and table_name not in tables:
+            continue
+        if not {c['name'] for c in inspector.get_columns(table_name)}.issuperset(columns):
+            continue
+        with engine.begin() as conn:
+            by_name[(table_name, index_name)].create(conn)
+        print(f"Created index {index_name} on {table_name} ({', '.join(columns)})")
+
+
+def merge_duplicate_flora(engine):
+    """Merge flora rows sharing a name into the one with the lowest id.
+
+    Observations and recipe ingredients pointing at a duplicate are moved
+    to the kept row before the duplicates are deleted. Returns the number
+    of rows removed.
+    """
+    flora = Flora.__table__
+    removed = 0
+    with engine.begin() as conn:
+        dupes = conn.execute(
+            select(flora.c.name).where(flora.c.name.is_not(None))
+            .group_by(flora.c.name).having(func.count() > 1)
+        ).scalars().all()
+        for name in dupes:
+            ids = conn.execute(select(flora.c.id).where(flora.c.name == name).order_by(flora.c.id)).scalars().all()
+            keep, extra = ids[0], ids[1:]
+            for table in (Observation.__table__, RecipeIngredient.__table__):
+                conn.execute(update(table).where(table.c.flora_id.in_(extra)).values(flora_id=keep))
+            conn.execute(delete(flora).where(flora.c.id.in_(extra)))
+            removed += len(extra)
+    if removed:
+        print(f"Merged {removed} duplicate flora rows")
+    return removed
+
+
+def _unique_flora_names(engine):
+    merge_duplicate_flora(engine)
+    create_missing_indexes(engine, tables={'flora'})
+
+
+def _observation_and_recipe_indexes(engine):
+    create_missing_indexes(engine, tables={'observations', 'recipe_ingredients'})
+
+
+# (version, description, step); append new steps with the next version number
+MIGRATIONS = [
+    (1, "observations.geohash column, index and backfill", add_geohash_column),
+    (2, "indexes on observations and recipe_ingredients foreign keys, datetime and lat/lon",
+     _observation_and_recipe_indexes),
+    (3, "merge duplicate flora names and make flora.name unique", _unique_flora_names),
+    (4, "observations.canonical_id column, index and dedup_checkpoints table for near-duplicate links", add_canonical_id_column),
+    (5, "observations.change_seq column, data_versions table and triggers that maintain them", add_change_tracking),
+    (6, "data_versions.writes counter of committed inserts and edits, and its triggers", add_write_counter),
+]
+
+
+def current_version(engine):
+    schema_version.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def pending_migrations(engine):
+    """Return [(version, description)] of the migrations the database lacks, without changing it."""
+    if not inspect(engine).has_table('schema_version'):
+        version = 0
+    else:
+        with engine.connect() as conn:
+            version = conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+    return [(number, description) for number, description, _ in MIGRATIONS if number > version]
+
+
+def run_migrations(engine):
+    """Apply every migration newer than the database's schema version. Returns the new version."""
+    version = current_version(engine)
+    for number, description, step in MIGRATIONS:
+        if number <= version:
+            continue
+        print(f"Applying migration {number}: {description}")
+        step(engine)
+        with engine.begin() as conn:
+            conn.execute(schema_version.insert().values(
+                version=number, description=description, applied_at=datetime.now()
+            ))
+        version = number
+    return version
+
+
+def main():
+    load_dotenv()
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        raise ValueError("DATABASE_URL not found in environment variables")
+
+    parser = argparse.ArgumentParser(description="Migrate the frutapublica database schema")
+    parser.add_argument('--check', action='store_true', help="only report missing indexes")
+    args = parser.parse_args()
+
+    engine = create_engine(database_url)
+    if not args.check:
+        version = run_migrations(engine)
+        print(f"Database schema is at version {version}")
+    missing = check_indexes(engine)
+    if missing:
+        print("Missing indexes:")
+        for table_name, index_name, columns in missing:
+            print(f"  {table_name}.{index_name} ({', '.join(columns)})")
+    else:
+        print("All model indexes are present")
+
+
+if __name__ == "__main__":
+    main()
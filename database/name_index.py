@@ -0,0 +1,113 @@
+"""Accent- and case-insensitive index over a vocabulary of names.
+
+Used by the fallback store for flora and user names. Each distinct name
+gets an integer code (its position in `names`); lookups return codes so
+callers can map them to whatever they index by name (e.g. row positions).
+
+Exact matches go through a dict, prefix matches through a sorted list and
+substring matches through an n-gram index (1- to 3-grams), so none of them
+has to scan the whole vocabulary.
+"""
+import bisect
+import unicodedata
+from typing import Iterable, List, Optional
+
+_GRAM = 3
+
+
+def normalize_name(text) -> str:
+    """Lower-case `text`, strip accents and collapse whitespace."""
+    if text is None:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+def _grams(text: str):
+    grams = set()
+    for n in range(1, _GRAM + 1):
+        for i in range(len(text) - n + 1):
+            grams.add(text[i:i + n])
+    return grams
+
+
+class NameIndex:
+    def __init__(self, names: Iterable[str] = ()):
+        self.names: List[str] = []
+        self._codes = {}
+        self._normalized: List[str] = []
+        self._by_normalized = {}
+        self._sorted: List[tuple] = []
+        self._grams = {}
+        self._sorted_names: Optional[List[str]] = None
+        for name in names:
+            self.add(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name) -> bool:
+        return name in self._codes
+
+    def code(self, name) -> Optional[int]:
+        """Return the code for `name` (exact spelling), or None if unknown."""
+        return self._codes.get(name)
+
+    def add(self, name: str) -> int:
+        """Return the code for `name`, adding it to the vocabulary if new."""
+        code = self._codes.get(name)
+        if code is not None:
+            return code
+        code = len(self.names)
+        norm = normalize_name(name)
+        self.names.append(name)
+        self._codes[name] = code
+        self._normalized.append(norm)
+        self._by_normalized.setdefault(norm, []).append(code)
+        bisect.insort(self._sorted, (norm, code))
+        for gram in _grams(norm):
+            self._grams.setdefault(gram, set()).add(code)
+        self._sorted_names = None
+        return code
+
+    def sorted_names(self) -> List[str]:
+        """Return the distinct names in alphabetical order (cached until the next add)."""
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self.names)
+        return self._sorted_names
+
+    def exact(self, query: str) -> List[int]:
+        return list(self._by_normalized.get(normalize_name(query), ()))
+
+    def prefix(self, query: str) -> List[int]:
+        norm = normalize_name(query)
+        start = bisect.bisect_left(self._sorted, (norm,))
+        codes = []
+        for key, code in self._sorted[start:]:
+            if not key.startswith(norm):
+                break
+            codes.append(code)
+        return sorted(codes)
+
+    def substring(self, query: str) -> List[int]:
+        norm = normalize_name(query)
+        if not norm:
+            return list(range(len(self.names)))
+        if len(norm) <= _GRAM:
+            return sorted(self._grams.get(norm, ()))
+        postings = [self._grams.get(norm[i:i + _GRAM], set()) for i in range(len(norm) - _GRAM + 1)]
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        # Trigrams can match out of order, so confirm the full substring
+        return sorted(c for c in candidates if norm in self._normalized[c])
+
+    def search(self, query: str, mode: str = "substring") -> List[int]:
+        """Return codes of names matching `query`; `mode` is exact, prefix or substring."""
+        if mode == "exact":
+            return self.exact(query)
+        if mode == "prefix":
+            return self.prefix(query)
+        if mode == "substring":
+            return self.substring(query)
+        raise ValueError(f"Unknown match mode: {mode}")
@@ -0,0 +1,149 @@
+"""Recipes without a database: an append-only JSONL file plus an ingredient index.
+
+`data/recipes.jsonl` holds one recipe per line (`id`, `name`, `prep`,
+`ingredients`). Adding a recipe appends a single line under the same
+advisory lock the fallback CSV uses, so it costs O(1) regardless of how
+many recipes exist; `refresh()` reads only lines appended since the last
+read, after checking that the block before that point is unchanged (a file
+rewritten in place is reloaded from scratch). The next id is a running
+maximum, not a scan. The legacy `recipes_fallback.json` (one JSON array)
+is converted the first time the JSONL file is created.
+
+`IngredientIndex` maps ingredient names to recipe ids through a
+`NameIndex`, so "recipes containing X" is a lookup in both backends.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from database.csv_appender import file_lock, tail_digest
+from database.name_index import NameIndex
+
+
+class IngredientIndex:
+    """Inverted index from ingredient name to the ids of recipes using it."""
+
+    def __init__(self, recipes: Iterable[Dict] = ()):
+        self._names = NameIndex()
+        self._recipe_ids: List[List[int]] = []
+        for recipe in recipes:
+            self.add(recipe)
+
+    def add(self, recipe: Dict) -> None:
+        for ingredient in dict.fromkeys(recipe.get('ingredients') or ()):
+            code = self._names.add(ingredient)
+            if code == len(self._recipe_ids):
+                self._recipe_ids.append([])
+            self._recipe_ids[code].append(recipe['id'])
+
+    def recipe_ids(self, ingredient: str, mode: str = 'exact') -> List[int]:
+        """Return ids of recipes with an ingredient matching `ingredient` (exact, prefix or substring)."""
+        ids = set()
+        for code in self._names.search(ingredient, mode):
+            ids.update(self._recipe_ids[code])
+        return sorted(ids)
+
+    def ingredients(self) -> List[str]:
+        return self._names.sorted_names()
+
+
+class RecipeStore:
+    def __init__(self, path, legacy_json_path=None):
+        self.path = Path(path)
+        self.legacy_json_path = Path(legacy_json_path) if legacy_json_path else None
+        self._recipes: List[Dict] = []
+        self._by_id: Dict[int, Dict] = {}
+        self._max_id = 0
+        self._index = IngredientIndex()
+        self._offset = 0
+        self._inode = None
+        self._tail = None
+        if not self.path.exists():
+            self._migrate_legacy()
+        self.refresh()
+
+    def _migrate_legacy(self) -> None:
+        if self.legacy_json_path is None or not self.legacy_json_path.exists():
+            return
+        with open(self.legacy_json_path, 'r', encoding='utf-8') as fh:
+            recipes = json.load(fh)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            for recipe in recipes:
+                fh.write(json.dumps(recipe, ensure_ascii=False) + '\n')
+            fh.flush()
+            os.fsync(fh.fileno())
+        with file_lock(self.path):
+            if not self.path.exists():
+                os.replace(tmp, self.path)
+            else:
+                os.unlink(tmp)
+
+    def _load(self, recipe: Dict) -> None:
+        self._recipes.append(recipe)
+        self._by_id[recipe['id']] = recipe
+        self._max_id = max(self._max_id, recipe['id'])
+        self._index.add(recipe)
+
+    def _read_new_lines(self) -> None:
+        """Parse complete lines appended after `_offset` (caller holds the lock)."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return
+        with open(self.path, 'rb') as fh:
+            if self._inode is not None and (st.st_ino != self._inode or st.st_size < self._offset
+                                            or tail_digest(fh, self._offset) != self._tail):
+                # Replaced, truncated or rewritten in place: start over
+                self._recipes, self._by_id, self._index = [], {}, IngredientIndex()
+                self._max_id = 0
+                self._offset = 0
+            self._inode = st.st_ino
+            fh.seek(self._offset)
+            data = fh.read(st.st_size - self._offset)
+            # A line without its newline is still being written (or torn); leave it
+            end = data.rfind(b'\n') + 1
+            for line in data[:end].splitlines():
+                if line.strip():
+                    self._load(json.loads(line))
+            self._offset += end
+            self._tail = tail_digest(fh, self._offset)
+
+    def refresh(self) -> None:
+        """Load recipes appended to the file since it was last read."""
+        with file_lock(self.path, shared=True):
+            self._read_new_lines()
+
+    def append(self, name: str, prep: str, ingredients: List[str]) -> int:
+        """Append a recipe and return its new id."""
+        with file_lock(self.path):
+            self._read_new_lines()
+            recipe = {
+                'id': self._max_id + 1,
+                'name': name,
+                'prep': prep,
+                'ingredients': list(ingredients),
+            }
+            line = (json.dumps(recipe, ensure_ascii=False) + '\n').encode('utf-8')
+            with open(self.path, 'a+b') as fh:
+                # Drop a torn tail left by a writer that died mid-line
+                fh.truncate(self._offset)
+                fh.write(line)
+                fh.flush()
+                os.fsync(fh.fileno())
+                self._offset += len(line)
+                self._tail = tail_digest(fh, self._offset)
+            self._inode = os.stat(self.path).st_ino
+            self._load(recipe)
+        return recipe['id']
+
+    def all(self) -> List[Dict]:
+        return [dict(r, ingredients=list(r['ingredients'])) for r in self._recipes]
+
+    def get(self, recipe_id: int) -> Optional[Dict]:
+        recipe = self._by_id.get(recipe_id)
+        return None if recipe is None else dict(recipe, ingredients=list(recipe['ingredients']))
+
+    def with_ingredient(self, ingredient: str, mode: str = 'exact') -> List[Dict]:
+        return [self.get(i) for i in self._index.recipe_ids(ingredient, mode)]
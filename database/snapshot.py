@@ -0,0 +1,155 @@
+"""Binary snapshot of the fallback CSV, memory-mapped on load.
+
+After `FallbackStore` parses the CSV it writes its normalized columns to an
+Arrow IPC file next to it (`flora_data.csv.arrow`). Later loads, in this
+or any other worker process, memory-map that file instead of parsing the
+CSV. The numeric columns (id, lat, lon, datetime and the interned flora
+and user codes) become read-only NumPy views of the mapped pages, which
+the OS shares between processes. Only the free-text columns are
+materialized.
+
+The snapshot records the size, mtime and SHA-256 of the CSV bytes it was
+built from. It is used as is when size and mtime still match. When they
+differ, it is still used if its prefix of the CSV hashes the same (a touch,
+or rows appended since; the caller tails those from the CSV). Otherwise it
+is ignored and rebuilt.
+
+pyarrow is optional: without it, or with FALLBACK_SNAPSHOT=0, the CSV is
+always parsed.
+"""
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+_METADATA_KEY = b'frutapublica'
+_NUMERIC = ['id', 'lat', 'lon', 'datetime', 'flora_codes', 'user_codes']
+
+
+class Snapshot(NamedTuple):
+    columns: Dict
+    header: List[str]
+    csv_size: int
+
+
+def snapshot_enabled() -> bool:
+    return pa is not None and os.getenv('FALLBACK_SNAPSHOT', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def snapshot_path(csv_path) -> Path:
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + '.arrow')
+
+
+def hash_prefix(path, size: int) -> str:
+    """SHA-256 of the first `size` bytes of `path`."""
+    digest = hashlib.sha256()
+    remaining = size
+    with open(path, 'rb') as fh:
+        while remaining > 0:
+            chunk = fh.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def write_snapshot(csv_path, columns: Dict, header: List[str], csv_size: int, csv_mtime_ns: int,
+                   csv_sha256: str) -> Optional[Path]:
+    """Write `columns` (the store's encoded arrays) as the snapshot of `csv_path`.
+
+    `columns` has id, lat, lon, datetime, flora_codes, user_codes, address
+    and description arrays plus the flora_names and user_names lists the
+    codes point into. Returns the snapshot path, or None if it could not be
+    written (the store then keeps working from the CSV).
+    """
+    if not snapshot_enabled():
+        return None
+    path = snapshot_path(csv_path)
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    try:
+        table = pa.table({
+            'id': pa.array(columns['id']),
+            'lat': pa.array(columns['lat']),
+            'lon': pa.array(columns['lon']),
+            # NaT is stored as its int64 value so the column maps back without a copy
+            'datetime': pa.array(columns['datetime'].view(np.int64)),
+            'flora_codes': pa.array(columns['flora_codes']),
+            'user_codes': pa.array(columns['user_codes']),
+            'address': pa.array(columns['address'], type=pa.string()),
+            'description': pa.array(columns['description'], type=pa.string()),
+        })
+        metadata = {
+            'version': SNAPSHOT_VERSION,
+            'header': header,
+            'csv_size': csv_size,
+            'csv_mtime_ns': csv_mtime_ns,
+            'csv_sha256': csv_sha256,
+            'flora_names': list(columns['flora_names']),
+            'user_names': list(columns['user_names']),
+        }
+        table = table.replace_schema_metadata({_METADATA_KEY: json.dumps(metadata, ensure_ascii=False)})
+        with pa.OSFile(str(tmp), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, path)
+    except (OSError, pa.ArrowException) as exc:
+        logger.warning("Could not write fallback snapshot %s: %s", path, exc)
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        return None
+    return path
+
+
+def _column(table, name):
+    column = table[name]
+    if column.num_chunks == 1:
+        return column.chunk(0).to_numpy(zero_copy_only=name in _NUMERIC)
+    return column.to_numpy()
+
+
+def load_snapshot(csv_path, csv_size: int, csv_mtime_ns: int) -> Optional[Snapshot]:
+    """Memory-map the snapshot of `csv_path` if it still matches the CSV, else return None.
+
+    The caller should hold the CSV's shared lock so it is not appended to
+    while the prefix hash is checked.
+    """
+    path = snapshot_path(csv_path)
+    if not snapshot_enabled() or not path.exists():
+        return None
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(str(path), 'r'))
+        metadata = json.loads(reader.schema.metadata[_METADATA_KEY])
+        if metadata.get('version') != SNAPSHOT_VERSION or metadata['csv_size'] > csv_size:
+            return None
+        if (metadata['csv_size'], metadata['csv_mtime_ns']) != (csv_size, csv_mtime_ns):
+            # Touched or appended to: still valid if the bytes it covers are unchanged
+            if hash_prefix(csv_path, metadata['csv_size']) != metadata['csv_sha256']:
+                return None
+        table = reader.read_all()
+        columns = {name: _column(table, name) for name in table.column_names}
+    except (OSError, KeyError, TypeError, ValueError, pa.ArrowException) as exc:
+        logger.warning("Ignoring unreadable fallback snapshot %s: %s", path, exc)
+        return None
+    columns['datetime'] = columns['datetime'].view('datetime64[ns]')
+    columns['address'] = np.asarray(columns['address'], dtype=object)
+    columns['description'] = np.asarray(columns['description'], dtype=object)
+    columns['flora_names'] = metadata['flora_names']
+    columns['user_names'] = metadata['user_names']
+    return Snapshot(columns, metadata['header'], metadata['csv_size'])
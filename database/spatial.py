@@ -0,0 +1,235 @@
+"""Spatial helpers for "fruit near me" queries.
+
+- `haversine_m` computes great-circle distances (vectorized with NumPy).
+- `geohash_encode` / `geohash_prefixes_for_bbox` back the indexed
+  `observations.geohash` column on the SQL side: a bounding box becomes a
+  handful of geohash prefixes that a B-tree index can range-scan.
+- `GridIndex` buckets row positions of the fallback store into fixed-size
+  lat/lon cells so bounding-box, radius and k-nearest queries only touch
+  the cells around the query point.
+"""
+import math
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180.0
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters; arguments may be scalars or arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bbox_around(lat: float, lon: float, radius_m: float) -> Tuple[float, float, float, float]:
+    """Return (min_lat, min_lon, max_lat, max_lon) enclosing a circle of `radius_m`."""
+    dlat = radius_m / METERS_PER_DEGREE
+    cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 89.9)))
+    dlon = min(radius_m / (METERS_PER_DEGREE * cos_lat), 180.0)
+    return (max(lat - dlat, -90.0), max(lon - dlon, -180.0), min(lat + dlat, 90.0), min(lon + dlon, 180.0))
+
+
+def geohash_encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> Optional[str]:
+    """Encode a coordinate as a geohash string, or None for missing coordinates."""
+    if lat is None or lon is None or math.isnan(lat) or math.isnan(lon):
+        return None
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    ch = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        ch <<= 1
+        if value >= mid:
+            ch |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_ALPHABET[ch])
+            bits = 0
+            ch = 0
+    return "".join(chars)
+
+
+def _geohash_cell_size(precision: int) -> Tuple[float, float]:
+    """Return (lat_degrees, lon_degrees) covered by a geohash cell of `precision`."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = (5 * precision) // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def geohash_prefixes_for_bbox(min_lat, min_lon, max_lat, max_lon, max_cells: int = 16) -> List[str]:
+    """Return geohash prefixes whose cells cover the bounding box.
+
+    Picks the finest precision that needs at most `max_cells` prefixes, so
+    an index scan stays small for both tiny and large boxes. Returns [""]
+    (match everything) when even a single character is too fine.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        dlat, dlon = _geohash_cell_size(precision)
+        rows = math.floor(max_lat / dlat) - math.floor(min_lat / dlat) + 1
+        cols = math.floor(max_lon / dlon) - math.floor(min_lon / dlon) + 1
+        if rows * cols > max_cells:
+            continue
+        prefixes = set()
+        for i in range(rows):
+            lat = min(min_lat + i * dlat, max_lat)
+            for j in range(cols):
+                lon = min(min_lon + j * dlon, max_lon)
+                prefixes.add(geohash_encode(lat, lon, precision))
+            prefixes.add(geohash_encode(lat, max_lon, precision))
+        for j in range(cols):
+            prefixes.add(geohash_encode(max_lat, min(min_lon + j * dlon, max_lon), precision))
+        prefixes.add(geohash_encode(max_lat, max_lon, precision))
+        return sorted(prefixes)
+    return [""]
+
+
+class GridIndex:
+    """Uniform lat/lon grid mapping cells to row positions.
+
+    `cell_deg` defaults to 0.01 degrees (about 1.1 km of latitude). Rows
+    without coordinates are simply not indexed.
+    """
+
+    def __init__(self, cell_deg: float = 0.01):
+        self.cell_deg = float(cell_deg)
+        self._cells: Dict[Tuple[int, int], array] = {}
+        self._lat = np.empty(0)
+        self._lon = np.empty(0)
+        self._bounds = None
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def _extend_bounds(self, ix_min, ix_max, iy_min, iy_max):
+        if self._bounds is None:
+            self._bounds = [ix_min, ix_max, iy_min, iy_max]
+        else:
+            b = self._bounds
+            self._bounds = [min(b[0], ix_min), max(b[1], ix_max), min(b[2], iy_min), max(b[3], iy_max)]
+
+    def build(self, lats: np.ndarray, lons: np.ndarray) -> None:
+        """Index all positions of `lats`/`lons` at once."""
+        self._cells = {}
+        self._bounds = None
+        self.attach(lats, lons)
+        valid = np.flatnonzero(~(np.isnan(lats) | np.isnan(lons)))
+        if not len(valid):
+            return
+        ix = np.floor(lats[valid] / self.cell_deg).astype(np.int64)
+        iy = np.floor(lons[valid] / self.cell_deg).astype(np.int64)
+        order = np.lexsort((iy, ix))
+        ix, iy, valid = ix[order], iy[order], valid[order]
+        breaks = np.flatnonzero((np.diff(ix) != 0) | (np.diff(iy) != 0)) + 1
+        for start, stop in zip(np.r_[0, breaks], np.r_[breaks, len(valid)]):
+            self._cells[(int(ix[start]), int(iy[start]))] = array("q", valid[start:stop].astype(np.int64).tobytes())
+        self._extend_bounds(int(ix.min()), int(ix.max()), int(iy.min()), int(iy.max()))
+
+    def attach(self, lats: np.ndarray, lons: np.ndarray) -> None:
+        """Point the index at the (possibly reallocated) coordinate arrays."""
+        self._lat = lats
+        self._lon = lons
+
+    def add(self, pos: int, lat: float, lon: float) -> None:
+        if lat is None or lon is None or math.isnan(lat) or math.isnan(lon):
+            return
+        ix, iy = self._cell(lat, lon)
+        self._cells.setdefault((ix, iy), array("q")).append(pos)
+        self._extend_bounds(ix, ix, iy, iy)
+
+    def _gather(self, cells: Iterable[Tuple[int, int]]) -> np.ndarray:
+        chunks = [np.frombuffer(self._cells[c], dtype=np.int64) for c in cells if c in self._cells]
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+
+    def bbox(self, min_lat, min_lon, max_lat, max_lon) -> np.ndarray:
+        """Return sorted positions inside the bounding box."""
+        ix0, iy0 = self._cell(min_lat, min_lon)
+        ix1, iy1 = self._cell(max_lat, max_lon)
+        n_cells = (ix1 - ix0 + 1) * (iy1 - iy0 + 1)
+        if n_cells <= len(self._cells):
+            cells = ((ix, iy) for ix in range(ix0, ix1 + 1) for iy in range(iy0, iy1 + 1))
+        else:
+            cells = [c for c in self._cells if ix0 <= c[0] <= ix1 and iy0 <= c[1] <= iy1]
+        pos = self._gather(cells)
+        lat, lon = self._lat[pos], self._lon[pos]
+        pos = pos[(lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)]
+        pos.sort()
+        return pos
+
+    def radius(self, lat, lon, radius_m) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (positions, distances) within `radius_m`, nearest first."""
+        pos = self.bbox(*bbox_around(lat, lon, radius_m))
+        dist = haversine_m(lat, lon, self._lat[pos], self._lon[pos])
+        keep = dist <= radius_m
+        pos, dist = pos[keep], dist[keep]
+        order = np.argsort(dist, kind="stable")
+        return pos[order], dist[order]
+
+    def nearest(self, lat, lon, k: int, accept: Optional[Callable[[np.ndarray], np.ndarray]] = None):
+        """Return (positions, distances) of the `k` nearest rows.
+
+        Searches rings of cells outwards from the query cell and stops once
+        the k-th best distance is closer than any unvisited ring can be.
+        `accept` optionally maps candidate positions to a boolean mask
+        (e.g. to restrict to one flora).
+        """
+        if k <= 0 or not self._cells:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        cx, cy = self._cell(lat, lon)
+        b = self._bounds
+        max_ring = max(abs(cx - b[0]), abs(cx - b[1]), abs(cy - b[2]), abs(cy - b[3]))
+        found_pos, found_dist = [], []
+        best = np.empty(0)
+        for ring in range(max_ring + 1):
+            if 8 * ring > len(self._cells):
+                # Sparse grid: scanning the occupied cells is cheaper than more rings
+                return self._nearest_scan(lat, lon, k, accept)
+            if ring == 0:
+                cells = [(cx, cy)]
+            else:
+                cells = [(cx + dx, cy + dy) for dx in range(-ring, ring + 1) for dy in (-ring, ring)]
+                cells += [(cx + dx, cy + dy) for dx in (-ring, ring) for dy in range(-ring + 1, ring)]
+            pos = self._gather(cells)
+            if accept is not None and len(pos):
+                pos = pos[accept(pos)]
+            if len(pos):
+                found_pos.append(pos)
+                found_dist.append(haversine_m(lat, lon, self._lat[pos], self._lon[pos]))
+                best = np.sort(np.concatenate(found_dist))[:k]
+            if len(best) >= k:
+                # Anything not visited yet is at least `ring` whole cells away
+                edge_lat = min(abs(lat) + (ring + 1) * self.cell_deg, 90.0)
+                reach = ring * self.cell_deg * METERS_PER_DEGREE * math.cos(math.radians(edge_lat))
+                if best[-1] <= reach:
+                    break
+        if not found_pos:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        return _top_k(np.concatenate(found_pos), np.concatenate(found_dist), k)
+
+    def _nearest_scan(self, lat, lon, k, accept):
+        pos = self._gather(self._cells)
+        if accept is not None and len(pos):
+            pos = pos[accept(pos)]
+        return _top_k(pos, haversine_m(lat, lon, self._lat[pos], self._lon[pos]), k)
+
+
+def _top_k(positions: np.ndarray, distances: np.ndarray, k: int):
+    if len(distances) > k:
+        part = np.argpartition(distances, k - 1)[:k]
+        positions, distances = positions[part], distances[part]
+    order = np.argsort(distances, kind="stable")
+    return positions[order], distances[order]
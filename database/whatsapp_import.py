@@ -0,0 +1,312 @@
+"""Import observations straight from a WhatsApp chat export.
+
+The historical data (`data/temp.csv`, then `data/flora.csv`) was converted
+from the group chat by hand. This reads the exported chat (`_chat.txt` or
+the export's .zip) line by line instead:
+
+1. Lines are cut into chunks at message boundaries and parsed in worker
+   processes: timestamp, sender, text, the `maps.google.com/?q=lat,lon`
+   location and attached image file names.
+2. Messages are paired per sender: a location message becomes a sighting,
+   together with that sender's images and text from `window` before it
+   and everything they send after it until their next location or the
+   window closes.
+3. The flora is the first known flora name (accent- and case-insensitive,
+   plurals included) mentioned in the sighting's text.
+4. Sightings are written in batches through `add_observations`, keyed by a
+   hash of the location message, so importing the same export again only
+   adds what is new.
+
+Usage: `python -m database.whatsapp_import chat.zip [--workers 4] [--dry-run]`
+"""
+import argparse
+import collections
+import contextlib
+import hashlib
+import io
+import multiprocessing
+import re
+import time
+import zipfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from database.name_index import NameIndex, normalize_name
+
+DEFAULT_WINDOW = timedelta(minutes=5)
+CHUNK_LINES = 20000
+BATCH_SIZE = 5000
+# Messages kept per sender while waiting for a location
+_MAX_BEFORE = 20
+
+# "11/16/21, 3:36 PM - Name: text" (Android) or "[11/16/21, 3:36:12 PM] Name: text" (iOS)
+_MESSAGE_START = re.compile(r'\u200e?\[?\d{1,2}[/.]\d{1,2}[/.]\d{2,4},?\s+\d{1,2}:\d{2}')
+_MESSAGE = re.compile(
+    r'\u200e?\[?(\d{1,2})[/.](\d{1,2})[/.](\d{2,4}),?\s+(\d{1,2}):(\d{2})(?::(\d{2}))?'
+    r'(?:\s*([AaPp])\.?\s?[Mm]\.?)?\]?\s*[-–]?\s*([^:]+?):\s(.*)'
+)
+_LOCATION = re.compile(r'https?://maps\.google\.com/\?q=(-?\d{1,3}(?:\.\d+)?),\s?(-?\d{1,3}(?:\.\d+)?)')
+_IMAGE = re.compile(
+    r'([\w.-]+\.(?:jpe?g|png|webp|heic|gif))\s*\(file attached\)|<attached:\s*([^>]+\.(?:jpe?g|png|webp|heic|gif))>',
+    re.IGNORECASE,
+)
+
+
+class Message(NamedTuple):
+    timestamp: datetime
+    sender: str
+    text: str
+    location: Optional[Tuple[str, str]]
+    images: Tuple[str, ...]
+
+
+class Sighting(NamedTuple):
+    timestamp: datetime
+    sender: str
+    lat: float
+    lon: float
+    address: str
+    text: str
+    images: Tuple[str, ...]
+    message_hash: str
+
+
+def _timestamp(match, dayfirst):
+    first, second, year, hour, minute, second_of_minute, meridiem = match.groups()[:7]
+    month, day = (int(second), int(first)) if dayfirst else (int(first), int(second))
+    year = int(year)
+    if year < 100:
+        year += 2000
+    hour = int(hour)
+    if meridiem:
+        hour = hour % 12 + (12 if meridiem in 'Pp' else 0)
+    return datetime(year, month, day, hour, int(minute), int(second_of_minute or 0))
+
+
+def _message(match, text, dayfirst):
+    try:
+        timestamp = _timestamp(match, dayfirst)
+    except ValueError:
+        return None
+    text = text.replace('\u200e', '').strip()
+    location = _LOCATION.search(text)
+    images = tuple(a or b for a, b in _IMAGE.findall(text))
+    return Message(timestamp, match.group(8).strip(), text, location.groups() if location else None, images)
+
+
+def parse_lines(lines: List[str], dayfirst: bool = False) -> List[Message]:
+    """Parse export lines into messages; lines without a timestamp continue the previous message.
+
+    Lines before the first message, system notices (no sender) and
+    messages with an impossible date are dropped.
+    """
+    messages = []
+    match, parts = None, []
+    for line in lines:
+        line = line.rstrip('\r\n').lstrip('\ufeff')
+        if _MESSAGE_START.match(line):
+            if match is not None:
+                message = _message(match, '  '.join(parts), dayfirst)
+                if message is not None:
+                    messages.append(message)
+            match = _MESSAGE.match(line)
+            parts = [match.group(9)] if match else []
+        elif match is not None and line.strip():
+            parts.append(line.strip())
+    if match is not None:
+        message = _message(match, '  '.join(parts), dayfirst)
+        if message is not None:
+            messages.append(message)
+    return messages
+
+
+def _chunks(lines: Iterable[str], chunk_lines: int) -> Iterator[List[str]]:
+    chunk = []
+    for line in lines:
+        if len(chunk) >= chunk_lines and _MESSAGE_START.match(line):
+            yield chunk
+            chunk = []
+        chunk.append(line)
+    if chunk:
+        yield chunk
+
+
+def parse_stream(lines: Iterable[str], dayfirst: bool = False, workers: int = 1,
+                 chunk_lines: int = CHUNK_LINES) -> Iterator[Message]:
+    """Yield the messages of `lines` in order, parsing chunks in `workers` processes.
+
+    At most two chunks per worker are in flight, so memory stays bounded
+    however long the export is.
+    """
+    chunks = _chunks(lines, chunk_lines)
+    if workers <= 1:
+        for chunk in chunks:
+            yield from parse_lines(chunk, dayfirst)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(parse_lines, (chunk, dayfirst)))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def message_hash(message: Message) -> str:
+    """Identifies a location message across re-exports of the same chat."""
+    key = f'{message.sender}\n{message.timestamp.isoformat()}\n{message.text}'
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _sighting(anchor: Message, parts: List[Message]) -> Sighting:
+    lat, lon = anchor.location
+    return Sighting(
+        timestamp=anchor.timestamp,
+        sender=anchor.sender,
+        lat=float(lat),
+        lon=float(lon),
+        address=f'{lat},{lon}',
+        text='  '.join(m.text for m in parts if m.text),
+        images=tuple(image for m in parts for image in m.images),
+        message_hash=message_hash(anchor),
+    )
+
+
+def pair_messages(messages: Iterable[Message], window: timedelta = DEFAULT_WINDOW) -> Iterator[Sighting]:
+    """Group each location message with the same sender's images and text around it.
+
+    A sighting takes the sender's unclaimed messages from `window` before
+    its location and all their messages after it, until their next
+    location or until `window` has passed since the location.
+    """
+    open_sightings = {}  # sender -> (location message, parts)
+    before = {}  # sender -> recent messages without a location
+    for message in messages:
+        expired = [s for s, (anchor, _) in open_sightings.items() if message.timestamp - anchor.timestamp > window]
+        for sender in expired:
+            yield _sighting(*open_sightings.pop(sender))
+        if message.location is not None:
+            if message.sender in open_sightings:
+                yield _sighting(*open_sightings.pop(message.sender))
+            recent = [m for m in before.pop(message.sender, ()) if message.timestamp - m.timestamp <= window]
+            open_sightings[message.sender] = (message, recent + [message])
+        elif message.sender in open_sightings:
+            open_sightings[message.sender][1].append(message)
+        else:
+            before.setdefault(message.sender, collections.deque(maxlen=_MAX_BEFORE)).append(message)
+    for anchor, parts in open_sightings.values():
+        yield _sighting(anchor, parts)
+
+
+class FloraMatcher:
+    """Finds known flora names in free text, ignoring accents and case."""
+
+    def __init__(self, names: Iterable[str]):
+        self._index = NameIndex(names)
+        normalized = sorted({normalize_name(n) for n in self._index.names} - {''}, key=len, reverse=True)
+        # Longest names first, so "cafe y nispero" wins over "nispero"; plurals count too
+        self._pattern = re.compile(
+            r'(?<!\w)(' + '|'.join(map(re.escape, normalized)) + r')(?:e?s)?(?!\w)'
+        ) if normalized else None
+
+    def infer(self, text: str) -> Optional[str]:
+        """Return the first known flora name mentioned in `text`, or None."""
+        if self._pattern is None:
+            return None
+        text = _IMAGE.sub(' ', _LOCATION.sub(' ', text))
+        match = self._pattern.search(normalize_name(text))
+        if match is None:
+            return None
+        return self._index.names[self._index.exact(match.group(1))[0]]
+
+
+@contextlib.contextmanager
+def _open_export(path: Path):
+    """Text stream of the chat in `path`: a .txt file or the .txt inside an export .zip.
+
+    A context manager, so a .zip export's archive is closed with its stream.
+    """
+    if path.suffix.lower() != '.zip':
+        with open(path, 'r', encoding='utf-8-sig', errors='replace') as fh:
+            yield fh
+        return
+    with zipfile.ZipFile(path) as archive:
+        names = [n for n in archive.namelist() if n.lower().endswith('.txt')]
+        if not names:
+            raise ValueError(f"No chat .txt found in {path}")
+        with io.TextIOWrapper(archive.open(names[0]), encoding='utf-8-sig', errors='replace') as fh:
+            yield fh
+
+
+def import_chat(path, workers: int = 1, dayfirst: bool = False, window: timedelta = DEFAULT_WINDOW,
+                batch_size: int = BATCH_SIZE, default_flora: Optional[str] = None, dry_run: bool = False):
+    """Import the sightings in the chat export at `path`; returns counts of what happened.
+
+    Sightings whose flora cannot be inferred are skipped unless
+    `default_flora` is given. With `dry_run` nothing is written.
+    """
+    from database.database_utils import add_observations, get_flora_names
+
+    matcher = FloraMatcher(get_flora_names())
+    stats = {'sightings': 0, 'unidentified': 0, 'written': 0, 'already_imported': 0}
+    rows, hashes = [], []
+    started = time.perf_counter()
+
+    def flush():
+        if not dry_run:
+            written = add_observations(rows, hashes)
+            stats['written'] += written
+            stats['already_imported'] += len(rows) - written
+        elapsed = time.perf_counter() - started
+        print(f"Processed {stats['sightings']} sightings ({stats['sightings'] / max(elapsed, 1e-9):,.0f}/s), "
+              f"wrote {stats['written']}")
+        rows.clear()
+        hashes.clear()
+
+    with _open_export(Path(path)) as fh:
+        for sighting in pair_messages(parse_stream(fh, dayfirst, workers), window):
+            stats['sightings'] += 1
+            flora = matcher.infer(sighting.text) or default_flora
+            if flora is None:
+                stats['unidentified'] += 1
+                continue
+            rows.append({
+                'datetime': sighting.timestamp,
+                'flora_name': flora,
+                'username': sighting.sender,
+                'lat': sighting.lat,
+                'lon': sighting.lon,
+                'address': sighting.address,
+                'description': sighting.text,
+            })
+            hashes.append(sighting.message_hash)
+            if len(rows) >= batch_size:
+                flush()
+    if rows:
+        flush()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import observations from a WhatsApp chat export")
+    parser.add_argument('path', type=Path, help="_chat.txt or the export .zip")
+    parser.add_argument('--workers', type=int, default=max(1, min(4, multiprocessing.cpu_count() - 1)),
+                        help="parser processes (1 parses in this process)")
+    parser.add_argument('--dayfirst', action='store_true', help="dates are day/month/year")
+    parser.add_argument('--window-minutes', type=float, default=DEFAULT_WINDOW.total_seconds() / 60,
+                        help="how far from a location a sender's images and text still belong to it")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--default-flora', help="flora for sightings no known name matches (default: skip)")
+    parser.add_argument('--dry-run', action='store_true', help="parse and match only, write nothing")
+    args = parser.parse_args()
+
+    stats = import_chat(args.path, args.workers, args.dayfirst, timedelta(minutes=args.window_minutes),
+                        args.batch_size, args.default_flora, args.dry_run)
+    print(f"{stats['sightings']} sightings: {stats['written']} written, "
+          f"{stats['already_imported']} already imported, {stats['unidentified']} without a known flora")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Google Drive access for photo uploads.
+
+Building credentials and the discovery client is slow, so it happens once
+per process: `DriveServiceFactory` keeps the credentials and hands every
+worker thread its own cached service object (googleapiclient services are
+not thread-safe, their shared httplib2 connection would get mixed up).
+
+`FakeDriveService` implements the small part of the Drive API the uploads
+use and stores files in a local directory, so the upload queue can be
+exercised without network access or credentials.
+"""
+import io
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive.file']
+
+
+class DriveServiceFactory:
+    """Callable returning the calling thread's Drive service, built on first use."""
+
+    def __init__(self, credentials_info):
+        self._credentials_info = dict(credentials_info)
+        self._credentials = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _get_credentials(self):
+        with self._lock:
+            if self._credentials is None:
+                from google.oauth2 import service_account
+
+                self._credentials = service_account.Credentials.from_service_account_info(
+                    self._credentials_info, scopes=DRIVE_SCOPES
+                )
+            return self._credentials
+
+    def __call__(self):
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            from googleapiclient.discovery import build
+
+            service = build('drive', 'v3', credentials=self._get_credentials(), cache_discovery=False)
+            self._local.service = service
+        return service
+
+
+def upload_file(service, data: bytes, name: str, mimetype: str, description=None, folder_id=None) -> str:
+    """Upload `data` as a new Drive file and return its file ID."""
+    from googleapiclient.http import MediaIoBaseUpload
+
+    file_metadata = {'name': name}
+    if description:
+        file_metadata['description'] = description
+    if folder_id:
+        file_metadata['parents'] = [folder_id]
+    media = MediaIoBaseUpload(io.BytesIO(data), mimetype=mimetype, resumable=True)
+    file = service.files().create(body=file_metadata, media_body=media, fields='id').execute()
+    return file.get('id')
+
+
+class _FakeRequest:
+    def __init__(self, service, body, media_body):
+        self._service = service
+        self._body = body
+        self._media_body = media_body
+
+    def execute(self):
+        return self._service._store(self._body, self._media_body)
+
+
+class _FakeFiles:
+    def __init__(self, service):
+        self._service = service
+
+    def create(self, body=None, media_body=None, fields=None):
+        return _FakeRequest(self._service, body or {}, media_body)
+
+
+class FakeDriveService:
+    """Local stand-in for the Drive v3 service (`files().create(...).execute()` only).
+
+    Each upload is written to `root` as `<file id>` plus `<file id>.json`
+    with its metadata. `fail_times` makes the first N uploads raise
+    `ConnectionError`, to exercise retries.
+    """
+
+    def __init__(self, root, fail_times=0):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.fail_times = fail_times
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def files(self):
+        return _FakeFiles(self)
+
+    def _store(self, body, media_body):
+        with self._lock:
+            self.calls += 1
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise ConnectionError("fake Drive: simulated network failure")
+        data = media_body.getbytes(0, media_body.size()) if media_body is not None else b''
+        file_id = uuid.uuid4().hex
+        (self.root / file_id).write_bytes(data)
+        meta = dict(body, id=file_id, mimeType=getattr(media_body, 'mimetype', lambda: None)(), size=len(data))
+        with open(self.root / f'{file_id}.json', 'w', encoding='utf-8') as fh:
+            json.dump(meta, fh)
+        return {'id': file_id}
+
+
+def fake_drive_factory(root=None):
+    """Return a service factory backed by one FakeDriveService (default root: $DRIVE_FAKE_DIR)."""
+    service = FakeDriveService(root or os.getenv('DRIVE_FAKE_DIR'))
+    return lambda: service
@@ -0,0 +1,226 @@
+"""Image preparation before photos are queued for upload.
+
+`process_image` decodes a camera photo, applies its EXIF orientation,
+downscales it to at most `IMAGE_MAX_SIZE` pixels on the long edge and
+re-encodes it (JPEG, or PNG when it has transparency) without any
+metadata, so location and device EXIF tags never leave the app. A photo
+that needed no resizing and carries no metadata keeps its original bytes
+when re-encoding would not make it smaller. Image formats Pillow cannot
+decode (e.g. HEIC without a plugin) are uploaded as they are. The real
+MIME type is sniffed from the bytes instead of being assumed.
+
+`ThumbnailCache` keeps small JPEG thumbnails on disk, addressed by the
+SHA-256 of the original photo so the same photo is never thumbnailed
+twice, and links each observation id to its thumbnail.
+
+Pillow is optional: without it photos are uploaded unchanged (with the
+sniffed MIME type) and no thumbnails are made.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from database.metrics import timed
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow is optional
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_MAX_SIZE = int(os.getenv('IMAGE_MAX_SIZE', 1600))
+IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', 82))
+THUMBNAIL_SIZE = int(os.getenv('THUMBNAIL_SIZE', 256))
+
+_EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+    'image/heic': 'heic',
+    'image/bmp': 'bmp',
+    'image/tiff': 'tif',
+}
+
+
+def sniff_mime(data: bytes) -> str:
+    """Return the MIME type of an image from its magic bytes (application/octet-stream if unknown)."""
+    if data[:3] == b'\xff\xd8\xff':
+        return 'image/jpeg'
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[4:8] == b'ftyp' and data[8:12] in (b'heic', b'heix', b'mif1', b'msf1', b'hevc'):
+        return 'image/heic'
+    if data[:2] == b'BM':
+        return 'image/bmp'
+    if data[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'image/tiff'
+    return 'application/octet-stream'
+
+
+def extension_for(mimetype: str) -> str:
+    return _EXTENSIONS.get(mimetype, 'bin')
+
+
+class ProcessedImage(NamedTuple):
+    data: bytes
+    mimetype: str
+    width: Optional[int]
+    height: Optional[int]
+    original_bytes: int
+    seconds: float
+
+    @property
+    def extension(self) -> str:
+        return extension_for(self.mimetype)
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - len(self.data)
+
+
+def _has_alpha(img) -> bool:
+    return img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+
+
+def _read(data: bytes):
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except Exception as exc:
+        raise ValueError(f"Not a readable image: {exc}")
+    return img
+
+
+def _open(data: bytes):
+    return ImageOps.exif_transpose(_read(data))
+
+
+def _has_metadata(img) -> bool:
+    return bool(img.getexif()) or any(key in img.info for key in ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment'))
+
+
+def _encode(img, quality: int):
+    buf = io.BytesIO()
+    if _has_alpha(img):
+        img.convert('RGBA').save(buf, format='PNG', optimize=True)
+        return buf.getvalue(), 'image/png'
+    # A fresh save without exif/icc_profile arguments writes no metadata
+    img.convert('RGB').save(buf, format='JPEG', quality=quality, optimize=True, progressive=True)
+    return buf.getvalue(), 'image/jpeg'
+
+
+@timed('image.process')
+def process_image(data: bytes, max_size: int = IMAGE_MAX_SIZE, quality: int = IMAGE_QUALITY) -> ProcessedImage:
+    """Downscale, recompress and strip metadata from a photo.
+
+    Images Pillow cannot decode are returned unchanged; raises ValueError
+    if `data` is not an image at all.
+    """
+    start = time.perf_counter()
+    if Image is None:
+        return ProcessedImage(data, sniff_mime(data), None, None, len(data), time.perf_counter() - start)
+    try:
+        raw = _read(data)
+    except ValueError:
+        mimetype = sniff_mime(data)
+        if mimetype == 'application/octet-stream':
+            raise
+        logger.warning("Uploading %s photo unprocessed: Pillow cannot decode it", mimetype)
+        return ProcessedImage(data, mimetype, None, None, len(data), time.perf_counter() - start)
+    keep_original = not _has_metadata(raw)
+    img = ImageOps.exif_transpose(raw)
+    if max(img.size) > max_size:
+        img.thumbnail((max_size, max_size), Image.LANCZOS)
+        keep_original = False
+    out, mimetype = _encode(img, quality)
+    if keep_original and len(out) >= len(data) and sniff_mime(data) in _EXTENSIONS:
+        out, mimetype = data, sniff_mime(data)
+    result = ProcessedImage(out, mimetype, img.width, img.height, len(data), time.perf_counter() - start)
+    logger.info("Processed photo: %d -> %d bytes (%d saved) in %.0f ms",
+                result.original_bytes, len(out), result.bytes_saved, result.seconds * 1000)
+    return result
+
+
+@timed('image.thumbnail')
+def make_thumbnail(data: bytes, size: int = THUMBNAIL_SIZE) -> bytes:
+    """Return a small JPEG thumbnail of the image in `data`."""
+    img = _open(data)
+    img.thumbnail((size, size), Image.LANCZOS)
+    if _has_alpha(img):
+        background = Image.new('RGB', img.size, 'white')
+        background.paste(img.convert('RGBA'), mask=img.convert('RGBA').getchannel('A'))
+        img = background
+    buf = io.BytesIO()
+    img.convert('RGB').save(buf, format='JPEG', quality=70, optimize=True)
+    return buf.getvalue()
+
+
+class ThumbnailCache:
+    """On-disk thumbnails keyed by content hash, linked to observation ids.
+
+    Layout under `root`: `<hash[:2]>/<hash>.jpg` for thumbnails and
+    `observations/<observation_id>` holding the hash of that observation's
+    photo.
+    """
+
+    def __init__(self, root, size: int = THUMBNAIL_SIZE):
+        self.root = Path(root)
+        self.size = size
+        self._links = self.root / 'observations'
+        self._links.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / f'{digest}.jpg'
+
+    def put(self, observation_id, data: bytes) -> Optional[Path]:
+        """Store (or reuse) the thumbnail of photo `data` and link it to `observation_id`.
+
+        Returns None, linking nothing, when Pillow is missing or cannot read `data`.
+        """
+        if Image is None:
+            return None
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not path.exists():
+            try:
+                thumb = make_thumbnail(data, self.size)
+            except ValueError:
+                # e.g. a HEIC photo uploaded unprocessed: it just has no thumbnail
+                return None
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_name(f'{path.name}.{threading.get_ident()}.tmp')
+            tmp.write_bytes(thumb)
+            os.replace(tmp, path)
+        (self._links / str(observation_id)).write_text(digest, encoding='utf-8')
+        return path
+
+    def get(self, observation_id) -> Optional[Path]:
+        """Return the thumbnail path for `observation_id`, or None if it has none."""
+        try:
+            digest = (self._links / str(observation_id)).read_text(encoding='utf-8').strip()
+        except OSError:
+            return None
+        path = self._path(digest)
+        return path if path.exists() else None
+
+
+_thumbnail_cache = None
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Return the process-wide thumbnail cache in data/thumbnails/."""
+    global _thumbnail_cache
+    if _thumbnail_cache is None:
+        _thumbnail_cache = ThumbnailCache(Path(__file__).parent.parent / 'data' / 'thumbnails')
+    return _thumbnail_cache
@@ -0,0 +1,314 @@
+"""Persistent background queue for photo uploads.
+
+Submitting a photo only writes it to the queue directory and returns; a
+small pool of worker threads uploads it to Drive afterwards. Per
+observation the queue keeps two files:
+
+- `<observation_id>.json` — the job: status, attempts, last error, Drive
+  file ID once uploaded, plus the upload metadata.
+- `<observation_id>.bin` — the photo bytes, deleted after a successful
+  upload.
+- `<observation_id>.lock` — held (flock) by whichever worker is uploading
+  the job.
+
+Jobs that were pending (or in flight) when the process stopped are picked
+up again on the next start. Several processes (e.g. Streamlit workers)
+may share a queue directory and all recover the same jobs: a worker first
+claims the job's lock and re-reads it, so a photo another process is
+uploading, or has uploaded, is skipped. Without flock (Windows) only one
+process may use a queue directory. Failed uploads are retried with exponential
+backoff; client errors that cannot succeed on retry (4xx other than 408
+and 429) fail immediately.
+"""
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no flock on Windows: one consumer process per queue directory
+    fcntl = None
+
+from database.metrics import timer
+from media.drive import upload_file
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+UPLOADING = 'uploading'
+RETRYING = 'retrying'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def _is_retryable(exc) -> bool:
+    status = getattr(getattr(exc, 'resp', None), 'status', None)
+    try:
+        status = int(status)
+    except (TypeError, ValueError):
+        return True
+    return not (400 <= status < 500) or status in (408, 429)
+
+
+class UploadQueue:
+    def __init__(self, queue_dir, service_factory: Callable, workers: int = 2, max_attempts: int = 5,
+                 base_delay: float = 2.0, max_delay: float = 300.0, clock=time.time):
+        self.queue_dir = Path(queue_dir)
+        self.queue_dir.mkdir(parents=True, exist_ok=True)
+        self.service_factory = service_factory
+        self.workers = max(1, int(workers))
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._ready = []  # heap of (ready_at, observation_id)
+        self._jobs: Dict[str, Dict] = {}
+        self._threads = []
+        self._stopping = False
+        self._recover()
+
+    def _job_path(self, observation_id) -> Path:
+        return self.queue_dir / f'{observation_id}.json'
+
+    def _data_path(self, observation_id) -> Path:
+        return self.queue_dir / f'{observation_id}.bin'
+
+    def _save(self, job) -> None:
+        path = self._job_path(job['observation_id'])
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(job, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+
+    def _claim(self, key):
+        """Lock job `key` against other processes; the open lock file, or None if it is taken."""
+        fh = open(self.queue_dir / f'{key}.lock', 'a+b')
+        if fcntl is not None:
+            try:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                fh.close()
+                return None
+        return fh
+
+    def _reload(self, key, job) -> Dict:
+        """The job as saved on disk, which another process may have moved on."""
+        try:
+            with open(self._job_path(key), 'r', encoding='utf-8') as fh:
+                saved = json.load(fh)
+        except (OSError, ValueError):
+            return job
+        job.clear()
+        job.update(saved)
+        return job
+
+    def _recover(self) -> None:
+        """Load persisted jobs and requeue the unfinished ones."""
+        for path in sorted(self.queue_dir.glob('*.json')):
+            try:
+                with open(path, 'r', encoding='utf-8') as fh:
+                    job = json.load(fh)
+            except (OSError, ValueError):
+                logger.warning("Skipping unreadable upload job %s", path)
+                continue
+            key = str(job['observation_id'])
+            self._jobs[key] = job
+            if job['status'] in (PENDING, UPLOADING, RETRYING):
+                if job['status'] == UPLOADING:
+                    # Interrupted mid-upload by a restart
+                    job['status'] = PENDING
+                heapq.heappush(self._ready, (job.get('next_attempt', 0.0), key))
+
+    def start(self) -> None:
+        """Start the worker threads (idempotent)."""
+        with self._cond:
+            self._stopping = False
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                t = threading.Thread(target=self._work, name=f'upload-worker-{len(self._threads)}', daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Ask the workers to exit once their current upload finishes."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+
+    def submit(self, observation_id, data: bytes, name: str, mimetype: str = 'image/jpeg',
+               description=None, folder_id=None) -> None:
+        """Persist an upload for `observation_id` and queue it; returns without waiting."""
+        key = str(observation_id)
+        with open(self._data_path(key), 'wb') as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        job = {
+            'observation_id': key,
+            'name': name,
+            'mimetype': mimetype,
+            'description': description,
+            'folder_id': folder_id,
+            'status': PENDING,
+            'attempts': 0,
+            'next_attempt': 0.0,
+            'error': None,
+            'file_id': None,
+            'submitted_at': self._clock(),
+            'updated_at': self._clock(),
+        }
+        with self._cond:
+            self._save(job)
+            self._jobs[key] = job
+            heapq.heappush(self._ready, (0.0, key))
+            self._cond.notify()
+        self.start()
+
+    def status(self, observation_id) -> Optional[Dict]:
+        """Return a copy of the job for `observation_id`, or None if it was never queued."""
+        with self._cond:
+            job = self._jobs.get(str(observation_id))
+            return dict(job) if job is not None else None
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of jobs per status."""
+        counts = {PENDING: 0, UPLOADING: 0, RETRYING: 0, DONE: 0, FAILED: 0}
+        with self._cond:
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+        return counts
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until no job is queued or in flight; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while any(j['status'] in (PENDING, UPLOADING, RETRYING) for j in self._jobs.values()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                if self._stopping:
+                    return None
+                if self._ready:
+                    ready_at, key = self._ready[0]
+                    delay = ready_at - self._clock()
+                    if delay <= 0:
+                        heapq.heappop(self._ready)
+                        job = self._jobs[key]
+                        if job['status'] not in (PENDING, RETRYING) or ready_at < job['next_attempt']:
+                            # Stale entry left by a resubmission
+                            continue
+                        claim = self._claim(key)
+                        if claim is None:
+                            # Another process is uploading it: look again once it should be done
+                            heapq.heappush(self._ready, (self._clock() + self.base_delay, key))
+                            continue
+                        self._reload(key, job)
+                        if job['status'] in (DONE, FAILED) or job['next_attempt'] > self._clock():
+                            # Finished, or rescheduled, by another process
+                            claim.close()
+                            if job['status'] == RETRYING:
+                                heapq.heappush(self._ready, (job['next_attempt'], key))
+                            self._cond.notify_all()
+                            continue
+                        job['status'] = UPLOADING
+                        job['updated_at'] = self._clock()
+                        self._save(job)
+                        return job, claim
+                    self._cond.wait(delay)
+                else:
+                    self._cond.wait()
+
+    def _work(self) -> None:
+        while True:
+            claimed = self._next_job()
+            if claimed is None:
+                return
+            job, claim = claimed
+            key = job['observation_id']
+            try:
+                try:
+                    data = self._data_path(key).read_bytes()
+                    with timer('drive.upload'):
+                        file_id = upload_file(
+                            self.service_factory(), data, job['name'], job['mimetype'],
+                            description=job['description'], folder_id=job['folder_id']
+                        )
+                except Exception as exc:
+                    self._failed(job, exc)
+                else:
+                    self._done(job, file_id)
+            finally:
+                claim.close()
+
+    def _done(self, job, file_id) -> None:
+        key = job['observation_id']
+        with self._cond:
+            job.update(status=DONE, file_id=file_id, error=None, attempts=job['attempts'] + 1,
+                       updated_at=self._clock())
+            self._save(job)
+            try:
+                self._data_path(key).unlink()
+            except OSError:
+                pass
+            self._cond.notify_all()
+        logger.info("Uploaded photo for observation %s (Drive file %s)", key, file_id)
+
+    def _failed(self, job, exc) -> None:
+        key = job['observation_id']
+        with self._cond:
+            job['attempts'] += 1
+            job['error'] = str(exc)
+            job['updated_at'] = self._clock()
+            if isinstance(exc, FileNotFoundError) or not _is_retryable(exc) or job['attempts'] >= self.max_attempts:
+                job['status'] = FAILED
+                logger.warning("Upload for observation %s failed for good: %s", key, exc)
+            else:
+                delay = min(self.base_delay * 2 ** (job['attempts'] - 1), self.max_delay)
+                job['status'] = RETRYING
+                job['next_attempt'] = self._clock() + delay
+                heapq.heappush(self._ready, (job['next_attempt'], key))
+                logger.warning("Upload for observation %s failed (attempt %d), retrying in %.0fs: %s",
+                               key, job['attempts'], delay, exc)
+            self._save(job)
+            self._cond.notify_all()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_upload_queue(service_factory: Callable, queue_dir=None) -> UploadQueue:
+    """Return the process-wide upload queue, creating and starting it on first use.
+
+    Sizing comes from UPLOAD_WORKERS, UPLOAD_MAX_ATTEMPTS,
+    UPLOAD_RETRY_BASE_DELAY and UPLOAD_RETRY_MAX_DELAY.
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = UploadQueue(
+                queue_dir or Path(__file__).parent.parent / 'data' / 'uploads',
+                service_factory,
+                workers=int(os.getenv('UPLOAD_WORKERS', 2)),
+                max_attempts=int(os.getenv('UPLOAD_MAX_ATTEMPTS', 5)),
+                base_delay=float(os.getenv('UPLOAD_RETRY_BASE_DELAY', 2.0)),
+                max_delay=float(os.getenv('UPLOAD_RETRY_MAX_DELAY', 300.0)),
+            )
+            _queue.start()
+        return _queue
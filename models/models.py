@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, FetchedValue, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -10,16 +10,34 @@ class Flora(Base):
     name = Column(String)
     description = Column(String)
 
+    __table_args__ = (
+        # A unique index rather than a constraint so SQLite can add it to existing tables
+        Index('uq_flora_name', 'name', unique=True),
+    )
+
 class Observation(Base):
     __tablename__ = 'observations'
     id = Column(Integer, primary_key=True)
+    # flora_id lookups are served by the (flora_id, datetime) index below
     flora_id = Column(Integer, ForeignKey('flora.id'))
-    user_id = Column(Integer, ForeignKey('users.id'))
-    datetime = Column(DateTime)
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
+    datetime = Column(DateTime, index=True)
     lat = Column(Float)
     lon = Column(Float)
     address = Column(String)
     description = Column(String)
+    # Geohash of (lat, lon) for indexed spatial lookups; see database.spatial
+    geohash = Column(String(12))
+    # Set on near-duplicates to the first report of the same flora nearby; see database.dedup
+    canonical_id = Column(Integer, ForeignKey('observations.id'), index=True)
+    # Bumped by database triggers on every insert and edit, so readers can fetch only what changed
+    change_seq = Column(Integer, index=True, server_default=FetchedValue())
+
+    __table_args__ = (
+        Index('ix_observations_geohash', 'geohash', postgresql_ops={'geohash': 'varchar_pattern_ops'}),
+        Index('ix_observations_flora_id_datetime', 'flora_id', 'datetime'),
+        Index('ix_observations_lat_lon', 'lat', 'lon'),
+    )
     
     flora = relationship("Flora", backref="observations")
     user = relationship("User", backref="observations")
@@ -38,8 +56,8 @@ class Recipe(Base):
 class RecipeIngredient(Base):
     __tablename__ = 'recipe_ingredients'
     id = Column(Integer, primary_key=True)
-    recipe_id = Column(Integer, ForeignKey('recipes.id'))
-    flora_id = Column(Integer, ForeignKey('flora.id'))
+    recipe_id = Column(Integer, ForeignKey('recipes.id'), index=True)
+    flora_id = Column(Integer, ForeignKey('flora.id'), index=True)
 
     recipe = relationship("Recipe", backref="ingredients")
     flora = relationship("Flora", backref="recipes")
@@ -4,7 +4,7 @@ from database.fallback_store import FallbackStore
 
 def main():
     store = FallbackStore()
-    print(f"Total observations: {len(store.all())}")
+    print(f"Total observations: {len(store)}")
 
     # show a sample
     print("--- Sample ---")
@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import create_engine
+
+import database.database_utils as du
+from database.migrations import run_migrations
+from models.models import Base
+
+CSV_HEADER = 'datetime,address,lat,lon,description,id,flora_name,username\n'
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """A migrated, empty SQLite database that `database_utils` uses; yields its path."""
+    path = tmp_path / 'flora.db'
+    url = f'sqlite:///{path}'
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    engine.dispose()
+    monkeypatch.setenv('DATABASE_URL', url)
+    # The cached frame belongs to another test's database: force a full load
+    monkeypatch.setattr(du, '_observation_watermark', None)
+    du._load_env()
+    monkeypatch.setattr(du, '_marker_ttl', 0.0)
+    yield path
+    du._data_generation.bump()
+
+
+@pytest.fixture
+def fallback_csv(tmp_path, monkeypatch):
+    """Point `database_utils` at a fallback CSV; call the result with (id, flora, user, lat) rows to write it."""
+    path = tmp_path / 'flora_data.csv'
+    monkeypatch.setattr(du, '_FALLBACK_CSV', path)
+
+    def write(rows):
+        lines = [f'2021-01-01,,{lat},-99.1,,{row_id},{flora},{user}' for row_id, flora, user, lat in rows]
+        path.write_text(CSV_HEADER + '\n'.join(lines) + '\n', encoding='utf-8')
+        return path
+
+    return write
@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+from database.csv_appender import CsvAppender, seq_path_for
+
+HEADER = 'datetime,address,lat,lon,description,id,flora_name,username\n'
+
+
+def _row(name='Higo'):
+    return {'datetime': '2021-01-01', 'lat': 19.4, 'lon': -99.1, 'flora_name': name, 'username': 'ana'}
+
+
+def _csv(tmp_path, n_rows=0, trailing_newline=True):
+    path = tmp_path / 'flora_data.csv'
+    lines = [f'2021-01-01,,19.4,-99.1,,{i},F{i},u' for i in range(1, n_rows + 1)]
+    text = HEADER + '\n'.join(lines) + ('\n' if lines and trailing_newline else '')
+    path.write_text(text, encoding='utf-8')
+    return path
+
+
+def _frame(path):
+    return pd.read_csv(path, keep_default_na=False, dtype=str)
+
+
+def _append_in_process(path, count, queue):
+    appender = CsvAppender(path, commit_delay=0)
+    queue.put([appender.append(_row()) for _ in range(count)])
+
+
+def test_concurrent_threads_get_unique_sequential_ids(tmp_path):
+    path = _csv(tmp_path, 3)
+    appender = CsvAppender(path)
+    ids = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(25):
+            new_id = appender.append(_row())
+            with lock:
+                ids.append(new_id)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(ids) == list(range(4, 204))
+    assert _frame(path)['id'].astype(int).tolist() == list(range(1, 204))
+
+
+def test_concurrent_processes_get_unique_ids(tmp_path):
+    path = _csv(tmp_path, 3)
+    queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_append_in_process, args=(path, 20, queue)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    ids = [i for _ in procs for i in queue.get(timeout=60)]
+    for p in procs:
+        p.join()
+    assert sorted(ids) == list(range(4, 84))
+    assert sorted(_frame(path)['id'].astype(int)) == list(range(1, 84))
+
+
+def test_append_many_returns_ids_in_order(tmp_path):
+    path = _csv(tmp_path, 2)
+    appender = CsvAppender(path)
+    assert appender.append_many([_row('A'), _row('B')]) == [3, 4]
+    assert appender.append_many([]) == []
+    assert _frame(path)['flora_name'].tolist()[-2:] == ['A', 'B']
+
+
+def test_torn_tail_is_dropped(tmp_path):
+    path = _csv(tmp_path, 2)
+    appender = CsvAppender(path)
+    appender.append(_row())
+    with open(path, 'ab') as fh:
+        fh.write(b'2021-01-02,,19.5,-99.2,half a ro')  # a writer died mid-line
+    assert appender.append(_row('B')) == 4
+    frame = _frame(path)
+    assert frame['id'].astype(int).tolist() == [1, 2, 3, 4]
+    assert frame['flora_name'].iloc[-1] == 'B'
+
+
+def test_replaced_file_is_rescanned_not_truncated(tmp_path):
+    path = _csv(tmp_path, 1)
+    appender = CsvAppender(path)
+    appender.append(_row())
+    # Restored from elsewhere: more rows, no trailing newline
+    other = tmp_path / 'other'
+    other.mkdir()
+    replacement = _csv(other, 19, trailing_newline=False)
+    os.replace(replacement, path)
+    assert appender.append(_row('New')) == 20
+    frame = _frame(path)
+    assert frame['id'].astype(int).tolist() == list(range(1, 21))
+    assert frame['flora_name'].iloc[-1] == 'New'
+
+
+def test_file_edited_in_place_is_rescanned_not_truncated(tmp_path):
+    path = _csv(tmp_path, 1)
+    appender = CsvAppender(path)
+    appender.append(_row())
+    inode = os.stat(path).st_ino
+    # Same inode, larger, no trailing newline (e.g. an editor save)
+    with open(path, 'r+', encoding='utf-8') as fh:
+        fh.truncate(0)
+        lines = [f'2021-01-01,,19.4,-99.1,,{i},Edited{i},u' for i in range(1, 20)]
+        fh.write(HEADER + '\n'.join(lines))
+    assert os.stat(path).st_ino == inode
+    assert appender.append(_row('New')) == 20
+    frame = _frame(path)
+    assert frame['id'].astype(int).tolist() == list(range(1, 21))
+    assert frame['flora_name'].iloc[0] == 'Edited1'
+
+
+@pytest.mark.parametrize('state', ['{"last_id": 1, "size": 10}', 'not json'])
+def test_old_or_corrupt_sequence_file_falls_back_to_a_scan(tmp_path, state):
+    path = _csv(tmp_path, 5)
+    seq_path_for(path).write_text(state, encoding='utf-8')
+    assert CsvAppender(path).append(_row()) == 6
+    assert len(_frame(path)) == 6
@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+import database.database_utils as du
+
+
+@pytest.fixture
+def db(sqlite_db):
+    for name, username in [('Higo', 'ana'), ('Nispero', 'beto'), ('Higo', 'ana')]:
+        du.add_observation(name, username, 19.4, -99.1, '', 'first')
+    return sqlite3.connect(sqlite_db, isolation_level=None)
+
+
+def _other_process_writes(conn, sql):
+    # A separate connection and no local generation bump, as from another process
+    conn.execute(sql)
+
+
+def test_delta_picks_up_rows_inserted_elsewhere(db):
+    assert len(du.get_observations_df()) == 3
+    _other_process_writes(db, "INSERT INTO observations (flora_id, user_id, lat, lon) VALUES (1, 1, 1.0, 2.0)")
+    df = du.get_observations_df()
+    assert df['id'].tolist() == [1, 2, 3, 4]
+
+
+def test_delta_replaces_edited_rows(db):
+    du.get_observations_df()
+    refreshes = du.get_observation_cache_stats()['delta_refreshes']
+    _other_process_writes(db, "UPDATE observations SET description = 'edited', lat = 0.5 WHERE id = 2")
+    df = du.get_observations_df()
+    assert du.get_observation_cache_stats()['delta_refreshes'] == refreshes + 1
+    assert df['id'].tolist() == [1, 2, 3]
+    assert df.loc[df['id'] == 2, ['description', 'lat']].values.tolist() == [['edited', 0.5]]
+
+
+def test_untracked_column_edit_does_not_mark_row(db):
+    before = db.execute("SELECT change_seq FROM observations WHERE id = 1").fetchone()
+    db.execute("UPDATE observations SET geohash = 'x' WHERE id = 1")
+    assert db.execute("SELECT change_seq FROM observations WHERE id = 1").fetchone() == before
+
+
+def test_delete_forces_full_reload(db):
+    du.get_observations_df()
+    _other_process_writes(db, "DELETE FROM observations WHERE id = 1")
+    assert du.get_observations_df()['id'].tolist() == [2, 3]
+
+
+def test_data_key_rechecks_database_after_ttl(db, monkeypatch):
+    monkeypatch.setattr(du, '_marker_ttl', 3600.0)
+    key = du.get_data_key()
+    _other_process_writes(db, "INSERT INTO observations (flora_id, user_id, lat, lon) VALUES (1, 1, 1.0, 2.0)")
+    assert du.get_data_key() == key
+    monkeypatch.setattr(du, '_marker_state', (0.0, None, None))  # as if the TTL ran out
+    assert du.get_data_key() != key
+    assert len(du.get_observations_df()) == 4
+
+
+def test_names_added_elsewhere_reach_the_dimension_cache(db):
+    assert 'Zapote' not in du.get_flora_names()
+    _other_process_writes(db, "INSERT INTO flora (name) VALUES ('Zapote')")
+    assert 'Zapote' in du.get_flora_names()
+
+
+def test_rows_committed_below_the_watermark_force_a_full_reload(db):
+    du.get_observations_df()
+    # PostgreSQL order of events: transaction A takes change_seq 4 for a long
+    # bulk insert, B takes 5 and commits, a reader refreshes, then A commits.
+    # SQLite serializes writers, so the numbers are handed out by hand here.
+    _other_process_writes(db, "INSERT INTO observations (flora_id, user_id, lat, lon, change_seq) VALUES (1, 1, 1.0, 2.0, 5)")
+    assert du.get_observations_df()['id'].tolist() == [1, 2, 3, 4]
+    _other_process_writes(db, "INSERT INTO observations (flora_id, user_id, lat, lon, change_seq) VALUES (2, 2, 3.0, 4.0, 4)")
+    assert du.get_observations_df()['id'].tolist() == [1, 2, 3, 4, 5]
+
+
+def test_write_counter_follows_inserts_and_tracked_edits(db):
+    writes = db.execute("SELECT writes FROM data_versions").fetchone()[0]
+    db.execute("INSERT INTO observations (flora_id, user_id, lat, lon) VALUES (1, 1, 1.0, 2.0)")
+    db.execute("UPDATE observations SET description = 'edited' WHERE id = 1")
+    db.execute("UPDATE observations SET geohash = 'x' WHERE id = 2")
+    assert db.execute("SELECT writes FROM data_versions").fetchone()[0] == writes + 2
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import numpy as np
+
+import database.database_utils as du
+from database.dedup import neighbour_bboxes
+from database.spatial import haversine_m
+
+CENTERS = np.random.default_rng(0).uniform([19.0, -99.5], [19.8, -98.5], size=(20, 2))
+
+
+def _clustered_points(rng, n):
+    picked = CENTERS[rng.integers(0, len(CENTERS), n)]
+    return picked + rng.normal(0, 0.0002, size=(n, 2))
+
+
+def test_neighbour_bboxes_hold_every_point_within_distance():
+    rng = np.random.default_rng(1)
+    points = _clustered_points(rng, 2000)
+    new, old = points[:100], points[100:]
+    boxes = np.array(neighbour_bboxes(new[:, 0], new[:, 1], 15.0))
+    inside = ((old[:, None, 0] >= boxes[:, 0]) & (old[:, None, 1] >= boxes[:, 1])
+              & (old[:, None, 0] <= boxes[:, 2]) & (old[:, None, 1] <= boxes[:, 3])).any(axis=1)
+    for lat, lon in new:
+        near = haversine_m(lat, lon, old[:, 0], old[:, 1]) <= 15.0
+        assert inside[near].all()
+
+
+def _add(rng, n):
+    points = _clustered_points(rng, n)
+    du.add_observations([
+        {'datetime': datetime(2021, 1, 1), 'flora_name': f'Flora {i % 3}', 'username': 'u', 'lat': lat, 'lon': lon}
+        for i, (lat, lon) in enumerate(points)
+    ])
+
+
+def test_incremental_db_run_loads_only_the_neighbourhood(sqlite_db, monkeypatch):
+    rng = np.random.default_rng(2)
+    _add(rng, 600)
+    du.deduplicate_observations(apply=True)
+    _add(rng, 30)
+
+    frame_sizes = []
+    plan_links = du.plan_links
+    monkeypatch.setattr(du, 'plan_links', lambda frame, *args: frame_sizes.append(len(frame)) or plan_links(frame, *args))
+    incremental = du.deduplicate_observations()
+    full = du.deduplicate_observations(incremental=False)
+
+    assert incremental['checked'] == 30
+    assert frame_sizes[0] < frame_sizes[1] == 630
+    assert incremental['proposals'] and incremental['proposals'] == full['proposals']
+    assert all(full['links'][d] == c for d, c in incremental['links'].items())
+    assert incremental['checked_through_id'] == full['checked_through_id'] == 630
@@ -0,0 +1,52 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from database.export import EXPORT_COLUMNS, write_export
+
+
+def _chunk(ids, address=None, flora='Higo'):
+    return pd.DataFrame({
+        'datetime': pd.to_datetime(['2021-01-01'] * len(ids)),
+        'address': [address] * len(ids),
+        'lat': [19.4] * len(ids),
+        'lon': [-99.1] * len(ids),
+        'description': [None] * len(ids),
+        'id': ids,
+        'flora_name': [flora] * len(ids),
+        'username': ['ana'] * len(ids),
+    })
+
+
+def _export(fmt, chunks):
+    buf = io.BytesIO()
+    write_export(fmt, iter(chunks), buf)
+    return buf.getvalue()
+
+
+def test_parquet_keeps_types_when_first_chunk_has_only_nulls():
+    pq = pytest.importorskip('pyarrow.parquet')
+    data = _export('parquet', [_chunk([1, 2]), _chunk([3], address='calle')])
+    table = pq.read_table(io.BytesIO(data))
+    assert str(table.schema.field('address').type) == 'string'
+    assert str(table.schema.field('id').type) == 'int64'
+    assert table.column('id').to_pylist() == [1, 2, 3]
+    assert table.column('address').to_pylist() == [None, None, 'calle']
+
+
+def test_empty_parquet_export_has_the_export_columns():
+    pq = pytest.importorskip('pyarrow.parquet')
+    table = pq.read_table(io.BytesIO(_export('parquet', [])))
+    assert table.column_names == EXPORT_COLUMNS
+    assert table.num_rows == 0
+
+
+def test_csv_and_ndjson_stream_every_chunk():
+    chunks = [_chunk([1, 2]), _chunk([3], address='calle')]
+    csv = pd.read_csv(io.BytesIO(_export('csv', chunks)))
+    assert csv['id'].tolist() == [1, 2, 3]
+    features = [json.loads(line) for line in _export('ndjson', chunks).splitlines()]
+    assert [f['properties']['id'] for f in features] == [1, 2, 3]
+    assert features[0]['geometry'] == {'type': 'Point', 'coordinates': [-99.1, 19.4]}
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from database.csv_appender import CsvAppender
+from database.fallback_store import FallbackStore
+from database.snapshot import snapshot_enabled
+
+HEADER = 'datetime,address,lat,lon,description,id,flora_name,username\n'
+
+
+def _csv(tmp_path, names):
+    path = tmp_path / 'flora_data.csv'
+    lines = [f'2021-01-0{i},,19.{i},-99.1,,{i},{name},u' for i, name in enumerate(names, 1)]
+    path.write_text(HEADER + '\n'.join(lines) + '\n', encoding='utf-8')
+    return path
+
+
+def _rows(store):
+    return [(r['id'], r['flora_name']) for r in store.all()]
+
+
+@pytest.mark.parametrize('cache', [False, True])
+def test_refresh_tails_appended_rows(tmp_path, cache):
+    if cache and not snapshot_enabled():
+        pytest.skip("snapshots need pyarrow")
+    path = _csv(tmp_path, ['A', 'B'])
+    store = FallbackStore(path, cache=cache)
+    CsvAppender(path).append_many([{'flora_name': 'C', 'username': 'u', 'lat': 19.3, 'lon': -99.1}])
+    assert store.refresh() == 1
+    assert _rows(store) == [(1, 'A'), (2, 'B'), (3, 'C')]
+    assert _rows(FallbackStore(path, cache=cache)) == _rows(store)
+
+
+def test_refresh_detects_in_place_rewrite_that_grew(tmp_path):
+    path = _csv(tmp_path, ['A', 'B'])
+    store = FallbackStore(path, cache=False)
+    df = pd.read_csv(path, keep_default_na=False, dtype=str)
+    df.loc[0, 'flora_name'] = 'Aguacate'
+    df.loc[len(df)] = ['2021-01-03', '', '19.3', '-99.1', '', '3', 'C', 'u']
+    df.to_csv(path, index=False)  # same inode, larger file
+    assert store.refresh() is None
+    assert _rows(FallbackStore(path, cache=False)) == [(1, 'Aguacate'), (2, 'B'), (3, 'C')]
+
+
+def test_refresh_detects_same_size_rewrite(tmp_path):
+    path = _csv(tmp_path, ['A', 'B'])
+    store = FallbackStore(path, cache=False)
+    path.write_text(path.read_text(encoding='utf-8').replace(',B,', ',Z,'), encoding='utf-8')
+    assert store.refresh() is None
+
+
+def test_snapshot_is_not_used_for_a_rewritten_file(tmp_path):
+    if not snapshot_enabled():
+        pytest.skip("snapshots need pyarrow")
+    path = _csv(tmp_path, ['A', 'B'])
+    FallbackStore(path)  # writes the snapshot
+    with open(path, 'r+', encoding='utf-8') as fh:
+        text = fh.read().replace(',A,', ',Aguacate,') + '2021-01-03,,19.3,-99.1,,3,C,u\n'
+        fh.seek(0)
+        fh.write(text)
+    assert _rows(FallbackStore(path)) == [(1, 'Aguacate'), (2, 'B'), (3, 'C')]
@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+import database.database_utils as du
+from database.health import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker('test', base_delay=1.0, max_delay=4.0, clock=clock)
+
+
+def test_failure_opens_the_breaker_until_the_delay_passes(breaker, clock):
+    assert breaker.allow_request()
+    breaker.record_failure(ConnectionError('down'))
+    assert breaker.state == OPEN and not breaker.allow_request()
+    assert breaker.snapshot()['retry_in'] == 1.0
+    assert breaker.snapshot()['last_error'] == "ConnectionError('down')"
+    clock.now += 0.9
+    assert not breaker.allow_request()
+
+
+def test_half_open_lets_exactly_one_trial_through(breaker, clock):
+    breaker.record_failure()
+    clock.now += 1.0
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(breaker.allow_request())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [False] * 7 + [True]
+    assert breaker.state == HALF_OPEN
+
+
+def test_successful_trial_closes_the_breaker(breaker, clock):
+    breaker.record_failure()
+    clock.now += 1.0
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow_request()
+    assert breaker.snapshot() == {'name': 'test', 'state': CLOSED, 'failures': 0, 'retry_in': 0.0, 'last_error': None}
+
+
+def test_failed_trials_back_off_exponentially_up_to_the_cap(breaker, clock):
+    delays = []
+    for _ in range(5):
+        breaker.record_failure()
+        delays.append(breaker.snapshot()['retry_in'])
+        clock.now += delays[-1]
+        assert breaker.allow_request() and breaker.state == HALF_OPEN
+    assert delays == [1.0, 2.0, 4.0, 4.0, 4.0]
+
+
+def test_reset_closes_at_once(breaker):
+    breaker.record_failure()
+    breaker.reset()
+    assert breaker.state == CLOSED and breaker.allow_request()
+
+
+def test_unreachable_database_serves_the_csv_without_reconnecting(tmp_path, fallback_csv, monkeypatch):
+    fallback_csv([(1, 'Higo', 'ana', 19.1)])
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path}/missing/flora.db')
+    monkeypatch.setattr(du._db_health, 'base_delay', 60.0)
+    attempts = []
+    create_engine = du.create_engine
+    monkeypatch.setattr(du, 'create_engine', lambda *args, **kwargs: attempts.append(1) or create_engine(*args, **kwargs))
+    try:
+        for _ in range(3):
+            df, _ = du.query_observations(limit=None)
+            assert df['id'].tolist() == [1]
+        assert len(attempts) == 1 and du.get_backend_health()['state'] == OPEN
+    finally:
+        du._db_health.reset()
@@ -0,0 +1,86 @@
+import io
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+from media.images import ThumbnailCache, process_image, sniff_mime
+
+ORIENTATION = 0x0112
+MAKE = 0x010F
+
+
+def _photo(size=(400, 200), fmt='JPEG', mode='RGB', orientation=None, **save):
+    img = Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30))
+    # A bright corner shows where the top-left pixel went
+    img.paste((255, 255, 255, 255) if mode == 'RGBA' else (255, 255, 255), (0, 0, size[0] // 4, size[1] // 4))
+    exif = Image.Exif()
+    exif[MAKE] = 'Telefono'
+    if orientation is not None:
+        exif[ORIENTATION] = orientation
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, exif=exif.tobytes() if fmt == 'JPEG' else b'', **save)
+    return buf.getvalue()
+
+
+def _open(data):
+    return Image.open(io.BytesIO(data))
+
+
+def test_large_photo_is_downscaled_to_the_long_edge_limit():
+    image = process_image(_photo((3000, 1500)), max_size=1600)
+    assert (image.width, image.height) == (1600, 800)
+    assert _open(image.data).size == (1600, 800)
+    assert image.mimetype == 'image/jpeg' and image.extension == 'jpg'
+    assert image.original_bytes > 0
+
+
+def test_exif_orientation_is_applied_and_metadata_dropped():
+    # 6 = the camera was turned clockwise: the stored pixels need a 90° turn to display upright
+    image = process_image(_photo((400, 200), orientation=6))
+    decoded = _open(image.data)
+    assert decoded.size == (200, 400)
+    assert decoded.convert('RGB').getpixel((190, 10)) > (240, 240, 240)
+    assert dict(decoded.getexif()) == {}
+
+
+def test_transparent_png_stays_png():
+    image = process_image(_photo((300, 300), fmt='PNG', mode='RGBA'))
+    assert image.mimetype == 'image/png' and _open(image.data).mode == 'RGBA'
+
+
+def test_small_clean_photo_keeps_its_bytes_when_reencoding_does_not_help():
+    buf = io.BytesIO()
+    Image.new('RGB', (64, 64), (10, 120, 40)).save(buf, format='JPEG', quality=30, optimize=True)
+    original = buf.getvalue()
+    image = process_image(original, quality=95)
+    assert image.data == original and image.mimetype == 'image/jpeg' and image.bytes_saved == 0
+    # With EXIF it is re-encoded anyway, so the tags are dropped
+    assert process_image(_photo((64, 64)), quality=95).data != _photo((64, 64))
+
+
+def test_undecodable_image_format_is_uploaded_unprocessed(tmp_path):
+    heic = b'\x00\x00\x00\x18ftypheic' + b'\x00' * 64
+    image = process_image(heic)
+    assert (image.data, image.mimetype, image.extension, image.width) == (heic, 'image/heic', 'heic', None)
+    assert ThumbnailCache(tmp_path).put(1, heic) is None
+
+
+def test_bytes_that_are_no_image_are_rejected():
+    with pytest.raises(ValueError):
+        process_image(b'definitely not a photo')
+
+
+def test_mime_type_is_sniffed_from_the_bytes():
+    assert sniff_mime(_photo(fmt='PNG')) == 'image/png'
+    assert sniff_mime(b'\x00\x00\x00\x18ftypheic' + b'\x00' * 16) == 'image/heic'
+    assert sniff_mime(b'plain text') == 'application/octet-stream'
+
+
+def test_thumbnails_are_shared_by_identical_photos(tmp_path):
+    cache = ThumbnailCache(tmp_path, size=64)
+    photo = _photo((800, 400))
+    first, second = cache.put(1, photo), cache.put(2, photo)
+    assert first == second == cache.get(2)
+    assert max(_open(first.read_bytes()).size) == 64
+    assert cache.get(3) is None
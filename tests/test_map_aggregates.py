@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from database.map_aggregates import MapAggregates
+
+
+def _frame(seed, n):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'lat': rng.uniform(19.0, 20.0, n),
+        'lon': rng.uniform(-99.5, -98.5, n),
+        'flora_name': rng.choice(['Higo', 'Níspero', 'Guayaba'], n).astype(object),
+    })
+    df.loc[rng.integers(0, n, 5), 'flora_name'] = None
+    df.loc[rng.integers(0, n, 5), 'lat'] = np.nan
+    return df
+
+
+def _state(agg):
+    """Every level's cells as plain values, with coordinate sums rounded against float drift."""
+    return agg.total, {
+        zoom: {
+            (int(ix), int(iy)): (cell.count, round(cell.lat_sum, 6), round(cell.lon_sum, 6), dict(cell.flora))
+            for (ix, iy), cell in cells.items()
+        }
+        for zoom, cells in agg._levels.items()
+    }
+
+
+def _add_rows(agg, df):
+    for lat, lon, flora in df[['lat', 'lon', 'flora_name']].itertuples(index=False):
+        agg.add(lat, lon, flora)
+
+
+@pytest.mark.parametrize('split', [0, 250, 499])
+def test_add_matches_building_from_the_whole_frame(split):
+    df = _frame(0, 500)
+    agg = MapAggregates.from_frame(df.iloc[:split])
+    _add_rows(agg, df.iloc[split:])
+    assert _state(agg) == _state(MapAggregates.from_frame(df))
+
+
+def test_add_skips_rows_without_coordinates():
+    agg = MapAggregates()
+    agg.add(None, -99.0, 'Higo')
+    agg.add('x', -99.0, 'Higo')
+    agg.add(float('nan'), -99.0, 'Higo')
+    assert _state(agg) == _state(MapAggregates.from_frame(pd.DataFrame({'lat': [], 'lon': [], 'flora_name': []})))
+
+
+def test_cells_report_centroids_counts_and_top_flora():
+    df = pd.DataFrame({
+        'lat': [19.401, 19.402, 19.403, 25.0],
+        'lon': [-99.101, -99.102, -99.103, -99.0],
+        'flora_name': ['Higo', 'Higo', 'Níspero', 'Guayaba'],
+    })
+    agg = MapAggregates.from_frame(df, zoom_levels=(10,))
+    cells = agg.cells(10).sort_values('lat', ignore_index=True)
+    assert cells['count'].tolist() == [3, 1]
+    assert cells.loc[0, 'lat'] == pytest.approx(19.402)
+    assert cells.loc[0, 'breakdown'] == 'Higo (2), Níspero (1)'
+    assert agg.cells(10, bbox=(19.0, -100.0, 20.0, -99.0), top_n=1)['breakdown'].tolist() == ['Higo (2), otras (1)']
@@ -0,0 +1,92 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+
+import database.database_utils as du
+from database.migrations import MIGRATIONS, check_indexes, current_version, run_migrations
+
+# The schema the first release of the app created, before any migration
+BASELINE_SCHEMA = """
+CREATE TABLE flora (id INTEGER PRIMARY KEY, name VARCHAR, description VARCHAR);
+CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR UNIQUE);
+CREATE TABLE observations (
+    id INTEGER PRIMARY KEY, flora_id INTEGER REFERENCES flora(id), user_id INTEGER REFERENCES users(id),
+    datetime DATETIME, lat FLOAT, lon FLOAT, address VARCHAR, description VARCHAR
+);
+CREATE TABLE recipes (id INTEGER PRIMARY KEY, name VARCHAR, prep VARCHAR);
+CREATE TABLE recipe_ingredients (
+    id INTEGER PRIMARY KEY, recipe_id INTEGER REFERENCES recipes(id), flora_id INTEGER REFERENCES flora(id)
+);
+INSERT INTO flora (id, name) VALUES (1, 'Higo'), (2, 'Níspero'), (3, 'Higo');
+INSERT INTO users (id, username) VALUES (1, 'ana');
+INSERT INTO observations (id, flora_id, user_id, lat, lon) VALUES (1, 1, 1, 19.4326, -99.1332), (2, 3, 1, 19.5, -99.2),
+    (3, 2, 1, NULL, NULL);
+INSERT INTO recipes (id, name) VALUES (1, 'Mermelada');
+INSERT INTO recipe_ingredients (recipe_id, flora_id) VALUES (1, 3);
+"""
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    path = tmp_path / 'old.db'
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+    engine = create_engine(f'sqlite:///{path}')
+    yield engine, sqlite3.connect(path, isolation_level=None)
+    engine.dispose()
+
+
+def test_baseline_database_reports_the_missing_indexes(baseline_db):
+    engine, _ = baseline_db
+    missing = {(table, name) for table, name, _ in check_indexes(engine)}
+    assert ('flora', 'uq_flora_name') in missing
+    assert ('observations', 'ix_observations_geohash') in missing
+    assert ('recipe_ingredients', 'ix_recipe_ingredients_flora_id') in missing
+
+
+def test_migrations_bring_a_baseline_database_up_to_date(baseline_db):
+    engine, conn = baseline_db
+    assert run_migrations(engine) == MIGRATIONS[-1][0]
+    assert check_indexes(engine) == []
+
+    rows = conn.execute("SELECT id, flora_id, geohash, change_seq FROM observations ORDER BY id").fetchall()
+    # The duplicate 'Higo' was merged into the first one, observations and recipes included
+    assert rows == [(1, 1, '9g3w81t7j', 1), (2, 1, '9g3qytug8', 2), (3, 2, None, 3)]
+    assert conn.execute("SELECT id, name FROM flora ORDER BY id").fetchall() == [(1, 'Higo'), (2, 'Níspero')]
+    assert conn.execute("SELECT flora_id FROM recipe_ingredients").fetchall() == [(1,)]
+
+    conn.execute("INSERT INTO observations (flora_id, user_id, lat, lon) VALUES (2, 1, 1.0, 2.0)")
+    assert conn.execute("SELECT max(change_seq) FROM observations").fetchone() == (4,)
+    assert conn.execute("SELECT deletes, writes FROM data_versions").fetchall() == [(0, 1)]
+
+
+def test_migrations_run_once(baseline_db, capsys):
+    engine, conn = baseline_db
+    run_migrations(engine)
+    capsys.readouterr()
+    assert run_migrations(engine) == current_version(engine) == MIGRATIONS[-1][0]
+    assert capsys.readouterr().out == ''
+    assert conn.execute("SELECT count(*) FROM schema_version").fetchone() == (len(MIGRATIONS),)
+
+
+def test_app_serves_the_csv_with_one_error_until_the_database_is_migrated(baseline_db, fallback_csv, monkeypatch, caplog):
+    engine, _ = baseline_db
+    fallback_csv([(101, 'Higo', 'ana', 19.1)])
+    monkeypatch.setenv('DATABASE_URL', str(engine.url))
+    du._load_env()
+    monkeypatch.setattr(du._db_health, 'base_delay', 0.0)  # re-probe on every call
+    monkeypatch.setattr(du, '_observation_watermark', None)
+    try:
+        for _ in range(3):
+            assert du.query_observations(limit=None)[0]['id'].tolist() == [101]
+        errors = [r for r in caplog.records if r.levelname == 'ERROR']
+        assert len(errors) == 1 and 'python -m database.migrations' in errors[0].getMessage()
+        assert 'migrations 1, 2, 3, 4, 5, 6' in du.get_backend_health()['last_error']
+
+        run_migrations(engine)
+        assert du.query_observations(limit=None)[0]['id'].tolist() == [1, 2, 3]
+    finally:
+        du.dispose_engine()
+        du._db_health.reset()
+        du._data_generation.bump()
@@ -0,0 +1,84 @@
+from datetime import datetime
+
+import pytest
+
+import database.database_utils as du
+
+ROWS = [('Higo', 'Ana'), ('Níspero', 'beto'), ('Higo', 'ana'), ('Guayaba', 'Ana')]
+
+
+def _seed_database():
+    du.add_observations([
+        {'datetime': datetime(2021, 1, i), 'flora_name': flora, 'username': user, 'lat': float(f'19.{i}'), 'lon': -99.1}
+        for i, (flora, user) in enumerate(ROWS, 1)
+    ])
+
+
+@pytest.fixture
+def backends(sqlite_db, fallback_csv):
+    """The same observations in the fallback CSV and the SQLite database."""
+    fallback_csv([(i, flora, user, f'19.{i}') for i, (flora, user) in enumerate(ROWS, 1)])
+    _seed_database()
+
+
+def test_query_falls_back_when_engine_goes_away_mid_call(sqlite_db, fallback_csv, monkeypatch):
+    _seed_database()
+    # Different ids in the CSV show which backend answered
+    fallback_csv([(101, 'Higo', 'ana', 19.1), (102, 'Higo', 'ana', 19.2)])
+    real = du._get_engine
+    calls = []
+
+    def engine_then_none():
+        calls.append(1)
+        return real() if len(calls) == 1 else None
+
+    monkeypatch.setattr(du, '_get_engine', engine_then_none)
+    monkeypatch.setattr(du._db_health, 'record_failure', lambda exc=None: None)
+    df, _ = du.query_observations(limit=None)
+    assert df['id'].tolist() == [101, 102]
+
+
+@pytest.fixture(params=['db', 'csv'])
+def backend(request, backends, monkeypatch):
+    if request.param == 'csv':
+        monkeypatch.delenv('DATABASE_URL')
+    return request.param
+
+
+@pytest.mark.parametrize('flora, user, expected', [
+    ('higo', None, [1, 3]),
+    ('NISPERO', None, [2]),
+    (['níspero', 'guayaba'], None, [2, 4]),
+    (None, 'ANA', [1, 3, 4]),
+    ('higo', 'Beto', []),
+    ('zapote', None, []),
+])
+def test_name_filters_ignore_accents_and_case_on_both_backends(backend, flora, user, expected):
+    df, _ = du.query_observations(flora=flora, user=user, limit=None)
+    assert df['id'].tolist() == expected
+
+
+def test_bbox_flora_filter_matches_like_the_csv_store(backend):
+    df = du.get_observations_in_bbox(19.0, -100.0, 20.0, -99.0, flora_name='nispero')
+    assert df['id'].tolist() == [2]
+
+
+def test_empty_page_has_no_cursor(backend):
+    df, after_id = du.query_observations(limit=0)
+    assert df.empty and after_id is None
+    df, after_id = du.query_observations(flora='zapote', limit=2)
+    assert df.empty and after_id is None
+
+
+def test_pages_follow_the_cursor(backend):
+    pages = [df['id'].tolist() for df in du.iter_observation_pages(page_size=3)]
+    assert pages == [[1, 2, 3], [4]]
+
+
+@pytest.mark.parametrize('call', [
+    lambda: du.query_observations(limit=-1),
+    lambda: next(du.iter_observation_pages(page_size=0)),
+])
+def test_negative_or_empty_page_sizes_are_rejected(call):
+    with pytest.raises(ValueError):
+        call()
@@ -0,0 +1,54 @@
+import json
+
+from database.recipe_store import RecipeStore
+
+
+def _write(path, recipes, mode='w'):
+    with open(path, mode, encoding='utf-8') as fh:
+        for recipe in recipes:
+            fh.write(json.dumps(recipe) + '\n')
+
+
+def _recipe(recipe_id, name, ingredients=('Higo',)):
+    return {'id': recipe_id, 'name': name, 'prep': '', 'ingredients': list(ingredients)}
+
+
+def test_append_assigns_next_id_and_tails_other_writers(tmp_path):
+    path = tmp_path / 'recipes.jsonl'
+    _write(path, [_recipe(1, 'a'), _recipe(7, 'b')])
+    store, other = RecipeStore(path), RecipeStore(path)
+    assert store.append('c', '', ['Higo']) == 8
+    assert other.append('d', '', ['Limon']) == 9
+    store.refresh()
+    assert [r['id'] for r in store.all()] == [1, 7, 8, 9]
+    assert [r['name'] for r in store.with_ingredient('limon')] == ['d']
+
+
+def test_torn_line_is_dropped_on_append(tmp_path):
+    path = tmp_path / 'recipes.jsonl'
+    _write(path, [_recipe(1, 'a')])
+    store = RecipeStore(path)
+    with open(path, 'a', encoding='utf-8') as fh:
+        fh.write('{"id": 2, "na')
+    assert store.append('b', '', []) == 2
+    assert [json.loads(line)['name'] for line in path.read_text(encoding='utf-8').splitlines()] == ['a', 'b']
+
+
+def test_rewrite_in_place_is_reloaded(tmp_path):
+    path = tmp_path / 'recipes.jsonl'
+    _write(path, [_recipe(1, 'a'), _recipe(2, 'b')])
+    store = RecipeStore(path)
+    _write(path, [_recipe(1, 'a renamed'), _recipe(2, 'b'), _recipe(3, 'c')])
+    store.refresh()
+    assert [r['name'] for r in store.all()] == ['a renamed', 'b', 'c']
+    assert store.append('d', '', []) == 4
+
+
+def test_next_id_restarts_from_a_replaced_file(tmp_path):
+    path = tmp_path / 'recipes.jsonl'
+    _write(path, [_recipe(1, 'a'), _recipe(9, 'b')])
+    store = RecipeStore(path)
+    replacement = tmp_path / 'new.jsonl'
+    _write(replacement, [_recipe(1, 'a'), _recipe(2, 'c')])
+    replacement.replace(path)
+    assert store.append('d', '', []) == 3
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from database.fallback_store import FallbackStore
+from database.snapshot import load_snapshot, snapshot_path
+
+HEADER = 'datetime,address,lat,lon,description,id,flora_name,username\n'
+ROWS = '2021-01-01,,19.1,-99.1,,1,Higo,ana\n2021-01-02,,19.2,-99.1,,2,Níspero,beto\n'
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / 'flora_data.csv'
+    path.write_text(HEADER + ROWS, encoding='utf-8')
+    FallbackStore(path)  # writes the snapshot
+    assert snapshot_path(path).exists()
+    return path
+
+
+def _load(path):
+    st = os.stat(path)
+    return load_snapshot(path, st.st_size, st.st_mtime_ns)
+
+
+def test_matching_snapshot_maps_the_numeric_columns(csv_path):
+    snapshot = _load(csv_path)
+    assert snapshot.csv_size == os.path.getsize(csv_path)
+    assert snapshot.columns['id'].tolist() == [1, 2]
+    assert snapshot.columns['flora_names'] == ['Higo', 'Níspero']
+    # Views of the mapped file, not copies
+    assert not snapshot.columns['lat'].flags.writeable
+    assert snapshot.columns['datetime'].dtype == np.dtype('datetime64[ns]')
+
+
+def test_touched_csv_keeps_its_snapshot(csv_path):
+    os.utime(csv_path, ns=(0, os.stat(csv_path).st_mtime_ns + 10**9))
+    assert _load(csv_path) is not None
+
+
+def test_appended_csv_keeps_the_snapshot_of_its_prefix(csv_path):
+    size = os.path.getsize(csv_path)
+    with open(csv_path, 'a', encoding='utf-8') as fh:
+        fh.write('2021-01-03,,19.3,-99.1,,3,Higo,ana\n')
+    snapshot = _load(csv_path)
+    assert snapshot.csv_size == size and len(snapshot.columns['id']) == 2
+
+
+@pytest.mark.parametrize('rewrite', [
+    lambda text: text.replace('Higo', 'Hig0'),  # same size
+    lambda text: text.replace('Higo', 'Higuera') + '2021-01-03,,19.3,-99.1,,3,Higo,ana\n',  # edited and grown
+    lambda text: text.splitlines(keepends=True)[0],  # truncated
+])
+def test_rewritten_csv_makes_the_snapshot_stale(csv_path, rewrite):
+    mtime = os.stat(csv_path).st_mtime_ns
+    csv_path.write_text(rewrite(csv_path.read_text(encoding='utf-8')), encoding='utf-8')
+    os.utime(csv_path, ns=(0, mtime + 10**9))
+    assert _load(csv_path) is None
+
+
+def test_unreadable_or_disabled_snapshot_is_ignored(csv_path, monkeypatch):
+    monkeypatch.setenv('FALLBACK_SNAPSHOT', '0')
+    assert _load(csv_path) is None
+    monkeypatch.delenv('FALLBACK_SNAPSHOT')
+    snapshot_path(csv_path).write_bytes(b'not arrow')
+    assert _load(csv_path) is None
+    # The store falls back to the CSV and replaces the broken snapshot
+    assert [r['id'] for r in FallbackStore(csv_path).all()] == [1, 2]
+    assert _load(csv_path) is not None
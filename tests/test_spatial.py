@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from database.spatial import GridIndex, bbox_around, geohash_encode, geohash_prefixes_for_bbox, haversine_m
+
+
+def _points(seed, n, center=(19.43, -99.13), spread=0.2):
+    rng = np.random.default_rng(seed)
+    lats = center[0] + rng.uniform(-spread, spread, n)
+    lons = center[1] + rng.uniform(-spread, spread, n)
+    lats[rng.integers(0, n, n // 50)] = np.nan
+    return lats, lons
+
+
+@pytest.fixture
+def grid():
+    lats, lons = _points(0, 3000)
+    index = GridIndex(0.01)
+    index.build(lats, lons)
+    return index, lats, lons
+
+
+def test_geohash_matches_the_reference_encoding():
+    assert geohash_encode(57.64911, 10.40744, 11) == 'u4pruydqqvj'
+    assert geohash_encode(19.4326, -99.1332, 5) == '9g3w8'
+    assert geohash_encode(float('nan'), 1.0) is None
+
+
+@pytest.mark.parametrize('center, size', [
+    ((19.43, -99.13), 0.0005),
+    ((19.43, -99.13), 0.05),
+    ((19.43, -99.13), 3.0),
+    ((0.0, 0.0), 0.02),  # straddles the equator and the prime meridian
+    ((-33.9, 151.2), 0.3),
+])
+def test_geohash_prefixes_cover_every_point_in_the_box(center, size):
+    box = (center[0] - size, center[1] - size, center[0] + size, center[1] + size)
+    prefixes = geohash_prefixes_for_bbox(*box)
+    assert 0 < len(prefixes) <= 16
+    rng = np.random.default_rng(1)
+    points = rng.uniform(box[:2], box[2:], size=(500, 2))
+    corners = [(box[0], box[1]), (box[0], box[3]), (box[2], box[1]), (box[2], box[3])]
+    for lat, lon in [*points, *corners]:
+        assert geohash_encode(lat, lon).startswith(tuple(prefixes))
+
+
+def test_huge_box_matches_everything():
+    assert geohash_prefixes_for_bbox(-80, -170, 80, 170) == ['']
+
+
+def test_bbox_matches_a_full_scan(grid):
+    index, lats, lons = grid
+    box = (19.35, -99.2, 19.5, -99.05)
+    inside = (lats >= box[0]) & (lats <= box[2]) & (lons >= box[1]) & (lons <= box[3])
+    assert index.bbox(*box).tolist() == np.flatnonzero(inside).tolist()
+
+
+def test_radius_matches_a_full_scan_nearest_first(grid):
+    index, lats, lons = grid
+    pos, dist = index.radius(19.43, -99.13, 2500)
+    all_dist = haversine_m(19.43, -99.13, lats, lons)
+    assert sorted(pos.tolist()) == np.flatnonzero(all_dist <= 2500).tolist()
+    assert np.all(np.diff(dist) >= 0)
+    np.testing.assert_allclose(dist, all_dist[pos])
+
+
+@pytest.mark.parametrize('lat, lon', [(19.43, -99.13), (19.1, -99.5), (25.0, -90.0)])
+def test_nearest_matches_a_full_scan(grid, lat, lon):
+    index, lats, lons = grid
+    pos, dist = index.nearest(lat, lon, 10)
+    expected = np.sort(np.nan_to_num(haversine_m(lat, lon, lats, lons), nan=np.inf))[:10]
+    np.testing.assert_allclose(dist, expected)
+
+
+def test_nearest_filters_candidates_with_accept(grid):
+    index, lats, lons = grid
+    even = lambda pos: pos % 2 == 0
+    pos, _ = index.nearest(19.43, -99.13, 5, accept=even)
+    assert len(pos) == 5 and all(p % 2 == 0 for p in pos)
+    dist = np.nan_to_num(haversine_m(19.43, -99.13, lats, lons), nan=np.inf)
+    dist[1::2] = np.inf
+    assert sorted(pos.tolist()) == sorted(np.argsort(dist)[:5].tolist())
+
+
+def test_rows_added_after_build_are_found():
+    lats, lons = np.array([19.0, np.nan]), np.array([-99.0, -99.0])
+    index = GridIndex()
+    index.build(lats, lons)
+    lats, lons = np.append(lats, 19.0005), np.append(lons, -99.0005)
+    index.attach(lats, lons)
+    index.add(2, 19.0005, -99.0005)
+    index.add(3, None, None)
+    assert index.bbox(*bbox_around(19.0, -99.0, 200)).tolist() == [0, 2]
+    assert index.nearest(19.001, -99.001, 1)[0].tolist() == [2]
@@ -0,0 +1,129 @@
+import json
+import threading
+
+import pytest
+
+from media.drive import FakeDriveService
+from media.upload_queue import DONE, FAILED, UPLOADING, UploadQueue
+
+
+class _HttpError(Exception):
+    """Shaped like googleapiclient's HttpError: the status is on `resp`."""
+
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.resp = type('Response', (), {'status': status})()
+
+
+class _RejectingDrive(FakeDriveService):
+    def __init__(self, root, status):
+        super().__init__(root)
+        self.status = status
+
+    def _store(self, body, media_body):
+        with self._lock:
+            self.calls += 1
+        raise _HttpError(self.status)
+
+
+class _SlowDrive(FakeDriveService):
+    """Holds every upload until `release` is set, so two queues overlap."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.release = threading.Event()
+
+    def _store(self, body, media_body):
+        self.release.wait(5)
+        return super()._store(body, media_body)
+
+
+def _queue(tmp_path, service, **options):
+    options.setdefault('base_delay', 0.01)
+    return UploadQueue(tmp_path / 'queue', lambda: service, **options)
+
+
+def _uploads(service):
+    return sorted(p.name for p in service.root.glob('*.json'))
+
+
+@pytest.fixture
+def drive(tmp_path):
+    return FakeDriveService(tmp_path / 'drive')
+
+
+def test_upload_reaches_drive_and_drops_the_local_copy(tmp_path, drive):
+    queue = _queue(tmp_path, drive)
+    queue.submit(7, b'photo', name='observation_7.jpg', description='higo')
+    assert queue.wait(5)
+    job = queue.status(7)
+    assert job['status'] == DONE and job['attempts'] == 1
+    meta = json.loads((drive.root / f"{job['file_id']}.json").read_text())
+    assert (meta['name'], meta['description'], meta['size']) == ('observation_7.jpg', 'higo', 5)
+    assert not (queue.queue_dir / '7.bin').exists()
+    queue.stop(1)
+
+
+def test_network_errors_are_retried_with_backoff(tmp_path, drive):
+    drive.fail_times = 2
+    queue = _queue(tmp_path, drive, base_delay=0.05, max_attempts=5)
+    queue.submit(1, b'photo', name='a.jpg')
+    assert queue.wait(5)
+    job = queue.status(1)
+    assert job['status'] == DONE and job['attempts'] == 3 and drive.calls == 3
+    # Second retry waited twice as long as the first
+    assert job['next_attempt'] - job['submitted_at'] >= 0.05 + 0.1
+    queue.stop(1)
+
+
+def test_gives_up_after_max_attempts(tmp_path, drive):
+    drive.fail_times = 10
+    queue = _queue(tmp_path, drive, max_attempts=3)
+    queue.submit(1, b'photo', name='a.jpg')
+    assert queue.wait(5)
+    assert queue.status(1)['status'] == FAILED and drive.calls == 3
+    queue.stop(1)
+
+
+@pytest.mark.parametrize('status, calls', [(403, 1), (429, 3)])
+def test_client_errors_fail_at_once_unless_retryable(tmp_path, status, calls):
+    drive = _RejectingDrive(tmp_path / 'drive', status)
+    queue = _queue(tmp_path, drive, max_attempts=3)
+    queue.submit(1, b'photo', name='a.jpg')
+    assert queue.wait(5)
+    job = queue.status(1)
+    assert job['status'] == FAILED and job['attempts'] == calls and drive.calls == calls
+    assert (queue.queue_dir / '1.bin').exists()
+    queue.stop(1)
+
+
+def test_restart_resumes_jobs_interrupted_mid_upload(tmp_path, drive):
+    queue_dir = tmp_path / 'queue'
+    queue_dir.mkdir()
+    (queue_dir / '5.bin').write_bytes(b'photo')
+    (queue_dir / '5.json').write_text(json.dumps({
+        'observation_id': '5', 'name': 'b.jpg', 'mimetype': 'image/jpeg', 'description': None,
+        'folder_id': None, 'status': UPLOADING, 'attempts': 0, 'next_attempt': 0.0, 'error': None,
+        'file_id': None, 'submitted_at': 0.0, 'updated_at': 0.0,
+    }))
+    queue = _queue(tmp_path, drive)
+    queue.start()
+    assert queue.wait(5)
+    assert queue.status(5)['status'] == DONE and len(_uploads(drive)) == 1
+    queue.stop(1)
+
+
+def test_queues_sharing_a_directory_upload_each_photo_once(tmp_path):
+    drive = _SlowDrive(tmp_path / 'drive')
+    first = _queue(tmp_path, drive, workers=2)
+    for observation_id in range(4):
+        first.submit(observation_id, b'photo', name=f'{observation_id}.jpg')
+    # A second worker process starting now recovers the same pending jobs
+    second = _queue(tmp_path, drive, workers=2)
+    second.start()
+    drive.release.set()
+    assert first.wait(5) and second.wait(5)
+    assert len(_uploads(drive)) == 4
+    assert all(second.status(i)['status'] == DONE for i in range(4))
+    first.stop(1)
+    second.stop(1)
@@ -0,0 +1,115 @@
+import sqlite3
+import zipfile
+from datetime import datetime, timedelta
+
+import pytest
+
+import database.database_utils as du
+from database.whatsapp_import import FloraMatcher, Message, import_chat, pair_messages, parse_lines, parse_stream
+
+# An Android export (month first, 12-hour clock) with a system notice,
+# a multi-line message and an unrelated sender in between
+ANDROID_CHAT = """﻿11/16/21, 3:30 PM - Messages and calls are end-to-end encrypted.
+11/16/21, 3:36 PM - Ana: IMG-20211116-WA0001.jpg (file attached)
+11/16/21, 3:37 PM - Ana: location: https://maps.google.com/?q=19.4326,-99.1332
+11/16/21, 3:38 PM - Beto: hola a todos
+11/16/21, 3:38 PM - Ana: Nísperos maduros
+junto al mercado
+11/16/21, 3:40 PM - Beto: location: https://maps.google.com/?q=19.5,-99.2
+11/16/21, 3:41 PM - Beto: un higo enorme
+11/16/21, 3:58 PM - Beto: esto ya no es parte del higo
+11/16/21, 12:05 AM - Carla: location: https://maps.google.com/?q=19.1,-99.3
+11/16/21, 12:06 AM - Carla: sin nombre conocido
+"""
+
+# The same kind of export from iOS, day first with seconds and a 24-hour clock
+IOS_CHAT = """[16/11/21, 15:36:12] Ana: ‎<attached: 00000012-PHOTO-2021-11-16-15-36-12.jpg>
+[16/11/21, 15:37:00] Ana: ‎Location: https://maps.google.com/?q=19.4326,-99.1332
+[16/11/21, 15:38:30] Ana: guayabas
+"""
+
+
+def _message(minute, sender, text='', location=None):
+    return Message(datetime(2021, 11, 16, 15, minute), sender, text, location, ())
+
+
+def test_android_export_parses_senders_times_and_continuations():
+    messages = parse_lines(ANDROID_CHAT.splitlines(keepends=True))
+    assert [m.sender for m in messages] == ['Ana', 'Ana', 'Beto', 'Ana', 'Beto', 'Beto', 'Beto', 'Carla', 'Carla']
+    assert messages[0].images == ('IMG-20211116-WA0001.jpg',)
+    assert messages[1].timestamp == datetime(2021, 11, 16, 15, 37)
+    assert messages[1].location == ('19.4326', '-99.1332')
+    assert messages[3].text == 'Nísperos maduros  junto al mercado'
+    assert messages[7].timestamp == datetime(2021, 11, 16, 0, 5)
+
+
+def test_ios_export_parses_with_dayfirst():
+    messages = parse_lines(IOS_CHAT.splitlines(), dayfirst=True)
+    assert [m.timestamp for m in messages] == [
+        datetime(2021, 11, 16, 15, 36, 12), datetime(2021, 11, 16, 15, 37), datetime(2021, 11, 16, 15, 38, 30),
+    ]
+    assert messages[0].images == ('00000012-PHOTO-2021-11-16-15-36-12.jpg',)
+    assert messages[1].location == ('19.4326', '-99.1332')
+    # Read month first, 16/11 is no date at all
+    assert parse_lines(IOS_CHAT.splitlines()) == []
+
+
+def test_parallel_parse_matches_a_single_process():
+    lines = ANDROID_CHAT.splitlines() * 5
+    assert list(parse_stream(lines, workers=2, chunk_lines=7)) == parse_lines(lines)
+
+
+def test_sightings_collect_the_senders_messages_within_the_window():
+    sightings = list(pair_messages(parse_lines(ANDROID_CHAT.splitlines())))
+    assert [(s.sender, s.lat, s.lon) for s in sightings] == [
+        ('Ana', 19.4326, -99.1332), ('Beto', 19.5, -99.2), ('Carla', 19.1, -99.3),
+    ]
+    ana, beto, _ = sightings
+    assert ana.images == ('IMG-20211116-WA0001.jpg',)
+    assert 'Nísperos maduros' in ana.text and 'hola' not in ana.text
+    # The 3:58 message came after Beto's window closed
+    assert 'un higo enorme' in beto.text and 'ya no' not in beto.text
+
+
+def test_message_before_the_window_is_left_out():
+    messages = [_message(0, 'Ana', 'viejo'), _message(9, 'Ana', 'reciente'), _message(10, 'Ana', location=('1', '2'))]
+    [sighting] = pair_messages(messages, timedelta(minutes=5))
+    assert sighting.text == 'reciente'
+
+
+def test_second_location_from_the_same_sender_starts_a_new_sighting():
+    messages = [
+        _message(0, 'Ana', location=('1', '2')), _message(1, 'Ana', 'higo'),
+        _message(2, 'Ana', location=('3', '4')), _message(3, 'Ana', 'nispero'),
+    ]
+    first, second = pair_messages(messages)
+    assert (first.lat, first.text) == (1.0, 'higo')
+    assert (second.lat, second.text) == (3.0, 'nispero')
+    assert first.message_hash != second.message_hash
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('un NISPERO', 'Níspero'),
+    ('dos limones', 'Limón'),
+    ('higos y guayabas', 'Higo'),
+    ('café y nísperos', 'Café y níspero'),
+    ('higueras', None),
+    ('https://maps.google.com/?q=19.1,-99.3', None),
+])
+def test_flora_matcher_ignores_accents_and_plurals_and_prefers_longer_names(text, expected):
+    matcher = FloraMatcher(['Higo', 'Níspero', 'Café y níspero', 'Guayaba', 'Limón'])
+    assert matcher.infer(text) == expected
+
+
+def test_importing_the_same_export_twice_adds_nothing(sqlite_db, tmp_path):
+    conn = sqlite3.connect(sqlite_db, isolation_level=None)
+    conn.execute("INSERT INTO flora (name) VALUES ('Níspero'), ('Higo')")
+    export = tmp_path / 'WhatsApp Chat.zip'
+    with zipfile.ZipFile(export, 'w') as archive:
+        archive.writestr('_chat.txt', ANDROID_CHAT)
+
+    first = import_chat(export)
+    assert first == {'sightings': 3, 'unidentified': 1, 'written': 2, 'already_imported': 0}
+    again = import_chat(export)
+    assert again == {'sightings': 3, 'unidentified': 1, 'written': 0, 'already_imported': 2}
+    assert sorted(du.get_observations_df()['flora_name']) == ['Higo', 'Níspero']
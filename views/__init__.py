@@ -0,0 +1,6 @@
+"""Page renderers for Home.py, one module per page.
+
+Home.py imports a page's module the first time that page is shown, so
+libraries only one page needs (Plotly, geolocation, Pillow, the Drive
+client) stay out of the startup path.
+"""
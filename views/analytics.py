@@ -0,0 +1,60 @@
+import plotly.express as px
+import streamlit as st
+
+from database.database_utils import get_analytics
+from database.metrics import timed
+from views.common import cached_view
+
+@timed('figure.analytics')
+def _analytics_figures(stats):
+    """The three Analytics charts; built once per data generation and shared by all sessions."""
+    data_grouped = stats['per_flora_user']
+
+    # Create the chart
+    fig = px.bar(data_grouped, x='flora_name', y='count', color='username', title='Diversidad florar por usuario', barmode='stack', )#category_orders={'carrier': order[::-1]})
+
+    # Set the axis labels
+    fig.update_xaxes(title='Frutas')
+    fig.update_yaxes(title='Mapeadas')
+
+    # Flora distribution
+    fig1 = px.bar(
+        stats['per_flora'],
+        x='flora_name',
+        y='count',
+        title='Flora Distribution',
+        labels={'index': 'Flora Type', 'flora_name': 'Count'}
+    )
+
+    # User activity
+    fig2 = px.bar(
+        stats['per_user'],
+        x='username',
+        y='count',
+        title='User Activity',
+        labels={'index': 'User', 'username': 'Observations'}
+    )
+    return fig, fig1, fig2
+
+def show_analytics():
+    st.header("Analytics")
+    
+    stats = get_analytics()
+    c1, c2 = st.columns(2)
+    with c1:
+        st.metric("Flora totales:", stats['flora_count'])
+        st.metric("Observaciones:", stats['observations'])
+    with c2:
+        st.metric("Observaciones por usuario:", stats['observations'] / max(stats['user_count'], 1))
+        st.metric("Usuarios registrados:", stats['user_count'])
+
+    fig, fig1, fig2 = cached_view('analytics', (), lambda: _analytics_figures(stats))
+
+    # Display the chart
+    st.plotly_chart(fig, use_container_width=True)
+
+    c1, c2 = st.columns(2)
+    with c1:
+        st.plotly_chart(fig1, use_container_width=True)
+    with c2:
+        st.plotly_chart(fig2, use_container_width=True)
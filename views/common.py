@@ -0,0 +1,35 @@
+import os
+
+import streamlit as st
+
+from database.cache import KeyedCache
+from database.database_utils import get_data_key
+
+# Pickers with more names than this ask for a prefix first
+PICKER_LIMIT = 200
+
+# Figures (and other render payloads) shared by every session, keyed on the
+# data key plus the view parameters that shaped them
+view_cache = KeyedCache('views', maxsize=int(os.getenv('VIEW_CACHE_SIZE', 32)))
+
+def name_options(lookup, search_label, key):
+    """Names for a selectbox from a cached lookup; large vocabularies are narrowed by prefix search."""
+    names = lookup(limit=PICKER_LIMIT + 1)
+    if len(names) > PICKER_LIMIT:
+        prefix = st.text_input(search_label, key=key)
+        names = lookup(prefix, limit=PICKER_LIMIT)
+    return names
+
+def cached_view(name, params, builder):
+    """Returns `builder()` from the shared view cache, rebuilt only when the data or `params` change.
+
+    The result is shared across sessions and must not be modified.
+    """
+    data_key = get_data_key()
+
+    def build():
+        # Entries built from older data can never be hit again
+        view_cache.discard_where(lambda key: key[0] != data_key)
+        return builder()
+
+    return view_cache.get((data_key, name, params), build)
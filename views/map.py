@@ -0,0 +1,108 @@
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from database.database_utils import export_observations, get_map_cells, get_observations_df, get_observations_in_bbox
+from database.export import EXPORT_FORMATS, available_formats
+from database.map_aggregates import viewport_bbox
+from database.metrics import timed
+from views.common import cached_view
+
+# Above this many observations the map draws aggregated cells unless zoomed in
+MAP_POINT_LIMIT = 5000
+# From this zoom on, raw points inside the viewport are drawn
+DETAIL_ZOOM = 12
+
+def _display_columns(df):
+    """Adds the hover and marker columns the point map shows, vectorized over all rows."""
+    # Ensure description exists and is a string to avoid NoneType errors
+    if 'description' not in df.columns:
+        df['description'] = ''
+    description = df['description'].fillna('').astype(str)
+    df['description'] = description
+    df['shortdescription'] = description.where(description.str.len() <= 40, description.str[:40] + '...')
+    df['size'] = 10
+    # Coerce lat/lon to numeric, invalid values become NaN
+    df['lat'] = pd.to_numeric(df.get('lat', pd.Series()), errors='coerce')
+    df['lon'] = pd.to_numeric(df.get('lon', pd.Series()), errors='coerce')
+    return df
+
+@timed('figure.points')
+def _points_figure(df, zoom=2.9, center=None):
+    """Scatter map with one marker per observation."""
+    df = _display_columns(df)
+    fig = px.scatter_map(
+        df,
+        lat="lat",
+        lon="lon",
+        size='size',
+        color="flora_name",
+        zoom=zoom,
+        center=center,
+        size_max=10,
+        hover_data=["id", "flora_name", "username", "shortdescription"],map_style="basic"
+    )
+
+    fig.update_traces(cluster=dict(enabled=False))
+    return fig
+
+@timed('figure.cells')
+def _cells_figure(cells, zoom, center):
+    """Scatter map with one marker per aggregated grid cell, sized by count."""
+    fig = px.scatter_map(
+        cells,
+        lat="lat",
+        lon="lon",
+        size="count",
+        color="top_flora",
+        zoom=zoom,
+        center=center,
+        size_max=40,
+        hover_data={"count": True, "breakdown": True, "lat": False, "lon": False},
+        map_style="basic"
+    )
+    return fig
+
+def _median_center(df):
+    lats = pd.to_numeric(df['lat'], errors='coerce')
+    lons = pd.to_numeric(df['lon'], errors='coerce')
+    return float(lats.median()), float(lons.median())
+
+def show_map_view():
+    st.header("Mapa de Flora")
+
+    # Figures are cached per data generation and view, so an unrelated rerun reuses them
+    df = get_observations_df()
+
+    if len(df) <= MAP_POINT_LIMIT:
+        fig = cached_view('points', (), lambda: _points_figure(df.copy()))
+    else:
+        # Large datasets: aggregate on the server and only send raw points when zoomed in
+        median_lat, median_lon = cached_view('map_center', (), lambda: _median_center(df))
+        with st.expander("Vista del mapa"):
+            zoom = st.slider("Zoom:", min_value=2, max_value=16, value=4)
+            c1, c2 = st.columns(2)
+            center_lat = c1.number_input("Latitud:", value=median_lat, format="%.4f")
+            center_lon = c2.number_input("Longitud:", value=median_lon, format="%.4f")
+        center = {"lat": center_lat, "lon": center_lon}
+        bbox = viewport_bbox(center_lat, center_lon, zoom)
+        view = (zoom, center_lat, center_lon)
+        if zoom >= DETAIL_ZOOM:
+            fig = cached_view('points', view, lambda: _points_figure(get_observations_in_bbox(*bbox), zoom, center))
+        else:
+            fig = cached_view('cells', view, lambda: _cells_figure(get_map_cells(zoom, bbox), zoom, center))
+            st.caption(f"{len(df)} observaciones agrupadas; acerca el zoom a {DETAIL_ZOOM} para ver cada punto.")
+
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Add download button; the file is only generated when the button is clicked
+    formats = available_formats()
+    fmt = st.selectbox("Formato de descarga:", formats, format_func=lambda f: EXPORT_FORMATS[f][2])
+    file_name, mime, label = EXPORT_FORMATS[fmt]
+    st.download_button(
+        label=f"Descargar datos ({label})",
+        data=lambda: export_observations(fmt),
+        file_name=file_name,
+        mime=mime,
+        on_click="ignore"
+    )
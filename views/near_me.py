@@ -0,0 +1,55 @@
+import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
+from streamlit_geolocation import streamlit_geolocation
+
+from database.database_utils import get_flora_names, get_nearest_observations, get_observations_near
+from views.common import name_options
+
+def show_near_me():
+    st.header("Fruta cerca de mí")
+
+    flora_options = ["Todas"] + name_options(get_flora_names, "Buscar flora:", key="near_flora_search")
+
+    location = streamlit_geolocation()
+    if location['latitude'] is not None:
+        lat = location["latitude"]
+        lon = location["longitude"]
+        st.write(f"Tu ubicación: ({lat}, {lon})")
+    else:
+        location_input = st.text_input("Añade tu ubicación (latitud,longitud):")
+        try:
+            lat, lon = map(float, location_input.split(','))
+        except:
+            lat = lon = None
+
+    flora = st.selectbox("Flora:", options=flora_options)
+    radius_km = st.slider("Radio (km):", min_value=0.5, max_value=50.0, value=2.0, step=0.5)
+
+    if lat is None or lon is None:
+        st.info("Comparte tu ubicación para ver la flora cercana.")
+        return
+
+    flora_name = None if flora == "Todas" else flora
+    df = get_observations_near(lat, lon, radius_km * 1000, flora_name=flora_name)
+    if df.empty:
+        df = get_nearest_observations(lat, lon, k=10, flora_name=flora_name)
+        st.info("No hay observaciones en ese radio; estas son las más cercanas.")
+    if df.empty:
+        st.warning("No hay observaciones registradas.")
+        return
+
+    df['distancia (km)'] = (df['distance_m'] / 1000).round(2)
+    fig = px.scatter_map(
+        df,
+        lat="lat",
+        lon="lon",
+        color="flora_name",
+        zoom=13,
+        center={"lat": lat, "lon": lon},
+        hover_data=["id", "flora_name", "username", "distancia (km)"],
+        map_style="basic"
+    )
+    fig.add_trace(go.Scattermap(lat=[lat], lon=[lon], mode="markers", marker=dict(size=14, color="black"), name="Tú"))
+    st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(df[['flora_name', 'username', 'distancia (km)', 'address', 'description']], hide_index=True)
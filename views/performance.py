@@ -0,0 +1,50 @@
+import pandas as pd
+import streamlit as st
+
+from database.database_utils import get_observation_cache_stats
+from database.metrics import metrics
+from views.common import view_cache
+
+def show_performance():
+    st.header("Rendimiento")
+    st.toggle("Perfilar cada rerun con cProfile", key="profile_reruns")
+
+    reruns = pd.DataFrame(metrics.reruns())
+    if not reruns.empty:
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Reruns registrados:", len(reruns))
+        c2.metric("Consultas SQL por rerun:", f"{reruns['queries'].mean():.1f}")
+        c3.metric("Rerun p95 (ms):", f"{reruns['seconds'].quantile(0.95) * 1000:.0f}")
+
+        st.subheader("Por página")
+        per_page = reruns.groupby('page').agg(
+            reruns=('seconds', 'size'),
+            p50_ms=('seconds', lambda s: s.quantile(0.5) * 1000),
+            p95_ms=('seconds', lambda s: s.quantile(0.95) * 1000),
+            consultas=('queries', 'mean'),
+            consultas_ms=('query_seconds', lambda s: s.mean() * 1000),
+        )
+        st.dataframe(per_page, use_container_width=True)
+
+    st.subheader("Operaciones")
+    st.dataframe(pd.DataFrame(metrics.summary()), use_container_width=True, hide_index=True)
+
+    st.subheader("Cachés")
+    caches = {'observations': get_observation_cache_stats(), 'views': view_cache.stats(), **metrics.cache_stats()}
+    st.dataframe(
+        pd.DataFrame([
+            {'cache': name, 'hits': c['hits'], 'misses': c['misses'], 'hit_rate': c['hit_rate']}
+            for name, c in caches.items()
+        ]),
+        use_container_width=True,
+        hide_index=True
+    )
+
+    profile = metrics.last_profile()
+    if profile:
+        st.subheader("Último perfil (cProfile)")
+        st.code(profile)
+
+    if st.button("Reiniciar métricas"):
+        metrics.reset()
+        st.rerun()
@@ -0,0 +1,40 @@
+import streamlit as st
+
+from database.database_utils import add_recipe, get_flora_names, get_recipes, get_recipes_with
+
+def show_recipes():
+    st.header("Recetas públicas")
+    
+    # Tab selection
+    tab1, tab2 = st.tabs(["Explora recetas", "Añade receta"])
+    
+    with tab1:
+        ingredient = st.text_input("Buscar por ingrediente:")
+        recipes = get_recipes_with(ingredient, mode='substring') if ingredient.strip() else get_recipes()
+        if ingredient.strip() and not recipes:
+            st.info("No hay recetas con ese ingrediente.")
+        for recipe in recipes:
+            with st.expander(recipe['name']):
+                st.write("**Ingredientes:**")
+                for ingredient in recipe['ingredients']:
+                    st.write(f"- {ingredient}")
+                st.write("\n**Preparación:**")
+                st.write(recipe['prep'])
+    
+    with tab2:
+        st.subheader("Añade nueva receta")
+        
+        name = st.text_input("Receta:")
+        
+        available_flora = get_flora_names()
+        
+        ingredients = st.multiselect("Ingredientes:", available_flora)
+        prep = st.text_area("Preparación:")
+        
+        if st.button("Añadir receta"):
+            if name and ingredients and prep:
+                add_recipe(name, prep, ingredients)
+                st.success("Receta añadida correctamente!")
+                st.rerun()
+            else:
+                st.error("Porfavor, rellena todos los campos.")
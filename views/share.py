@@ -0,0 +1,132 @@
+import os
+
+import streamlit as st
+from streamlit_geolocation import streamlit_geolocation
+
+from database.database_utils import add_observation, get_flora_names, get_usernames
+from views.common import name_options
+
+_drive_factory = None
+
+def setup_google_drive():
+    """Returns this thread's Google Drive service; credentials and client are built once per process.
+
+    With DRIVE_FAKE_DIR set, uploads go to a local fake Drive in that directory instead.
+    """
+    global _drive_factory
+    from media.drive import DriveServiceFactory, fake_drive_factory
+
+    try:
+        if _drive_factory is None:
+            if os.getenv('DRIVE_FAKE_DIR'):
+                _drive_factory = fake_drive_factory()
+            else:
+                _drive_factory = DriveServiceFactory(st.secrets["google_credentials"])
+        return _drive_factory()
+    except Exception as e:
+        raise Exception(f"Error setting up Google Drive: {str(e)}")
+
+
+def get_photo_queue():
+    """Background queue that uploads observation photos to Google Drive."""
+    from media.upload_queue import get_upload_queue
+
+    return get_upload_queue(setup_google_drive)
+
+
+def show_upload_status(observation_ids):
+    """Shows the Drive upload state of photos submitted in this session."""
+    from media.images import get_thumbnail_cache
+    from media.upload_queue import DONE, FAILED
+
+    queue = get_photo_queue()
+    for observation_id in observation_ids:
+        job = queue.status(observation_id)
+        if job is None:
+            continue
+        thumbnail = get_thumbnail_cache().get(observation_id)
+        if thumbnail is not None:
+            st.image(str(thumbnail), width=128)
+        if job['status'] == DONE:
+            st.caption(f"Foto de la observación {observation_id}: subida (Drive ID {job['file_id']})")
+        elif job['status'] == FAILED:
+            st.caption(f"Foto de la observación {observation_id}: error al subir ({job['error']})")
+        else:
+            st.caption(f"Foto de la observación {observation_id}: en cola ({job['attempts']} intentos)")
+
+
+def share_flora():
+    st.header("Comparte flora")
+    
+    flora_options = name_options(get_flora_names, "Buscar flora:", key="share_flora_search") + ["Otro..."]
+    user_options = name_options(get_usernames, "Buscar usuario:", key="share_user_search") + ["Otro..."]
+    
+    # Form inputs
+    flora = st.selectbox("Flora:", options=flora_options)
+    if flora == "Otro...":
+        flora = st.text_input("Añade tu opción de flora...")
+    
+    username = st.selectbox("Usuario:", options=user_options)
+    if username == "Otro...":
+        username = st.text_input("Añade un nuevo usuario...")
+    
+    # Get location
+    location = streamlit_geolocation()
+    if location['latitude'] is not None:
+        lat = location["latitude"]
+        lon = location["longitude"]
+        st.write(f"Tu ubicación: ({lat}, {lon})")
+    else:
+        location_input = st.text_input("Añade tu ubicación (latitud,longitud) o dirección:")
+        try:
+            lat, lon = map(float, location_input.split(','))
+        except:
+            lat = lon = None
+    
+    address = st.text_input("Dirección (opcional):")
+
+    img_file_buffer = st.camera_input("Toma una foto")
+    UPLOAD_URL = "https://drive.google.com/drive/folders/1yj0_LawzPpLXMYbF15xyfFgoxsB69M8t"
+    description = st.text_area("Observaciones:")
+    
+    if st.button("Submit", type="primary"):
+        if all([flora, username, lat, lon]):
+            observation_id = add_observation(flora, username, lat, lon, address, description)
+            st.success("Observación grabada correctamente!")
+            if img_file_buffer is not None:
+                # Pillow and the upload stack are only imported once a photo is shared
+                from media.images import get_thumbnail_cache, process_image
+
+                # Replace with your Google Drive folder ID
+                FOLDER_ID = "1yj0_LawzPpLXMYbF15xyfFgoxsB69M8t"
+
+                try:
+                    photo = img_file_buffer.getvalue()
+                    image = process_image(photo)
+                    get_thumbnail_cache().put(observation_id, photo)
+                    # Uploading happens in the background; the queue survives restarts
+                    get_photo_queue().submit(
+                        observation_id,
+                        image.data,
+                        name=f'observation_{str(observation_id)}.{image.extension}',
+                        mimetype=image.mimetype,
+                        description=description,
+                        folder_id=FOLDER_ID
+                    )
+                    st.session_state.setdefault("uploaded_photos", []).append(observation_id)
+                    st.success("La foto se está subiendo en segundo plano.")
+                    st.caption(
+                        f"Foto optimizada: {image.original_bytes / 1024:.0f} KB → {len(image.data) / 1024:.0f} KB "
+                        f"en {image.seconds * 1000:.0f} ms"
+                    )
+                except ValueError as e:
+                    st.error(f"No se pudo procesar la foto: {str(e)}")
+                except Exception as e:
+                    # The observation is already saved; a disk or queue error only loses the photo
+                    st.error(f"No se pudo guardar la foto: {str(e)}")
+
+        else:
+            st.error("Por favor, rellena todos los campos requeridos.")
+
+    if st.session_state.get("uploaded_photos"):
+        show_upload_status(st.session_state["uploaded_photos"])